@@ -2,6 +2,13 @@ const dialogflowService = require("../services/dialogflowService");
 const recommendationService = require("../services/recommendationService");
 const logger = require("../logger");
 
+// Dialogflow membatalkan webhook yang lebih lambat dari ~5 detik, jadi rekomendasi
+// untuk chatbot diminta dengan tenggat (ms) dan boleh berupa hasil upaya terbaik
+const CHATBOT_DEADLINE_MS = parseInt(
+  process.env.CHATBOT_BATAS_WAKTU_MS || "4000",
+  10
+);
+
 const dialogflowProxy = async (req, res) => {
   try {
     const { text, sessionId } = req.body;
@@ -34,15 +41,26 @@ const chatbotWebhook = async (req, res) => {
     const filtersForPython =
       recommendationService.translateDialogflowParams(params);
 
-    // 3. Dapatkan rekomendasi dari service
+    // 3. Dapatkan rekomendasi dari service (chatbot hanya menampilkan 3 kartu)
     const finalResult = await recommendationService.getRecommendations(
-      filtersForPython
+      { ...filtersForPython, top_k: 3 },
+      { deadlineMs: CHATBOT_DEADLINE_MS }
     );
+    // "teratas_pasti" tetap final untuk kartu yang tampil; hanya "upaya_terbaik" yang sementara
+    const tenggat = finalResult.metadata && finalResult.metadata.tenggat;
+    const partial = Boolean(tenggat && tenggat.status === "upaya_terbaik");
+    if (partial) {
+      logger.info(
+        `⏱️ Rekomendasi chatbot upaya terbaik (${tenggat.jalur_belum_dinilai} jalur belum dinilai)`
+      );
+    }
 
     // 4. Format hasil dari Python ke dalam format respon Dialogflow
     const recommendations = finalResult.rekomendasi_gunung || [];
-    const response =
-      recommendationService.formatDialogflowResponse(recommendations);
+    const response = recommendationService.formatDialogflowResponse(
+      recommendations,
+      { partial }
+    );
 
     res.status(200).json(response);
   } catch (error) {
@@ -1,5 +1,6 @@
 const pool = require("../config/database");
 const logger = require("../logger");
+const recommendationService = require("../services/recommendationService");
 const path = require("path");
 const fs = require("fs");
 
@@ -165,6 +166,7 @@ const updateMountain = async (req, res) => {
       return res.status(404).json({ message: "Data gunung tidak ditemukan." });
     }
 
+    recommendationService.refreshCatalog({ gunungIds: [id_gunung] });
     res.json({
       message: "Data gunung berhasil diperbarui",
       gunung: result.rows[0],
@@ -204,6 +206,7 @@ const deleteMountain = async (req, res) => {
       }
     }
 
+    recommendationService.refreshCatalog({ gunungIds: [id_gunung] });
     res.json({
       message: `Gunung '${result.rows[0].nama_gunung}' berhasil dihapus.`,
     });
@@ -1,7 +1,42 @@
 const recommendationService = require("../services/recommendationService");
 const logger = require("../logger");
 
+// Mode stream (?stream=true): respons application/x-ndjson, baris pertama header
+// berisi metadata lalu satu baris per hasil sesuai peringkat, diteruskan begitu
+// worker mengirimnya sehingga klien dapat merender hasil teratas lebih awal.
+// Sesi (?sesi=true, lalu ?sesi=<metadata.sesi.token>): saat pengguna hanya memperketat
+// slider, worker memfilter kandidat permintaan sebelumnya alih-alih memindai ulang katalog.
+const sessionOption = (req) =>
+  req.query.sesi && req.query.sesi !== "false"
+    ? { session: req.query.sesi === "true" ? true : String(req.query.sesi) }
+    : {};
+
+const streamRecommendations = async (req, res, table) => {
+  res.status(200);
+  res.setHeader("Content-Type", "application/x-ndjson; charset=utf-8");
+  try {
+    await recommendationService.streamRecommendations(
+      req.body,
+      (message) => res.write(JSON.stringify(message) + "\n"),
+      { tables: [table], ...sessionOption(req) }
+    );
+    res.end(JSON.stringify({ jenis: "selesai" }) + "\n");
+  } catch (error) {
+    logger.error(`Error pada stream rekomendasi-${table}:`, error);
+    // Header sudah terkirim: kesalahan dilaporkan sebagai baris terakhir
+    res.end(
+      JSON.stringify({
+        jenis: "error",
+        message: error.message || "Terjadi kesalahan pada server.",
+      }) + "\n"
+    );
+  }
+};
+
 const getRecommendations = async (req, res) => {
+  if (req.query.stream === "true") {
+    return streamRecommendations(req, res, "gunung");
+  }
   try {
     const preferensiPengguna = req.body;
     logger.info(
@@ -10,7 +45,8 @@ const getRecommendations = async (req, res) => {
     );
 
     const finalResult = await recommendationService.getRecommendations(
-      preferensiPengguna
+      preferensiPengguna,
+      sessionOption(req)
     );
 
     // Kirim hasil rekomendasi gunung ke frontend
@@ -28,6 +64,9 @@ const getRecommendations = async (req, res) => {
 };
 
 const getTrailRecommendations = async (req, res) => {
+  if (req.query.stream === "true") {
+    return streamRecommendations(req, res, "jalur");
+  }
   try {
     const preferensiPengguna = req.body;
     logger.info(
@@ -36,7 +75,8 @@ const getTrailRecommendations = async (req, res) => {
     );
 
     const finalResult = await recommendationService.getRecommendations(
-      preferensiPengguna
+      preferensiPengguna,
+      sessionOption(req)
     );
 
     // Kirim hasil rekomendasi jalur ke frontend
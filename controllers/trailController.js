@@ -1,5 +1,6 @@
 const pool = require("../config/database");
 const logger = require("../logger");
+const recommendationService = require("../services/recommendationService");
 
 // Konstanta enum untuk validasi
 const ALLOWED_STATUS_JALUR = [
@@ -109,6 +110,9 @@ const createTrail = async (req, res) => {
       ]
     );
 
+    recommendationService.refreshCatalog({
+      jalurIds: [result.rows[0].id_jalur],
+    });
     res.status(201).json({
       message: "Jalur pendakian berhasil ditambahkan",
       jalur: result.rows[0],
@@ -195,6 +199,7 @@ const updateTrail = async (req, res) => {
       return res.status(404).json({ message: "Data jalur tidak ditemukan." });
     }
 
+    recommendationService.refreshCatalog({ jalurIds: [id_jalur] });
     res.json({
       message: "Data jalur berhasil diperbarui",
       jalur: result.rows[0],
@@ -224,6 +229,7 @@ const deleteTrail = async (req, res) => {
       return res.status(404).json({ message: "Data jalur tidak ditemukan." });
     }
 
+    recommendationService.refreshCatalog({ jalurIds: [id_jalur] });
     res.json({
       message: `Jalur '${result.rows[0].nama_jalur}' berhasil dihapus.`,
     });
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+import fuzzy_engine
+import fuzzy_engine_worker
+
+KOLOM_SKALA = [
+    'kesulitan_skala', 'keamanan_skala', 'kualitas_fasilitas_skala', 'kualitas_kemah_skala',
+    'keindahan_pemandangan_skala', 'variasi_lanskap_skala', 'perlindungan_angin_kemah_skala',
+    'ketersediaan_sumber_air_skala', 'jaringan_komunikasi_skala', 'tingkat_insiden_skala',
+]
+
+def buat_df_sintetis(n=40, n_gunung=8, seed=0):
+    """Data jalur buatan dengan kolom yang sama seperti hasil query database."""
+    rng = np.random.default_rng(seed)
+    id_gunung = rng.integers(1, n_gunung + 1, n)
+    ketinggian = rng.integers(800, 5200, n_gunung + 1).astype(float)
+    variasi_jalur = rng.integers(0, 11, n_gunung + 1)
+    df = pd.DataFrame({
+        'id_jalur': np.arange(1, n + 1),
+        'id_gunung': id_gunung,
+        'nama_jalur': [f'Jalur {i}' for i in range(1, n + 1)],
+        'nama_gunung': [f'Gunung {g}' for g in id_gunung],
+        'ketinggian_puncak_mdpl': ketinggian[id_gunung],
+        'variasi_jalur_skala': variasi_jalur[id_gunung],
+        **{kolom: rng.integers(0, 11, n) for kolom in KOLOM_SKALA},
+        'estimasi_waktu_jam': rng.choice([4, 8, 12, 18, 24, 36, 60, 110], n).astype(float),
+        'status_jalur': 'Buka',
+        'deskripsi_jalur': '',
+        'lokasi_pintu_masuk': '',
+        'lokasi_administratif': [f'Provinsi {g % 3}' for g in id_gunung],
+        'deskripsi_singkat': '',
+        'url_thumbnail': '',
+    })
+    return df.sort_values(['nama_gunung', 'nama_jalur']).reset_index(drop=True)
+
+@pytest.fixture
+def buat_katalog():
+    """Pembuat katalog sintetis: buat_katalog(n=40, n_gunung=8, seed=0) -> DataFrame."""
+    return buat_df_sintetis
+
+@pytest.fixture
+def katalog_sintetis(monkeypatch):
+    """
+    Memasang katalog sintetis sebagai sumber data engine dan worker (tanpa database).
+    katalog_sintetis(df=None, ambil=None, **argumen_buat_katalog) -> DataFrame; ambil
+    menggantikan get_data_jalur_from_database bila data harus bergantung argumennya.
+    """
+    def pasang(df=None, ambil=None, **opsi):
+        df = buat_df_sintetis(**opsi) if df is None else df
+        ambil = ambil or (lambda **_: df)
+        for modul in (fuzzy_engine, fuzzy_engine_worker):
+            monkeypatch.setattr(modul, 'get_data_jalur_from_database', ambil)
+        return df
+    return pasang
@@ -23,72 +23,54 @@ import numpy as np
 import pandas as pd
 import skfuzzy as fuzz
 from skfuzzy import control as ctrl
-import psycopg2
+from decimal import Decimal
+from functools import reduce
 import os
+import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from fuzzy_engine_db import (ambil_data_jalur, ambil_media, ambil_katalog_ringkas,
+                             KOLOM_MEDIA_JALUR, KOLOM_MEDIA_GUNUNG, URUTAN_KOLOM_JALUR)
+from fuzzy_engine_definisi import DEFINISI_FUZZY, bangun_control_system, buat_universe, hash_definisi
 
 sys.stdout.reconfigure(encoding='utf-8')
 
 # Hapus print statement yang mengacaukan JSON output
 
 # 2. Koneksi Database dan Pengambilan Data Real
-def get_data_jalur_from_database():
+def get_data_jalur_from_database(id_jalur=None, id_gunung=None, preferensi=None, media=True):
     """
-    Menghubungkan ke database PostgreSQL dan mengambil data gabungan
-    dari tabel jalur_pendakian dan gunung.
+    Mengambil data gabungan dari tabel jalur_pendakian dan gunung di PostgreSQL.
+
+    id_jalur / id_gunung (opsional) membatasi hasil ke jalur tertentu atau seluruh
+    jalur milik gunung tertentu; dipakai untuk penyegaran parsial setelah edit admin.
+    preferensi (opsional): filter min_*/max_* ikut dikirim sebagai WHERE sehingga hanya
+    jalur kandidat yang diambil; filter di memori tetap dijalankan setelahnya.
+    media=False: tanpa kolom teks/media (lihat hidrasi_media) agar data kerja tetap ringkas.
+    Katalog ringkas tanpa id_jalur/id_gunung dibuka dari snapshot kolumnar di disk selama
+    sidik database belum berubah; filter preferensi lalu dievaluasi atas kolom snapshot
+    sebelum baris dimaterialisasi (tanpa snapshot tetap didorong ke WHERE).
+    Koneksi dipinjam dari pool proses (lihat fuzzy_engine_db), bukan dibuka per panggilan.
     """
-    conn = None
     try:
-        # Konfigurasi koneksi database
-        conn_params = {
-            "dbname": os.getenv("DB_NAME", "db_gunung2"),
-            "user": os.getenv("DB_USER", "postgres"),
-            "password": os.getenv("DB_PASSWORD", "postgres"),
-            "host": os.getenv("DB_HOST", "localhost"),
-            "port": os.getenv("DB_PORT", "5432")
-        }
-        conn = psycopg2.connect(**conn_params)
-        # Query untuk mengambil semua data jalur dengan informasi gunung
-        query = """
-            SELECT 
-                j.id_jalur,
-                j.id_gunung,
-                j.nama_jalur,
-                g.nama_gunung,
-                COALESCE(g.ketinggian_puncak_mdpl, 2000) as ketinggian_puncak_mdpl,
-                COALESCE(g.variasi_jalur_skala, 5) as variasi_jalur_skala,
-                COALESCE(j.kesulitan_skala, 5) as kesulitan_skala,
-                COALESCE(j.keamanan_skala, 5) as keamanan_skala,
-                COALESCE(j.kualitas_fasilitas_skala, 5) as kualitas_fasilitas_skala,
-                COALESCE(j.kualitas_kemah_skala, 5) as kualitas_kemah_skala,
-                COALESCE(j.keindahan_pemandangan_skala, 5) as keindahan_pemandangan_skala,
-                COALESCE(j.estimasi_waktu_jam, 24) as estimasi_waktu_jam,
-                COALESCE(j.variasi_lanskap_skala, 5) as variasi_lanskap_skala,
-                COALESCE(j.perlindungan_angin_kemah_skala, 5) as perlindungan_angin_kemah_skala,
-                COALESCE(j.ketersediaan_sumber_air_skala, 5) as ketersediaan_sumber_air_skala,
-                COALESCE(j.jaringan_komunikasi_skala, 5) as jaringan_komunikasi_skala,
-                COALESCE(j.tingkat_insiden_skala, 5) as tingkat_insiden_skala,
-                j.status_jalur,
-                COALESCE(j.deskripsi_jalur, '') as deskripsi_jalur,
-                COALESCE(j.lokasi_pintu_masuk, '') as lokasi_pintu_masuk,
-                COALESCE(g.lokasi_administratif, '') as lokasi_administratif,
-                COALESCE(g.deskripsi_singkat, '') as deskripsi_singkat,
-                COALESCE(g.url_thumbnail, '') as url_thumbnail
-            FROM jalur_pendakian j
-            JOIN gunung g ON j.id_gunung = g.id_gunung
-            WHERE j.id_jalur IS NOT NULL
-            ORDER BY g.nama_gunung, j.nama_jalur;
-        """
-        df = pd.read_sql_query(query, conn)
+        kondisi = [(kolom, op, nilai) for _, kolom, op, nilai, _ in kompilasi_filter(preferensi or {})]
+        if not media and id_jalur is None and id_gunung is None:
+            df = ambil_katalog_ringkas(os.path.join(DIREKTORI_CACHE, "snapshot_jalur"), kondisi)
+        else:
+            df = ambil_data_jalur(id_jalur=id_jalur, id_gunung=id_gunung, kondisi=kondisi, media=media)
         print(f"✅ Berhasil mengambil {len(df)} data jalur dari database", file=sys.stderr)
         return df
     except Exception as error:
         print(f"❌ Database connection error: {error}", file=sys.stderr)
         # Tidak ada fallback ke data mock, langsung raise agar pengujian gagal
         raise
-    finally:
-        if conn:
-            conn.close()
+
+def get_media_from_database(id_jalur, id_gunung):
+    """Tahap kedua pengambilan ringkas: kolom teks/media hanya untuk jalur dan gunung yang dikirim."""
+    media_jalur, media_gunung = ambil_media(id_jalur, id_gunung)
+    print(f"✅ Media diambil untuk {len(media_jalur)} jalur dan {len(media_gunung)} gunung", file=sys.stderr)
+    return media_jalur, media_gunung
 
 # 2.1 Fungsi fallback untuk data mock (jika database tidak tersedia)
 def get_mock_data_jalur():
@@ -104,460 +86,1455 @@ def cek_kolom(df, kolom):
         return False
     return True
 
-def proses_rekomendasi(df_jalur=None, preferensi_pengguna=None):
-    """Fungsi utama yang melakukan seluruh proses: fetch data, filter dan kalkulasi skor."""
-    
-    # Jika df_jalur tidak diberikan, ambil dari database
-    if df_jalur is None:
-        df_jalur = get_data_jalur_from_database()
-    
-    if df_jalur.empty:
-        print("❌ Tidak ada data jalur yang tersedia", file=sys.stderr)
-        return pd.DataFrame(), pd.DataFrame()
-    # Definisi Universe Variabel (Rentang Nilai)
-    ketinggian_univ = np.arange(0, 5501, 1)
-    skala_univ = np.arange(0, 11, 1)
-    waktu_univ = np.arange(0, 101, 1)
-    skor_univ = np.arange(0, 101, 1)
-
-    # Definisi Variabel Input (Antecedents) sesuai dokumentasi
-    antecedents = {
-        'ketinggian_puncak_mdpl': ctrl.Antecedent(ketinggian_univ, 'ketinggian_puncak_mdpl'),
-        'kesulitan_skala': ctrl.Antecedent(skala_univ, 'kesulitan_skala'),
-        'keamanan_skala': ctrl.Antecedent(skala_univ, 'keamanan_skala'),
-        'kualitas_fasilitas_skala': ctrl.Antecedent(skala_univ, 'kualitas_fasilitas_skala'),
-        'kualitas_kemah_skala': ctrl.Antecedent(skala_univ, 'kualitas_kemah_skala'),
-        'keindahan_pemandangan_skala': ctrl.Antecedent(skala_univ, 'keindahan_pemandangan_skala'),
-        'estimasi_waktu_jam': ctrl.Antecedent(waktu_univ, 'estimasi_waktu_jam'),
-        'variasi_lanskap_skala': ctrl.Antecedent(skala_univ, 'variasi_lanskap_skala'),
-        'perlindungan_angin_kemah_skala': ctrl.Antecedent(skala_univ, 'perlindungan_angin_kemah_skala'),
-        # Variabel baru dari dokumentasi
-        'ketersediaan_sumber_air_skala': ctrl.Antecedent(skala_univ, 'ketersediaan_sumber_air_skala'),
-        'jaringan_komunikasi_skala': ctrl.Antecedent(skala_univ, 'jaringan_komunikasi_skala'),
-        'tingkat_insiden_skala': ctrl.Antecedent(skala_univ, 'tingkat_insiden_skala'),
-        'variasi_jalur_skala': ctrl.Antecedent(skala_univ, 'variasi_jalur_skala')
+# 3.1 Kompilasi Engine
+# Definisi MF dan rules ada di fuzzy_engine_definisi.py; hasil kompilasinya disimpan per hash definisi
+DIREKTORI_CACHE = os.getenv(
+    "FUZZY_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+FORMAT_ARTEFAK = 2
+# Variabel dengan universe bilangan bulat berjarak 1 sekecil ini mendapat tabel derajat
+# keanggotaan siap pakai (skala 0-10, jam 0-100); universe ketinggian tetap dihitung analitik.
+MAKS_TITIK_LUT = 128
+
+def _kompilasi_kondisi(ekspresi, indeks_term):
+    """["and"|"or", ...] / ["variabel", "term"] menjadi ["and"|"or", [anak, ...]] / ["term", j]."""
+    if ekspresi[0] in ("and", "or"):
+        return [ekspresi[0], [_kompilasi_kondisi(e, indeks_term) for e in ekspresi[1:]]]
+    return ["term", indeks_term[tuple(ekspresi)]]
+
+def kompilasi_definisi(definisi=DEFINISI_FUZZY):
+    """Mengompilasi definisi deklaratif menjadi tabel NumPy untuk inferensi_batch."""
+    variabel = list(definisi["antecedents"])
+    universe_batas = {}
+    term_kolom, term_nama, term_abcd = [], [], []
+    lut = {}
+    indeks_term = {}
+    for kolom, label in enumerate(variabel):
+        spek = definisi["antecedents"][label]
+        awal, akhir, langkah = definisi["universe"][spek["universe"]]
+        univ = np.arange(awal, akhir, langkah, dtype=float)
+        universe_batas[label] = [float(univ[0]), float(univ[-1])]
+        awal_term = len(term_nama)
+        for nama_term, abcd in spek["terms"].items():
+            indeks_term[(label, nama_term)] = len(term_nama)
+            term_kolom.append(kolom)
+            term_nama.append(f"{label}.{nama_term}")
+            term_abcd.append([float(v) for v in abcd])
+        if langkah == 1 and float(awal).is_integer() and len(univ) <= MAKS_TITIK_LUT:
+            lut[label] = _trapmf_analitik(univ, np.array(term_abcd[awal_term:]))
+
+    # Term output automf berupa segitiga; parameternya dihitung persis seperti automf skfuzzy
+    spek_output = definisi["consequent"]
+    nama_output = list(spek_output["automf"])
+    universe_output = buat_universe(definisi, spek_output["universe"]).astype(float)
+    lebar = (universe_output.max() - universe_output.min()) / ((len(nama_output) - 1) / 2.)
+    pusat = np.linspace(universe_output.min(), universe_output.max(), len(nama_output))
+    abc_output = np.array([[c - lebar / 2, c, c + lebar / 2] for c in pusat])
+
+    aturan = [[_kompilasi_kondisi(rule["jika"], indeks_term), nama_output.index(rule["maka"]), 1.0]
+              for rule in definisi["rules"]]
+
+    return {
+        "versi": hash_definisi(definisi),
+        "variabel": variabel,
+        "universe_batas": universe_batas,
+        "term_kolom": term_kolom,
+        "term_nama": term_nama,
+        "term_abcd": np.array(term_abcd),
+        "lut": lut,
+        "aturan": aturan,
+        "nama_output": nama_output,
+        "universe_output": universe_output,
+        "abc_output": abc_output,
     }
 
-    # Definisi Variabel Output (Consequent)
-    skor_rekomendasi = ctrl.Consequent(skor_univ, 'skor_rekomendasi')
-
-    # PEMBUATAN FUNGSI KEANGGOTAAN (MEMBERSHIP FUNCTIONS)
-    # Disesuaikan sepenuhnya dengan dokumen "detail standard fuzzy engine".
-    # Format trapmf: [awal_kiri, puncak_kiri, puncak_kanan, akhir_kanan]
-
-    # Ketinggian Puncak
-    antecedents['ketinggian_puncak_mdpl']['rendah'] = fuzz.trapmf(ketinggian_univ, [0, 0, 1000, 1500])
-    antecedents['ketinggian_puncak_mdpl']['sedang'] = fuzz.trapmf(ketinggian_univ, [1500, 2000, 3000, 3500])
-    antecedents['ketinggian_puncak_mdpl']['tinggi'] = fuzz.trapmf(ketinggian_univ, [3500, 4000, 5500, 5500])
-
-    # Estimasi Waktu, ditambahkan 'ekspedisi'
-    antecedents['estimasi_waktu_jam']['pendek'] = fuzz.trapmf(waktu_univ, [0, 0, 10, 14])
-    antecedents['estimasi_waktu_jam']['sedang'] = fuzz.trapmf(waktu_univ, [12, 18, 30, 36])
-    antecedents['estimasi_waktu_jam']['panjang'] = fuzz.trapmf(waktu_univ, [34, 40, 80, 100])
-    antecedents['estimasi_waktu_jam']['ekspedisi'] = fuzz.trapmf(waktu_univ, [90, 100, 101, 101])
-
-    # Tingkat Kesulitan
-    antecedents['kesulitan_skala']['mudah'] = fuzz.trapmf(skala_univ, [0, 0, 2, 4])
-    antecedents['kesulitan_skala']['sedang'] = fuzz.trapmf(skala_univ, [3, 4, 5, 7])
-    antecedents['kesulitan_skala']['sulit'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Keamanan Jalur
-    antecedents['keamanan_skala']['berbahaya'] = fuzz.trapmf(skala_univ, [0, 0, 2, 4])
-    antecedents['keamanan_skala']['cukup_aman'] = fuzz.trapmf(skala_univ, [3, 4, 5, 7])
-    antecedents['keamanan_skala']['aman'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Kualitas Fasilitas
-    antecedents['kualitas_fasilitas_skala']['minim'] = fuzz.trapmf(skala_univ, [0, 0, 2, 4])
-    antecedents['kualitas_fasilitas_skala']['cukup'] = fuzz.trapmf(skala_univ, [3, 4, 5, 7])
-    antecedents['kualitas_fasilitas_skala']['lengkap'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Kualitas Area Kemah
-    antecedents['kualitas_kemah_skala']['buruk'] = fuzz.trapmf(skala_univ, [0, 0, 2, 4])
-    antecedents['kualitas_kemah_skala']['cukup'] = fuzz.trapmf(skala_univ, [3, 4, 5, 7])
-    antecedents['kualitas_kemah_skala']['baik'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Keindahan Pemandangan
-    antecedents['keindahan_pemandangan_skala']['biasa'] = fuzz.trapmf(skala_univ, [0, 0, 2, 4])
-    antecedents['keindahan_pemandangan_skala']['indah'] = fuzz.trapmf(skala_univ, [3, 5, 6, 7])
-    antecedents['keindahan_pemandangan_skala']['istimewa'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Variasi Lanskap
-    antecedents['variasi_lanskap_skala']['monoton'] = fuzz.trapmf(skala_univ, [0, 0, 2, 4])
-    antecedents['variasi_lanskap_skala']['cukup_bervariasi'] = fuzz.trapmf(skala_univ, [3, 4, 5, 7])
-    antecedents['variasi_lanskap_skala']['sangat_bervariasi'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Perlindungan Angin
-    antecedents['perlindungan_angin_kemah_skala']['sangat_terekspos'] = fuzz.trapmf(skala_univ, [0, 0, 2, 4])
-    antecedents['perlindungan_angin_kemah_skala']['cukup_terlindungi'] = fuzz.trapmf(skala_univ, [3, 4, 5, 7])
-    antecedents['perlindungan_angin_kemah_skala']['terlindungi'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Ketersediaan Sumber Air
-    antecedents['ketersediaan_sumber_air_skala']['langka'] = fuzz.trapmf(skala_univ, [0, 0, 1, 3])
-    antecedents['ketersediaan_sumber_air_skala']['terbatas'] = fuzz.trapmf(skala_univ, [2, 4, 5, 7])
-    antecedents['ketersediaan_sumber_air_skala']['melimpah'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Jaringan Komunikasi
-    antecedents['jaringan_komunikasi_skala']['tidak_ada'] = fuzz.trapmf(skala_univ, [0, 0, 1, 2])
-    antecedents['jaringan_komunikasi_skala']['terbatas'] = fuzz.trapmf(skala_univ, [2, 4, 5, 7])
-    antecedents['jaringan_komunikasi_skala']['baik'] = fuzz.trapmf(skala_univ, [6, 8, 10, 10])
-
-    # Tingkat Insiden (Skor tinggi berarti lebih aman/jarang insiden)
-    antecedents['tingkat_insiden_skala']['tinggi'] = fuzz.trapmf(skala_univ, [0, 0, 2, 4]) # Artinya insiden sering terjadi (berisiko)
-    antecedents['tingkat_insiden_skala']['sedang'] = fuzz.trapmf(skala_univ, [3, 5, 6, 8])
-    antecedents['tingkat_insiden_skala']['rendah'] = fuzz.trapmf(skala_univ, [8, 9, 10, 10]) # Artinya insiden jarang terjadi (aman)
-
-    # Variasi Jalur
-    antecedents['variasi_jalur_skala']['tunggal'] = fuzz.trapmf(skala_univ, [0, 0, 2, 3])
-    antecedents['variasi_jalur_skala']['beberapa'] = fuzz.trapmf(skala_univ, [4, 5, 6, 7])
-    antecedents['variasi_jalur_skala']['banyak'] = fuzz.trapmf(skala_univ, [8, 9, 10, 10])
-
-    # Variabel Output: Skor Rekomendasi
-    skor_rekomendasi.automf(names=['sangat_rendah', 'rendah', 'sedang', 'tinggi', 'sangat_tinggi'])
-
-    # DEFINISI ATURAN FUZZY (RULES) SESUAI STANDAR DOKUMENTASI
-    # Aturan dirancang berdasarkan prioritas dan kriteria yang tercantum dalam 
-    # "detail standard fuzzy engine" dengan fokus pada keamanan, kenyamanan, dan pengalaman.
-    rules = [
-        # === ATURAN PRIORITAS SANGAT TINGGI (SANGAT POSITIF) ===
-        # Kombinasi ideal: Pemandangan istimewa + Keamanan tinggi + Insiden rendah
-        ctrl.Rule(antecedents['keindahan_pemandangan_skala']['istimewa'] &
-                  antecedents['keamanan_skala']['aman'] &
-                  antecedents['tingkat_insiden_skala']['rendah'],
-                  skor_rekomendasi['sangat_tinggi']),
-        
-        # Kombinasi ideal: Lanskap bervariasi + Fasilitas lengkap + Air melimpah
-        ctrl.Rule(antecedents['variasi_lanskap_skala']['sangat_bervariasi'] &
-                  antecedents['kualitas_fasilitas_skala']['lengkap'] &
-                  antecedents['ketersediaan_sumber_air_skala']['melimpah'] &
-                  antecedents['tingkat_insiden_skala']['rendah'],
-                  skor_rekomendasi['sangat_tinggi']),
-
-        # === ATURAN PRIORITAS TINGGI ===
-        # Fokus pada keamanan dan kenyamanan logistik
-        ctrl.Rule(antecedents['keamanan_skala']['aman'] &
-                  antecedents['tingkat_insiden_skala']['rendah'] &
-                  (antecedents['kesulitan_skala']['mudah'] | antecedents['kesulitan_skala']['sedang']),
-                  skor_rekomendasi['tinggi']),
-        
-        # Kualitas kemah dan perlindungan yang baik
-        ctrl.Rule(antecedents['kualitas_kemah_skala']['baik'] &
-                  antecedents['perlindungan_angin_kemah_skala']['terlindungi'] &
-                  antecedents['ketersediaan_sumber_air_skala']['melimpah'],
-                  skor_rekomendasi['tinggi']),
-        
-        # Pengalaman visual yang istimewa dengan keamanan memadai
-        ctrl.Rule(antecedents['keindahan_pemandangan_skala']['istimewa'] &
-                  antecedents['variasi_lanskap_skala']['sangat_bervariasi'] &
-                  antecedents['keamanan_skala']['aman'],
-                  skor_rekomendasi['tinggi']),
-        
-        # Fasilitas lengkap dan komunikasi baik (penting untuk keamanan)
-        ctrl.Rule(antecedents['kualitas_fasilitas_skala']['lengkap'] &
-                  antecedents['jaringan_komunikasi_skala']['baik'] &
-                  antecedents['tingkat_insiden_skala']['rendah'],
-                  skor_rekomendasi['tinggi']),
-
-        # === ATURAN PRIORITAS SEDANG ===
-        # Kondisi cukup baik dengan beberapa tantangan
-        ctrl.Rule(antecedents['kesulitan_skala']['sedang'] &
-                  antecedents['keamanan_skala']['cukup_aman'] &
-                  antecedents['tingkat_insiden_skala']['sedang'],
-                  skor_rekomendasi['sedang']),
-        
-        # Waktu menantang tapi fasilitas mendukung
-        ctrl.Rule((antecedents['estimasi_waktu_jam']['panjang'] | antecedents['ketinggian_puncak_mdpl']['tinggi']) &
-                  antecedents['kualitas_fasilitas_skala']['lengkap'] &
-                  antecedents['keamanan_skala']['aman'],
-                  skor_rekomendasi['sedang']),
-        
-        # Banyak pilihan jalur dengan kualitas cukup
-        ctrl.Rule(antecedents['variasi_jalur_skala']['banyak'] &
-                  antecedents['keamanan_skala']['cukup_aman'],
-                  skor_rekomendasi['sedang']),
-        
-        # Pemandangan indah meski fasilitas terbatas
-        ctrl.Rule(antecedents['keindahan_pemandangan_skala']['indah'] &
-                  antecedents['variasi_lanskap_skala']['cukup_bervariasi'] &
-                  antecedents['keamanan_skala']['cukup_aman'],
-                  skor_rekomendasi['sedang']),
-
-        # === ATURAN PRIORITAS RENDAH (PENALTI) ===
-        # Masalah logistik dan kenyamanan
-        ctrl.Rule(antecedents['kualitas_fasilitas_skala']['minim'] &
-                  antecedents['kualitas_kemah_skala']['buruk'],
-                  skor_rekomendasi['rendah']),
-        
-        # Masalah perlindungan dan sumber daya
-        ctrl.Rule(antecedents['perlindungan_angin_kemah_skala']['sangat_terekspos'] &
-                  antecedents['ketersediaan_sumber_air_skala']['terbatas'],
-                  skor_rekomendasi['rendah']),
-        
-        # Komunikasi buruk dan insiden sedang
-        ctrl.Rule(antecedents['jaringan_komunikasi_skala']['tidak_ada'] &
-                  antecedents['tingkat_insiden_skala']['sedang'],
-                  skor_rekomendasi['rendah']),
-        
-        # Kesulitan tinggi tanpa dukungan fasilitas
-        ctrl.Rule(antecedents['kesulitan_skala']['sulit'] &
-                  antecedents['kualitas_fasilitas_skala']['minim'] &
-                  antecedents['keamanan_skala']['cukup_aman'],
-                  skor_rekomendasi['rendah']),
-
-        # === ATURAN PRIORITAS SANGAT RENDAH (SANGAT NEGATIF) ===
-        # Masalah keamanan kritis
-        ctrl.Rule(antecedents['keamanan_skala']['berbahaya'] |
-                  antecedents['tingkat_insiden_skala']['tinggi'],
-                  skor_rekomendasi['sangat_rendah']),
-        
-        # Kombinasi berbahaya: Kesulitan tinggi + Insiden tinggi
-        ctrl.Rule(antecedents['kesulitan_skala']['sulit'] &
-                  antecedents['tingkat_insiden_skala']['tinggi'],
-                  skor_rekomendasi['sangat_rendah']),
-        
-        # Krisis logistik: Air langka + Fasilitas minim + Komunikasi tidak ada
-        ctrl.Rule(antecedents['ketersediaan_sumber_air_skala']['langka'] &
-                  antecedents['kualitas_fasilitas_skala']['minim'] &
-                  antecedents['jaringan_komunikasi_skala']['tidak_ada'],
-                  skor_rekomendasi['sangat_rendah']),
-        
-        # Kondisi ekstrem: Ekspedisi + Berbahaya + Air langka
-        ctrl.Rule(antecedents['estimasi_waktu_jam']['ekspedisi'] &
-                  antecedents['keamanan_skala']['berbahaya'] &
-                  antecedents['ketersediaan_sumber_air_skala']['langka'],
-                  skor_rekomendasi['sangat_rendah'])
-    ]
-
-    # === RULE FALLBACK ===
-    # Jika tidak ada rule lain yang match, set skor ke 'sedang' (catch-all)
-    # Fallback: gunakan OR semua antecedent utama pada kondisi "normal" (misal: sedang)
-    fallback_condition = (
-        (antecedents['keamanan_skala']['cukup_aman'] |
-         antecedents['kesulitan_skala']['sedang'] |
-         antecedents['ketersediaan_sumber_air_skala']['terbatas'] |
-         antecedents['kualitas_fasilitas_skala']['cukup'] |
-         antecedents['kualitas_kemah_skala']['cukup'] |
-         antecedents['keindahan_pemandangan_skala']['indah'] |
-         antecedents['variasi_lanskap_skala']['cukup_bervariasi'] |
-         antecedents['perlindungan_angin_kemah_skala']['cukup_terlindungi'] |
-         antecedents['jaringan_komunikasi_skala']['terbatas'] |
-         antecedents['tingkat_insiden_skala']['sedang'] |
-         antecedents['variasi_jalur_skala']['beberapa'] |
-         antecedents['estimasi_waktu_jam']['sedang'] |
-         antecedents['ketinggian_puncak_mdpl']['sedang'])
-    )
-    rules.append(ctrl.Rule(fallback_condition, skor_rekomendasi['sedang']))
-
-    # Sistem Kontrol dan Simulasi
-    sistem_kontrol = ctrl.ControlSystem(rules)
-    simulasi = ctrl.ControlSystemSimulation(sistem_kontrol)
-
-    # Filter data berdasarkan preferensi pengguna jika ada
-    if preferensi_pengguna:
-        df_filtered = df_jalur.copy()
-        filter_applied = []
+def simpan_kompilasi(kompilasi, path):
+    """Menyimpan artefak kompilasi sebagai .npz (tanpa pickle); ditulis atomik via os.replace."""
+    meta = {k: kompilasi[k] for k in (
+        "versi", "variabel", "universe_batas", "term_kolom", "term_nama", "aturan", "nama_output")}
+    meta["format"] = FORMAT_ARTEFAK
+    meta["lut"] = list(kompilasi["lut"])
+    array = {
+        "term_abcd": kompilasi["term_abcd"],
+        "universe_output": kompilasi["universe_output"],
+        "abc_output": kompilasi["abc_output"],
+    }
+    for label, tabel in kompilasi["lut"].items():
+        array[f"lut__{label}"] = tabel
+    sementara = f"{path}.{os.getpid()}.tmp"
+    with open(sementara, "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **array)
+    os.replace(sementara, path)
+
+def muat_kompilasi(path):
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.pop("format") != FORMAT_ARTEFAK:
+            raise ValueError("format artefak berbeda")
+        kompilasi = dict(meta)
+        kompilasi["lut"] = {label: data[f"lut__{label}"] for label in meta["lut"]}
+        kompilasi["term_abcd"] = data["term_abcd"]
+        kompilasi["universe_output"] = data["universe_output"]
+        kompilasi["abc_output"] = data["abc_output"]
+    return kompilasi
+
+class FuzzyEngine:
+    """
+    Fuzzy engine yang dikompilasi sekali lalu dipakai ulang oleh proses_rekomendasi,
+    worker (--serve), jalankan_simulasi, dan analisis distribusi.
+    """
+
+    def __init__(self, kompilasi, definisi=DEFINISI_FUZZY):
+        self.kompilasi = kompilasi
+        self.definisi = definisi
+        self.versi = kompilasi["versi"]
+        self.variabel = kompilasi["variabel"]
+        self._sistem_skfuzzy = None
+
+    @classmethod
+    def muat(cls, definisi=DEFINISI_FUZZY, direktori_cache=None):
+        """Memuat artefak dari cache disk (kunci: hash definisi) atau mengompilasi lalu menyimpannya."""
+        direktori_cache = direktori_cache or DIREKTORI_CACHE
+        path = os.path.join(direktori_cache, f"fuzzy_engine_v{FORMAT_ARTEFAK}_{hash_definisi(definisi)}.npz")
+        if os.path.exists(path):
+            try:
+                return cls(muat_kompilasi(path), definisi)
+            except Exception as e:
+                print(f"⚠️ Artefak engine tidak valid, dikompilasi ulang: {e}", file=sys.stderr)
+        kompilasi = kompilasi_definisi(definisi)
         try:
-            # Filter kesulitan maksimal
-            if preferensi_pengguna.get('max_kesulitan_skala') is not None:
-                if cek_kolom(df_filtered, 'kesulitan_skala'):
-                    df_filtered = df_filtered[df_filtered['kesulitan_skala'] <= preferensi_pengguna['max_kesulitan_skala']]
-                    filter_applied.append(f"Kesulitan ≤ {preferensi_pengguna['max_kesulitan_skala']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'kesulitan_skala' tidak ditemukan saat filter max_kesulitan_skala", file=sys.stderr)
-            # Filter keamanan minimal
-            if preferensi_pengguna.get('min_keamanan_skala') is not None:
-                if cek_kolom(df_filtered, 'keamanan_skala'):
-                    df_filtered = df_filtered[df_filtered['keamanan_skala'] >= preferensi_pengguna['min_keamanan_skala']]
-                    filter_applied.append(f"Keamanan ≥ {preferensi_pengguna['min_keamanan_skala']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'keamanan_skala' tidak ditemukan saat filter min_keamanan_skala", file=sys.stderr)
-            # Filter waktu maksimal (dalam jam)
-            if preferensi_pengguna.get('max_estimasi_waktu_jam') is not None:
-                if cek_kolom(df_filtered, 'estimasi_waktu_jam'):
-                    df_filtered = df_filtered[df_filtered['estimasi_waktu_jam'] <= preferensi_pengguna['max_estimasi_waktu_jam']]
-                    filter_applied.append(f"Waktu ≤ {preferensi_pengguna['max_estimasi_waktu_jam']} jam")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'estimasi_waktu_jam' tidak ditemukan saat filter max_estimasi_waktu_jam", file=sys.stderr)
-            # Filter ketinggian maksimal
-            if preferensi_pengguna.get('max_ketinggian_mdpl') is not None:
-                if cek_kolom(df_filtered, 'ketinggian_puncak_mdpl'):
-                    df_filtered = df_filtered[df_filtered['ketinggian_puncak_mdpl'] <= preferensi_pengguna['max_ketinggian_mdpl']]
-                    filter_applied.append(f"Ketinggian ≤ {preferensi_pengguna['max_ketinggian_mdpl']} mdpl")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'ketinggian_puncak_mdpl' tidak ditemukan saat filter max_ketinggian_mdpl", file=sys.stderr)
-            # Filter ketersediaan air minimal
-            if preferensi_pengguna.get('min_ketersediaan_air') is not None:
-                if cek_kolom(df_filtered, 'ketersediaan_sumber_air_skala'):
-                    df_filtered = df_filtered[df_filtered['ketersediaan_sumber_air_skala'] >= preferensi_pengguna['min_ketersediaan_air']]
-                    filter_applied.append(f"Air ≥ {preferensi_pengguna['min_ketersediaan_air']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'ketersediaan_sumber_air_skala' tidak ditemukan saat filter min_ketersediaan_air", file=sys.stderr)
-            # Filter pemandangan minimal (pastikan key konsisten)
-            if preferensi_pengguna.get('min_keindahan_pemandangan_skala') is not None:
-                if cek_kolom(df_filtered, 'keindahan_pemandangan_skala'):
-                    df_filtered = df_filtered[df_filtered['keindahan_pemandangan_skala'] >= preferensi_pengguna['min_keindahan_pemandangan_skala']]
-                    filter_applied.append(f"Pemandangan ≥ {preferensi_pengguna['min_keindahan_pemandangan_skala']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'keindahan_pemandangan_skala' tidak ditemukan saat filter min_keindahan_pemandangan_skala", file=sys.stderr)
-            # Backward compatibility: jika frontend kirim 'min_keindahan_pemandangan'
-            elif preferensi_pengguna.get('min_keindahan_pemandangan') is not None:
-                if cek_kolom(df_filtered, 'keindahan_pemandangan_skala'):
-                    df_filtered = df_filtered[df_filtered['keindahan_pemandangan_skala'] >= preferensi_pengguna['min_keindahan_pemandangan']]
-                    filter_applied.append(f"Pemandangan ≥ {preferensi_pengguna['min_keindahan_pemandangan']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'keindahan_pemandangan_skala' tidak ditemukan saat filter min_keindahan_pemandangan", file=sys.stderr)
-            # Filter jaringan komunikasi minimal
-            if preferensi_pengguna.get('min_jaringan_komunikasi') is not None:
-                if cek_kolom(df_filtered, 'jaringan_komunikasi_skala'):
-                    df_filtered = df_filtered[df_filtered['jaringan_komunikasi_skala'] >= preferensi_pengguna['min_jaringan_komunikasi']]
-                    filter_applied.append(f"Jaringan Komunikasi ≥ {preferensi_pengguna['min_jaringan_komunikasi']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'jaringan_komunikasi_skala' tidak ditemukan saat filter min_jaringan_komunikasi", file=sys.stderr)
-            # Filter kualitas fasilitas minimal
-            if preferensi_pengguna.get('min_kualitas_fasilitas_skala') is not None:
-                if cek_kolom(df_filtered, 'kualitas_fasilitas_skala'):
-                    df_filtered = df_filtered[df_filtered['kualitas_fasilitas_skala'] >= preferensi_pengguna['min_kualitas_fasilitas_skala']]
-                    filter_applied.append(f"Fasilitas ≥ {preferensi_pengguna['min_kualitas_fasilitas_skala']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'kualitas_fasilitas_skala' tidak ditemukan saat filter min_kualitas_fasilitas_skala", file=sys.stderr)
-            # Filter kualitas kemah minimal
-            if preferensi_pengguna.get('min_kualitas_kemah_skala') is not None:
-                if cek_kolom(df_filtered, 'kualitas_kemah_skala'):
-                    df_filtered = df_filtered[df_filtered['kualitas_kemah_skala'] >= preferensi_pengguna['min_kualitas_kemah_skala']]
-                    filter_applied.append(f"Kemah ≥ {preferensi_pengguna['min_kualitas_kemah_skala']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'kualitas_kemah_skala' tidak ditemukan saat filter min_kualitas_kemah_skala", file=sys.stderr)
-            # Filter perlindungan angin minimal
-            if preferensi_pengguna.get('min_perlindungan_angin') is not None:
-                if cek_kolom(df_filtered, 'perlindungan_angin_kemah_skala'):
-                    df_filtered = df_filtered[df_filtered['perlindungan_angin_kemah_skala'] >= preferensi_pengguna['min_perlindungan_angin']]
-                    filter_applied.append(f"Perlindungan Angin ≥ {preferensi_pengguna['min_perlindungan_angin']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'perlindungan_angin_kemah_skala' tidak ditemukan saat filter min_perlindungan_angin", file=sys.stderr)
-            # Filter tingkat keamanan insiden minimal
-            if preferensi_pengguna.get('min_tingkat_keamanan_insiden') is not None:
-                if cek_kolom(df_filtered, 'tingkat_insiden_skala'):
-                    df_filtered = df_filtered[df_filtered['tingkat_insiden_skala'] >= preferensi_pengguna['min_tingkat_keamanan_insiden']]
-                    filter_applied.append(f"Tingkat Keamanan Insiden ≥ {preferensi_pengguna['min_tingkat_keamanan_insiden']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'tingkat_insiden_skala' tidak ditemukan saat filter min_tingkat_keamanan_insiden", file=sys.stderr)
-            # Filter variasi lanskap minimal
-            if preferensi_pengguna.get('min_variasi_lanskap') is not None:
-                if cek_kolom(df_filtered, 'variasi_lanskap_skala'):
-                    df_filtered = df_filtered[df_filtered['variasi_lanskap_skala'] >= preferensi_pengguna['min_variasi_lanskap']]
-                    filter_applied.append(f"Variasi Lanskap ≥ {preferensi_pengguna['min_variasi_lanskap']}")
-                else:
-                    print(f"[FILTER ERROR] Kolom 'variasi_lanskap_skala' tidak ditemukan saat filter min_variasi_lanskap", file=sys.stderr)
-        except Exception as filter_error:
-            print(f"[FILTER EXCEPTION] Terjadi error saat proses filter preferensi: {filter_error}", file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
-        print(f"✅ Filter diterapkan: {', '.join(filter_applied) if filter_applied else 'Tidak ada'}", file=sys.stderr)
-        print(f"✅ Jalur tersisa setelah filter: {len(df_filtered)} dari {len(df_jalur)}", file=sys.stderr)
-        df_jalur = df_filtered
-    if df_jalur.empty:
-        return pd.DataFrame(), pd.DataFrame()
+            os.makedirs(direktori_cache, exist_ok=True)
+            simpan_kompilasi(kompilasi, path)
+        except OSError as e:
+            print(f"⚠️ Artefak engine tidak bisa disimpan ke {path}: {e}", file=sys.stderr)
+        return cls(kompilasi, definisi)
 
-    # Hitung skor untuk setiap jalur yang tersisa dengan sistem bobot
-    skor_list = []
-    kriteria_weights = {
-        # Bobot berdasarkan prioritas dari dokumentasi standar
-        'keamanan_skala': 0.15,  # Prioritas tertinggi - keselamatan
-        'tingkat_insiden_skala': 0.12,  # Sangat penting - track record keamanan
-        'kesulitan_skala': 0.10,  # Penting untuk kesesuaian level pendaki
-        'ketersediaan_sumber_air_skala': 0.10,  # Krusial untuk logistik
-        'kualitas_fasilitas_skala': 0.08,  # Penting untuk kenyamanan
-        'keindahan_pemandangan_skala': 0.08,  # Pengalaman visual
-        'kualitas_kemah_skala': 0.07,  # Kenyamanan bermalam
-        'variasi_lanskap_skala': 0.07,  # Keragaman pengalaman
-        'estimasi_waktu_jam': 0.06,  # Perencanaan logistik
-        'ketinggian_puncak_mdpl': 0.05,  # Risiko altitude sickness
-        'perlindungan_angin_kemah_skala': 0.05,  # Kenyamanan kemah
-        'jaringan_komunikasi_skala': 0.04,  # Keamanan komunikasi
-        'variasi_jalur_skala': 0.03   # Fleksibilitas pilihan
-    }
-    
-    for idx, row in df_jalur.iterrows():
+    def derajat_keanggotaan(self, X):
+        """Derajat keanggotaan (N, jumlah_term) dengan urutan kompilasi["term_nama"]."""
+        return _fuzzifikasi(self.kompilasi, np.asarray(X, dtype=float))
+
+    def skor_fuzzy(self, X):
+        """Skor fuzzy (centroid) dan mask 'tanpa aturan aktif' untuk matriks input (N, 13)."""
+        return inferensi_batch(self.kompilasi, X)
+
+    def sistem_skfuzzy(self):
+        """(antecedents, ControlSystemSimulation) dari definisi yang sama; dibangun hanya jika diminta."""
+        if self._sistem_skfuzzy is None:
+            antecedents, _, rules = bangun_control_system(self.definisi)
+            simulasi = ctrl.ControlSystemSimulation(ctrl.ControlSystem(rules))
+            self._sistem_skfuzzy = (antecedents, simulasi)
+        return self._sistem_skfuzzy
+
+    def skor_fuzzy_referensi(self, X):
+        """Skor via ControlSystemSimulation per baris (untuk verifikasi kernel)."""
+        antecedents, simulasi = self.sistem_skfuzzy()
+        return inferensi_skfuzzy(antecedents, simulasi, X)
+
+_ENGINE = None
+
+def dapatkan_engine():
+    """Factory tingkat modul: engine dibangun (atau dimuat dari cache) sekali per proses."""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = FuzzyEngine.muat()
+    return _ENGINE
+
+# 3.2 Kernel Inferensi Batch (Vektorisasi)
+# Batas selisih skor kernel terhadap ControlSystemSimulation (pembulatan floating point)
+TOLERANSI_INFERENSI = 1e-6
+# Log [DEBUG] input dan derajat keanggotaan per baris (mahal untuk ribuan jalur); aktifkan dengan FUZZY_DEBUG=1
+DEBUG_PER_BARIS = os.getenv("FUZZY_DEBUG") == "1"
+
+def _trimf_analitik(x, abc):
+    """trimf untuk titik sembarang; identik dengan interpolasi trimf pada universe berjarak 1."""
+    a, b, c = abc
+    kiri = (x - a) / (b - a) if a != b else np.zeros_like(x)
+    kanan = (c - x) / (c - b) if b != c else np.zeros_like(x)
+    y = np.where(x < b, kiri, kanan)
+    y = np.where(x == b, 1.0, y)
+    return np.where((x <= a) | (x >= c), np.where(x == b, 1.0, 0.0), y)
+
+def _trapmf_analitik(x, abcd):
+    """
+    trapmf bentuk tertutup: x (N,) terhadap parameter (T, 4) menjadi (N, T).
+    Sama dengan fuzz.trapmf termasuk bahu a == b / c == d; karena semua titik patah ada
+    pada grid universe, hasilnya identik dengan interpolasi MF yang disampel skfuzzy.
+    """
+    x = np.asarray(x, dtype=float)[:, None]
+    a, b, c, d = abcd.T
+    naik = np.where(b > a, (x - a) / np.where(b > a, b - a, 1.0), 1.0)
+    turun = np.where(d > c, (d - x) / np.where(d > c, d - c, 1.0), 1.0)
+    y = np.clip(np.minimum(naik, turun), 0.0, 1.0)
+    return np.where((x < a) | (x > d), 0.0, y)
+
+def _fuzzifikasi(kompilasi, X):
+    """
+    Input di-clip ke universe (seperti skfuzzy) lalu dievaluasi per variabel: kolom yang
+    seluruhnya bilangan bulat memakai tabel LUT, sisanya (jam, mdpl pecahan) rumus trapmf.
+    """
+    derajat = np.empty((len(X), len(kompilasi["term_nama"])))
+    term_kolom = np.asarray(kompilasi["term_kolom"])
+    for kolom, label in enumerate(kompilasi["variabel"]):
+        bawah, atas = kompilasi["universe_batas"][label]
+        x = np.fmax(np.fmin(X[:, kolom], atas), bawah)
+        indeks = np.flatnonzero(term_kolom == kolom)
+        tabel = kompilasi["lut"].get(label)
+        if tabel is not None and np.array_equal(x, np.floor(x)):
+            derajat[:, indeks] = tabel[(x - bawah).astype(np.intp)]
+        else:
+            derajat[:, indeks] = _trapmf_analitik(x, kompilasi["term_abcd"][indeks])
+    return derajat
+
+def _evaluasi_kondisi(kondisi, derajat):
+    if kondisi[0] == 'term':
+        return derajat[:, kondisi[1]]
+    nilai = [_evaluasi_kondisi(anak, derajat) for anak in kondisi[1]]
+    return reduce(np.fmin if kondisi[0] == 'and' else np.fmax, nilai)
+
+def inferensi_batch(kompilasi, X, ukuran_chunk=4096):
+    """
+    Inferensi Mamdani untuk N jalur sekaligus.
+
+    X berbentuk (N, 13) dengan urutan kolom kompilasi["variabel"]. Mengembalikan
+    (skor, gagal): skor centroid per jalur dan mask jalur tanpa aturan aktif
+    (ControlSystemSimulation tidak menghasilkan output; skornya di sini 0).
+    Semantik mengikuti skfuzzy: input di-clip ke universe, AND=fmin, OR=fmax,
+    akumulasi=fmax, dan universe output di-upsample pada titik potong tiap term
+    sebelum centroid luas potongan linear dihitung.
+    """
+    X = np.asarray(X, dtype=float)
+    n = X.shape[0]
+    skor = np.zeros(n)
+    gagal = np.zeros(n, dtype=bool)
+    universe = kompilasi["universe_output"]
+    abc = kompilasi["abc_output"]
+    for awal in range(0, n, ukuran_chunk):
+        blok = X[awal:awal + ukuran_chunk]
+        derajat = _fuzzifikasi(kompilasi, blok)
+
+        # Evaluasi rules dan akumulasi fmax per term output
+        aktivasi = np.zeros((len(blok), len(abc)))
+        for kondisi, k, bobot in kompilasi["aturan"]:
+            aktivasi[:, k] = np.fmax(aktivasi[:, k], _evaluasi_kondisi(kondisi, derajat) * bobot)
+        # Titik potong setiap term pada level aktivasinya, digabung dengan universe output
+        potong = np.concatenate([
+            abc[:, 0] + aktivasi * (abc[:, 1] - abc[:, 0]),
+            abc[:, 2] - aktivasi * (abc[:, 2] - abc[:, 1]),
+        ], axis=1)
+        potong = np.clip(potong, universe.min(), universe.max())
+        titik = np.sort(np.concatenate(
+            [np.broadcast_to(universe, (len(blok), len(universe))), potong], axis=1), axis=1)
+
+        # Agregasi: max_k min(aktivasi_k, mf_k(x))
+        agregat = np.zeros_like(titik)
+        for k in range(len(abc)):
+            np.maximum(agregat, np.minimum(aktivasi[:, k:k + 1], _trimf_analitik(titik, abc[k])), out=agregat)
+
+        # Centroid tepat untuk fungsi potongan linear (rumus skfuzzy.defuzzify.centroid)
+        x1, x2 = titik[:, :-1], titik[:, 1:]
+        y1, y2 = agregat[:, :-1], agregat[:, 1:]
+        d = x2 - x1
+        luas = 0.5 * d * (y1 + y2)
+        momen = d * d * (y2 + 0.5 * y1) / 3.0 + x1 * luas
+        total_luas = luas.sum(axis=1)
+        skor[awal:awal + len(blok)] = momen.sum(axis=1) / np.fmax(total_luas, np.finfo(float).eps)
+        gagal[awal:awal + len(blok)] = aktivasi.sum(axis=1) == 0
+    skor[gagal] = 0
+    return skor, gagal
+
+def inferensi_skfuzzy(antecedents, simulasi, X):
+    """Jalur referensi per baris via ControlSystemSimulation (untuk verifikasi kernel)."""
+    skor = np.zeros(len(X))
+    for i, baris in enumerate(np.asarray(X, dtype=float)):
+        for kolom, label in enumerate(antecedents):
+            simulasi.input[label] = baris[kolom]
+        simulasi.compute()
+        skor[i] = simulasi.output.get('skor_rekomendasi', 0)
+    return skor
+
+# 3.3 Materialisasi Skor
+# Batas bawah setiap kategori (naik); skor di bawah batas pertama (atau NaN) masuk kategori terendah
+BATAS_KATEGORI = np.array([35, 50, 65, 80])
+LABEL_KATEGORI = np.array([
+    "Tidak Direkomendasikan", "Kurang Direkomendasikan", "Cukup Direkomendasikan",
+    "Direkomendasikan", "Sangat Direkomendasikan",
+])
+
+def kategorikan_rekomendasi(skor):
+    """Kategori rekomendasi berdasarkan skor (dipakai untuk jalur maupun gunung)."""
+    return str(kategorikan_vektor([skor])[0])
+
+def kategorikan_vektor(skor):
+    """kategorikan_rekomendasi untuk satu array skor sekaligus (binning searchsorted)."""
+    skor = np.asarray(skor, dtype=float)
+    kelas = np.searchsorted(BATAS_KATEGORI, skor, side='right')
+    return LABEL_KATEGORI[np.where(np.isnan(skor), 0, kelas)]
+
+# Bobot kriteria komponen weighted (urutan ini juga urutan akumulasi skornya)
+BOBOT_KRITERIA = {
+    # Bobot berdasarkan prioritas dari dokumentasi standar
+    'keamanan_skala': 0.15,  # Prioritas tertinggi - keselamatan
+    'tingkat_insiden_skala': 0.12,  # Sangat penting - track record keamanan
+    'kesulitan_skala': 0.10,  # Penting untuk kesesuaian level pendaki
+    'ketersediaan_sumber_air_skala': 0.10,  # Krusial untuk logistik
+    'kualitas_fasilitas_skala': 0.08,  # Penting untuk kenyamanan
+    'keindahan_pemandangan_skala': 0.08,  # Pengalaman visual
+    'kualitas_kemah_skala': 0.07,  # Kenyamanan bermalam
+    'variasi_lanskap_skala': 0.07,  # Keragaman pengalaman
+    'estimasi_waktu_jam': 0.06,  # Perencanaan logistik
+    'ketinggian_puncak_mdpl': 0.05,  # Risiko altitude sickness
+    'perlindungan_angin_kemah_skala': 0.05,  # Kenyamanan kemah
+    'jaringan_komunikasi_skala': 0.04,  # Keamanan komunikasi
+    'variasi_jalur_skala': 0.03   # Fleksibilitas pilihan
+}
+KRITERIA = list(BOBOT_KRITERIA)
+# Skor akhir = RASIO_FUZZY * skor fuzzy + RASIO_KRITERIA * weighted score
+RASIO_FUZZY = 0.7
+RASIO_KRITERIA = 0.3
+# (vektor bobot sesuai KRITERIA, rasio fuzzy, rasio weighted)
+BOBOT_BAWAAN = (np.array(list(BOBOT_KRITERIA.values())), RASIO_FUZZY, RASIO_KRITERIA)
+
+def baca_bobot(preferensi_pengguna):
+    """
+    Bobot per permintaan dari preferensi: "bobot_kriteria" ({kriteria: bobot}, kriteria yang
+    tidak disebut memakai bobot bawaan, lalu dinormalisasi agar berjumlah 1) dan "rasio_fuzzy"
+    (0-1, porsi skor fuzzy; sisanya weighted). None berarti bobot bawaan.
+    """
+    preferensi_pengguna = preferensi_pengguna or {}
+    if 'bobot_kriteria' not in preferensi_pengguna and 'rasio_fuzzy' not in preferensi_pengguna:
+        return None
+    bobot = dict(BOBOT_KRITERIA)
+    diubah = False
+    masukan = preferensi_pengguna.get('bobot_kriteria') or {}
+    if not isinstance(masukan, dict):
+        print(f"[FILTER ERROR] Nilai bobot_kriteria={masukan!r} tidak valid: harus objek", file=sys.stderr)
+        masukan = {}
+    for kriteria, nilai in masukan.items():
         try:
+            if kriteria not in bobot:
+                raise ValueError("kriteria tidak dikenal")
+            nilai = float(nilai)
+            if not np.isfinite(nilai) or nilai < 0:
+                raise ValueError("harus angka tidak negatif")
+            bobot[kriteria] = nilai
+            diubah = True
+        except (TypeError, ValueError) as e:
+            print(f"[FILTER ERROR] Bobot {kriteria}={nilai!r} tidak valid: {e}", file=sys.stderr)
+    vektor = np.array(list(bobot.values()))
+    if diubah:
+        if vektor.sum() <= 0:
+            print("[FILTER ERROR] Jumlah bobot_kriteria harus lebih dari 0, bobot bawaan dipakai", file=sys.stderr)
+            vektor = BOBOT_BAWAAN[0]
+        else:
+            vektor = vektor / vektor.sum()
+    rasio = preferensi_pengguna.get('rasio_fuzzy', RASIO_FUZZY)
+    try:
+        rasio = float(rasio)
+        if not 0 <= rasio <= 1:
+            raise ValueError("harus di antara 0 dan 1")
+    except (TypeError, ValueError) as e:
+        print(f"[FILTER ERROR] Nilai rasio_fuzzy={rasio!r} tidak valid: {e}", file=sys.stderr)
+        rasio = RASIO_FUZZY
+    return vektor, rasio, RASIO_KRITERIA if rasio == RASIO_FUZZY else 1.0 - rasio
+
+def normalisasi_kriteria(X):
+    """Nilai kriteria (N, 13, urutan KRITERIA) -> skala 0-100 seperti penilaian per baris sebelumnya."""
+    N = X / 10 * 100
+    waktu, tinggi = KRITERIA.index('estimasi_waktu_jam'), KRITERIA.index('ketinggian_puncak_mdpl')
+    N[:, waktu] = np.maximum(0, 100 - (X[:, waktu] / 100 * 100))
+    N[:, tinggi] = np.minimum(100, (X[:, tinggi] / 5500) * 100)
+    return N
+
+def gabung_skor(skor_fuzzy, df_jalur, bobot=None):
+    """
+    Skor akhir dari skor fuzzy (tersimpan per jalur) dan komponen weighted.
+
+    Komponen weighted adalah matriks kriteria ternormalisasi (N, 13) dikali vektor bobot;
+    perkaliannya diakumulasi per kolom dengan urutan KRITERIA agar bobot bawaan memberi
+    hasil yang sama persis dengan penjumlahan per baris sebelumnya. Sel NaN tidak
+    dihitung; jalur tanpa satu pun kriteria berbobot hanya memakai skor fuzzy.
+    """
+    vektor, rasio_fuzzy, rasio_kriteria = bobot or BOBOT_BAWAAN
+    X = df_jalur[KRITERIA].to_numpy(dtype=float)
+    ada = ~np.isnan(X)
+    with np.errstate(invalid='ignore'):
+        N = normalisasi_kriteria(X)
+    weighted_score = np.zeros(len(X))
+    total_weight = np.zeros(len(X))
+    for k, weight in enumerate(vektor):
+        weighted_score += np.where(ada[:, k], N[:, k] * weight, 0.0)
+        total_weight += np.where(ada[:, k], weight, 0.0)
+    skor_fuzzy = np.asarray(skor_fuzzy, dtype=float)
+    return np.where(total_weight > 0, (skor_fuzzy * rasio_fuzzy) + (weighted_score * rasio_kriteria), skor_fuzzy)
+
+def hitung_skor_fuzzy(df_jalur, engine=None, paralel=None):
+    """
+    Skor fuzzy (centroid) setiap baris df_jalur; bagian mahal yang disimpan per jalur.
+    paralel (PoolSkor, opsional): katalog besar dibagi ke beberapa proses.
+    """
+    if paralel is not None and paralel.layak(len(df_jalur)):
+        return paralel.hitung(df_jalur)
+    engine = engine or dapatkan_engine()
+    variabel_input = engine.variabel
+
+    # Komputasi fuzzy untuk semua jalur sekaligus (kernel batch, lihat inferensi_batch)
+    X = df_jalur[variabel_input].to_numpy(dtype=float)
+    skor_fuzzy_batch, fuzzy_gagal = engine.skor_fuzzy(X)
+    if DEBUG_PER_BARIS:
+        derajat = engine.derajat_keanggotaan(X)
+        term_per_variabel = {key: [] for key in variabel_input}
+        for j, nama in enumerate(engine.kompilasi["term_nama"]):
+            key, label = nama.split(".", 1)
+            term_per_variabel[key].append((label, j))
+        for posisi, idx in enumerate(df_jalur.index):
             # Debug: print input ke fuzzy engine
-            print(f"[DEBUG] Input fuzzy baris {idx}: {{}}".format({k: row[k] for k in antecedents}), file=sys.stderr)
+            print(f"[DEBUG] Input fuzzy baris {idx}: {{}}".format(dict(zip(variabel_input, X[posisi]))), file=sys.stderr)
             # Debug: print degree of membership untuk setiap input
-            for key, ant in antecedents.items():
-                memberships = {label: fuzz.interp_membership(ant.universe, ant[label].mf, row[key]) for label in ant.terms}
+            for key, daftar_term in term_per_variabel.items():
+                memberships = {label: derajat[posisi, j] for label, j in daftar_term}
                 print(f"[DEBUG] Membership {key}: {memberships}", file=sys.stderr)
-            # Cek NaN pada input
-            for key in antecedents:
-                if pd.isna(row[key]):
-                    print(f"[ERROR] Nilai {key} pada baris {idx} adalah NaN!", file=sys.stderr)
-                simulasi.input[key] = row[key]
-            # Menjalankan komputasi fuzzy
-            simulasi.compute()
-            # Tangani KeyError pada output
-            if 'skor_rekomendasi' in simulasi.output:
-                skor_fuzzy = simulasi.output['skor_rekomendasi']
+
+    # Hanya baris bermasalah yang dilaporkan: input NaN, atau tidak ada aturan yang aktif
+    # (skfuzzy tidak menghasilkan output, skor fuzzy dianggap 0)
+    kosong = np.isnan(X)
+    for posisi in np.flatnonzero(kosong.any(axis=1) | fuzzy_gagal):
+        idx = df_jalur.index[posisi]
+        for kolom in np.flatnonzero(kosong[posisi]):
+            print(f"[ERROR] Nilai {variabel_input[kolom]} pada baris {idx} adalah NaN!", file=sys.stderr)
+        if fuzzy_gagal[posisi]:
+            print(f"[ERROR] Fuzzy output tidak menghasilkan skor_rekomendasi pada baris {idx}!", file=sys.stderr)
+    return skor_fuzzy_batch
+
+def hitung_skor_jalur(df_jalur, engine=None, paralel=None, bobot=None):
+    """
+    Skor akhir (0.7 fuzzy + 0.3 weighted, atau bobot dari baca_bobot) untuk setiap baris df_jalur.
+    Skor hanya bergantung pada atribut jalur, bukan filter preferensi pengguna.
+    """
+    return gabung_skor(hitung_skor_fuzzy(df_jalur, engine, paralel), df_jalur, bobot)
+
+# Agregasi per gunung tanpa groupby: segmen (id_gunung, nama_gunung) direduksi dengan ufunc.reduceat
+def _segmen_gunung(df_jalur):
+    """(urutan, awal, kunci): posisi baris terurut per gunung, awal tiap segmen, dan kunci gunung."""
+    kode_id, unik_id = pd.factorize(df_jalur['id_gunung'], sort=True)
+    kode_nama, unik_nama = pd.factorize(df_jalur['nama_gunung'], sort=True)
+    # Baris dengan kunci kosong tidak masuk grup mana pun (seperti groupby dropna=True)
+    valid = np.flatnonzero((kode_id >= 0) & (kode_nama >= 0))
+    kode = kode_id[valid].astype(np.int64) * max(len(unik_nama), 1) + kode_nama[valid]
+    urutan_kode = np.argsort(kode, kind='stable')
+    urutan = valid[urutan_kode]
+    kode = kode[urutan_kode]
+    awal = np.flatnonzero(np.r_[True, kode[1:] != kode[:-1]]) if len(kode) else np.empty(0, dtype=np.intp)
+    # Kunci object (mis. nama dengan None) disimpulkan ulang seperti indeks hasil groupby
+    kunci = pd.DataFrame({
+        'id_gunung': unik_id.take(kode[awal] // max(len(unik_nama), 1)).infer_objects(),
+        'nama_gunung': unik_nama.take(kode[awal] % max(len(unik_nama), 1)).infer_objects(),
+    })
+    return urutan, awal, kunci
+
+def _rata_rata_segmen(nilai, awal, panjang):
+    """Rata-rata per segmen dengan penjumlahan Kahan berurutan seperti groupby.mean pandas."""
+    jumlah = np.zeros(len(awal))
+    kompensasi = np.zeros(len(awal))
+    cacah = np.zeros(len(awal), dtype=np.int64)
+    for langkah in range(int(panjang.max(initial=0))):
+        grup = np.flatnonzero(panjang > langkah)
+        x = nilai[awal[grup] + langkah]
+        ada = ~np.isnan(x)
+        grup, x = grup[ada], x[ada]
+        cacah[grup] += 1
+        y = x - kompensasi[grup]
+        t = jumlah[grup] + y
+        k = t - jumlah[grup] - y
+        kompensasi[grup] = np.where(np.isnan(k), 0.0, k)
+        jumlah[grup] = t
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(cacah > 0, jumlah / np.maximum(cacah, 1), np.nan)
+
+def _pertama_segmen(kolom, urutan, awal, panjang):
+    """Nilai non-kosong pertama per segmen (agregasi 'first'), dtype kolom dipertahankan."""
+    terurut = kolom.iloc[urutan]
+    ada = terurut.notna().to_numpy()
+    posisi = np.where(ada, np.arange(len(terurut)), len(terurut))
+    pertama = np.minimum.reduceat(posisi, awal) if len(awal) else np.empty(0, dtype=np.intp)
+    kosong = pertama >= awal + panjang
+    hasil = terurut.iloc[np.where(kosong, awal, pertama)].reset_index(drop=True)
+    return hasil.mask(kosong) if kosong.any() else hasil
+
+def agregasi_gunung(df_jalur):
+    """Agregat per gunung (belum diurutkan) dari jalur yang sudah memiliki skor_rekomendasi."""
+    urutan, awal, df_gunung = _segmen_gunung(df_jalur)
+    panjang = np.diff(np.append(awal, len(urutan)))
+    skor = df_jalur['skor_rekomendasi'].to_numpy(dtype=float)[urutan]
+    if len(awal):
+        skor_tertinggi = np.fmax.reduceat(skor, awal)
+        # Jalur terbaik: baris pertama (urutan asli) yang mencapai skor tertinggi gunungnya
+        posisi = np.where(skor == np.repeat(skor_tertinggi, panjang), np.arange(len(skor)), len(skor))
+        terbaik = urutan[np.minimum.reduceat(posisi, awal)]
+    else:
+        skor_tertinggi, terbaik = np.empty(0), np.empty(0, dtype=np.intp)
+
+    def ekstrem(kolom, ufunc):
+        nilai = df_jalur[kolom].to_numpy()[urutan]
+        if nilai.dtype.kind == 'f':
+            ufunc = np.fmin if ufunc is np.minimum else np.fmax
+        return ufunc.reduceat(nilai, awal) if len(awal) else nilai[:0]
+
+    df_gunung['skor_tertinggi'] = skor_tertinggi
+    df_gunung['skor_rata_rata'] = _rata_rata_segmen(skor, awal, panjang)
+    df_gunung['jumlah_jalur'] = np.add.reduceat(df_jalur['id_jalur'].notna().to_numpy()[urutan].astype(np.int64),
+                                                awal) if len(awal) else np.empty(0, dtype=np.int64)
+    df_gunung['jalur_terbaik'] = df_jalur['nama_jalur'].iloc[terbaik].to_numpy()
+    df_gunung['kesulitan_terendah'] = ekstrem('kesulitan_skala', np.minimum)
+    df_gunung['kesulitan_tertinggi'] = ekstrem('kesulitan_skala', np.maximum)
+    df_gunung['keamanan_rata_rata'] = _rata_rata_segmen(
+        df_jalur['keamanan_skala'].to_numpy(dtype=float)[urutan], awal, panjang)
+    df_gunung['ketinggian'] = _pertama_segmen(df_jalur['ketinggian_puncak_mdpl'], urutan, awal, panjang)
+    # Tambahan metadata untuk analisis (tidak ada pada data ringkas; diisi hidrasi_media);
+    # kolom media tetap ada (kosong) di posisinya agar urutan field respons tidak berubah
+    for kolom in KOLOM_MEDIA_GUNUNG:
+        if kolom in df_jalur.columns:
+            df_gunung[kolom] = _pertama_segmen(df_jalur[kolom], urutan, awal, panjang)
+    for kolom in KOLOM_MEDIA_GUNUNG:
+        if kolom not in df_gunung.columns:
+            df_gunung[kolom] = np.nan
+    df_gunung['kategori_rekomendasi'] = kategorikan_vektor(df_gunung['skor_tertinggi'])
+    return df_gunung
+
+class SkorJalur:
+    """Skor dan kategori jalur yang tidak bergantung preferensi, dikunci id_jalur + versi engine."""
+
+    def __init__(self, engine=None, direktori_cache=None, paralel=None):
+        self.engine = engine or dapatkan_engine()
+        self.paralel = paralel
+        direktori_cache = direktori_cache or DIREKTORI_CACHE
+        self.path = os.path.join(direktori_cache, f"skor_jalur_v{FORMAT_ARTEFAK}_{self.engine.versi}.npz")
+        self.id_jalur = np.empty(0, dtype=np.int64)
+        self.X = np.empty((0, len(self.engine.variabel)))
+        self.skor = np.empty(0)
+        self.kategori = np.empty(0, dtype=str)
+        # Skor fuzzy per jalur: bobot per permintaan cukup menghitung ulang komponen weighted
+        self.fuzzy = np.empty(0)
+        if os.path.exists(self.path):
+            try:
+                with np.load(self.path, allow_pickle=False) as data:
+                    self.id_jalur, self.X = data["id_jalur"], data["X"]
+                    self.skor, self.kategori = data["skor"], data["kategori"]
+                    self.fuzzy = data["fuzzy"]
+            except Exception as e:
+                print(f"⚠️ Skor tersimpan tidak valid, dihitung ulang: {e}", file=sys.stderr)
+                self.id_jalur = np.empty(0, dtype=np.int64)
+                self.X = np.empty((0, len(self.engine.variabel)))
+                self.skor, self.kategori, self.fuzzy = np.empty(0), np.empty(0, dtype=str), np.empty(0)
+
+    def _simpan(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            sementara = f"{self.path}.{os.getpid()}.tmp"
+            with open(sementara, "wb") as f:
+                np.savez(f, id_jalur=self.id_jalur, X=self.X, skor=self.skor, kategori=self.kategori,
+                         fuzzy=self.fuzzy)
+            os.replace(sementara, self.path)
+        except OSError as e:
+            print(f"⚠️ Skor jalur tidak bisa disimpan ke {self.path}: {e}", file=sys.stderr)
+
+    def _posisi(self, id_jalur):
+        """Indeks setiap id_jalur di simpanan dan mask apakah id tersebut sudah ada."""
+        if len(self.id_jalur) == 0:
+            return np.zeros(len(id_jalur), dtype=np.intp), np.zeros(len(id_jalur), dtype=bool)
+        posisi = np.minimum(np.searchsorted(self.id_jalur, id_jalur), len(self.id_jalur) - 1)
+        return posisi, self.id_jalur[posisi] == id_jalur
+
+    def _posisi_terkini(self, df_jalur):
+        """Posisi setiap baris df_jalur di simpanan setelah jalur baru/berubah dihitung (None bila id ganda)."""
+        id_jalur = df_jalur['id_jalur'].to_numpy(dtype=np.int64)
+        if len(np.unique(id_jalur)) != len(id_jalur):
+            # id_jalur ganda (data uji/mock): tidak bisa dikunci per jalur
+            return None
+        X = df_jalur[self.engine.variabel].to_numpy(dtype=float)
+        posisi, ada = self._posisi(id_jalur)
+        sama = ada.copy()
+        tersimpan, sekarang = self.X[posisi[ada]], X[ada]
+        sama[ada] = ((tersimpan == sekarang) | (np.isnan(tersimpan) & np.isnan(sekarang))).all(axis=1)
+        if not sama.all():
+            self.perbarui(df_jalur[~sama])
+            posisi, _ = self._posisi(id_jalur)
+        return posisi
+
+    def ambil(self, df_jalur, bobot=None):
+        """
+        (skor, kategori) untuk setiap baris df_jalur; jalur baru atau yang inputnya berubah
+        dihitung dulu. Dengan bobot (baca_bobot) hanya komponen weighted yang dihitung ulang.
+        """
+        posisi = self._posisi_terkini(df_jalur)
+        if posisi is None:
+            skor = hitung_skor_jalur(df_jalur, self.engine, self.paralel, bobot)
+            return skor, kategorikan_vektor(skor)
+        if bobot is None:
+            return self.skor[posisi], self.kategori[posisi]
+        skor = gabung_skor(self.fuzzy[posisi], df_jalur, bobot)
+        return skor, kategorikan_vektor(skor)
+
+    def ambil_fuzzy(self, df_jalur):
+        """Skor fuzzy tersimpan untuk setiap baris df_jalur."""
+        posisi = self._posisi_terkini(df_jalur)
+        return hitung_skor_fuzzy(df_jalur, self.engine, self.paralel) if posisi is None else self.fuzzy[posisi]
+
+    def tersimpan(self, df_jalur):
+        """
+        (skor fuzzy, ada) tanpa menghitung apa pun: baris yang belum punya skor atau
+        inputnya berubah sejak disimpan bernilai NaN dengan ada=False.
+        """
+        id_jalur = df_jalur['id_jalur'].to_numpy(dtype=np.int64)
+        X = df_jalur[self.engine.variabel].to_numpy(dtype=float)
+        posisi, ada = self._posisi(id_jalur)
+        tersimpan, sekarang = self.X[posisi[ada]], X[ada]
+        ada[ada] = ((tersimpan == sekarang) | (np.isnan(tersimpan) & np.isnan(sekarang))).all(axis=1)
+        fuzzy = np.full(len(id_jalur), np.nan)
+        fuzzy[ada] = self.fuzzy[posisi[ada]]
+        return fuzzy, ada
+
+    def perbarui(self, df_jalur, fuzzy=None):
+        """
+        Menghitung ulang skor untuk baris df_jalur saja lalu menggabungkannya ke simpanan
+        (fuzzy: skor fuzzy baris tersebut bila sudah dihitung pemanggil).
+        """
+        if df_jalur.empty:
+            return
+        id_baru = df_jalur['id_jalur'].to_numpy(dtype=np.int64)
+        fuzzy_baru = hitung_skor_fuzzy(df_jalur, self.engine, self.paralel) if fuzzy is None else np.asarray(fuzzy)
+        skor_baru = gabung_skor(fuzzy_baru, df_jalur)
+        print(f"🔄 Skor dihitung ulang untuk {len(id_baru)} jalur", file=sys.stderr)
+        tetap = ~np.isin(self.id_jalur, id_baru)
+        id_jalur = np.concatenate([self.id_jalur[tetap], id_baru])
+        urutan = np.argsort(id_jalur, kind="stable")
+        self.id_jalur = id_jalur[urutan]
+        self.X = np.concatenate([self.X[tetap], df_jalur[self.engine.variabel].to_numpy(dtype=float)])[urutan]
+        self.skor = np.concatenate([self.skor[tetap], skor_baru])[urutan]
+        self.fuzzy = np.concatenate([self.fuzzy[tetap], fuzzy_baru])[urutan]
+        kategori_baru = kategorikan_vektor(skor_baru)
+        self.kategori = np.concatenate([self.kategori[tetap], kategori_baru])[urutan]
+        self._simpan()
+
+    def hapus(self, id_jalur):
+        """Membuang skor jalur yang sudah tidak ada di database."""
+        tetap = ~np.isin(self.id_jalur, np.asarray(list(id_jalur), dtype=np.int64))
+        if tetap.all():
+            return
+        self.id_jalur, self.X = self.id_jalur[tetap], self.X[tetap]
+        self.skor, self.kategori, self.fuzzy = self.skor[tetap], self.kategori[tetap], self.fuzzy[tetap]
+        self._simpan()
+
+# 3.3.1 Hidrasi Media (pengambilan dua tahap)
+class CacheMedia:
+    """Kolom media per id_jalur / id_gunung yang sudah pernah diambil (dipakai worker)."""
+
+    def __init__(self):
+        self.jalur = {}
+        self.gunung = {}
+
+    def __call__(self, id_jalur, id_gunung):
+        kurang_jalur = [i for i in id_jalur if i not in self.jalur]
+        kurang_gunung = [i for i in id_gunung if i not in self.gunung]
+        if kurang_jalur or kurang_gunung:
+            media_jalur, media_gunung = get_media_from_database(kurang_jalur, kurang_gunung)
+            self.jalur.update(media_jalur.to_dict(orient='index'))
+            self.gunung.update(media_gunung.to_dict(orient='index'))
+        return (
+            pd.DataFrame.from_dict({i: self.jalur[i] for i in id_jalur if i in self.jalur},
+                                   orient='index', columns=KOLOM_MEDIA_JALUR),
+            pd.DataFrame.from_dict({i: self.gunung[i] for i in id_gunung if i in self.gunung},
+                                   orient='index', columns=KOLOM_MEDIA_GUNUNG),
+        )
+
+    def buang(self, id_jalur=(), id_gunung=()):
+        for i in id_jalur:
+            self.jalur.pop(int(i), None)
+        for i in id_gunung:
+            self.gunung.pop(int(i), None)
+
+def hidrasi_media(df_gunung, df_jalur, sumber_media=None):
+    """
+    Mengisi kolom media untuk baris hasil saja. sumber_media(id_jalur, id_gunung) ->
+    (media_jalur, media_gunung) berindeks id; default langsung dari database.
+    Urutan kolom disamakan dengan pengambilan penuh.
+    """
+    sumber_media = sumber_media or get_media_from_database
+    id_jalur = [int(i) for i in pd.unique(df_jalur['id_jalur'])] if not df_jalur.empty else []
+    id_gunung = sorted({int(i) for i in df_gunung.get('id_gunung', [])} |
+                       {int(i) for i in df_jalur.get('id_gunung', [])})
+    media_jalur, media_gunung = sumber_media(id_jalur, id_gunung)
+    df_jalur = df_jalur.copy()
+    for kolom in KOLOM_MEDIA_JALUR:
+        df_jalur[kolom] = df_jalur['id_jalur'].map(media_jalur[kolom])
+    for kolom in KOLOM_MEDIA_GUNUNG:
+        df_jalur[kolom] = df_jalur['id_gunung'].map(media_gunung[kolom])
+        if not df_gunung.empty:
+            df_gunung[kolom] = df_gunung['id_gunung'].map(media_gunung[kolom])
+    # Setiap kolom media disisipkan tepat setelah kolom pendahulunya pada query penuh
+    media = KOLOM_MEDIA_JALUR + KOLOM_MEDIA_GUNUNG
+    urutan = [k for k in df_jalur.columns if k not in media]
+    for kolom in sorted(media, key=URUTAN_KOLOM_JALUR.index):
+        pendahulu = URUTAN_KOLOM_JALUR[:URUTAN_KOLOM_JALUR.index(kolom)]
+        urutan.insert(max((urutan.index(k) + 1 for k in pendahulu if k in urutan), default=0), kolom)
+    return df_gunung, df_jalur[urutan]
+
+# 3.3.2 Penilaian Paralel (opsional)
+_ENGINE_PEKERJA = None
+
+def _mulai_pekerja_skor(kompilasi, definisi):
+    global _ENGINE_PEKERJA
+    _ENGINE_PEKERJA = FuzzyEngine(kompilasi, definisi)
+
+def _skor_chunk(df_chunk):
+    return hitung_skor_fuzzy(df_chunk, _ENGINE_PEKERJA)
+
+class PoolSkor:
+    """Pool proses untuk hitung_skor_fuzzy; pool dibuat saat pertama dipakai."""
+
+    def __init__(self, pekerja=None, ukuran_chunk=None, minimum=None, engine=None):
+        self.pekerja = pekerja or int(os.getenv("FUZZY_PARALEL_PEKERJA", "0")) or os.cpu_count() or 1
+        self.ukuran_chunk = ukuran_chunk or int(os.getenv("FUZZY_PARALEL_CHUNK", "2048"))
+        # Di bawah jumlah baris ini penilaian serial lebih cepat daripada mengirim chunk
+        self.minimum = minimum if minimum is not None else int(
+            os.getenv("FUZZY_PARALEL_MIN", str(2 * self.ukuran_chunk)))
+        self.engine = engine or dapatkan_engine()
+        self._executor = None
+
+    @classmethod
+    def dari_env(cls, engine=None):
+        """PoolSkor bila FUZZY_PARALEL_PEKERJA > 1, selain itu None (serial)."""
+        pekerja = int(os.getenv("FUZZY_PARALEL_PEKERJA", "0"))
+        return cls(pekerja, engine=engine) if pekerja > 1 else None
+
+    def layak(self, n):
+        return self.pekerja > 1 and n >= max(self.minimum, 2)
+
+    def hitung(self, df_jalur):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.pekerja, initializer=_mulai_pekerja_skor,
+                initargs=(self.engine.kompilasi, self.engine.definisi))
+        # Hanya 13 kolom input yang dikirim; indeks baris ikut agar log error tetap merujuk baris asal
+        X = df_jalur[self.engine.variabel]
+        chunk = [X.iloc[awal:awal + self.ukuran_chunk] for awal in range(0, len(X), self.ukuran_chunk)]
+        print(f"⚙️ Skor {len(X)} jalur dibagi ke {len(chunk)} chunk / {self.pekerja} proses", file=sys.stderr)
+        return np.concatenate(list(self._executor.map(_skor_chunk, chunk)))
+
+    def tutup(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.tutup()
+
+# 3.4 Filter Preferensi
+# kunci preferensi -> kolom, operator, label (+ alias lama, dipakai bila kunci utamanya kosong)
+SPEK_FILTER = {
+    'max_kesulitan_skala': {'kolom': 'kesulitan_skala', 'op': '<=', 'label': 'Kesulitan ≤ {}'},
+    'min_kesulitan_skala': {'kolom': 'kesulitan_skala', 'op': '>=', 'label': 'Kesulitan ≥ {}'},
+    'min_keamanan_skala': {'kolom': 'keamanan_skala', 'op': '>=', 'label': 'Keamanan ≥ {}'},
+    'max_estimasi_waktu_jam': {'kolom': 'estimasi_waktu_jam', 'op': '<=', 'label': 'Waktu ≤ {} jam'},
+    'max_ketinggian_mdpl': {'kolom': 'ketinggian_puncak_mdpl', 'op': '<=', 'label': 'Ketinggian ≤ {} mdpl'},
+    'min_ketersediaan_air': {'kolom': 'ketersediaan_sumber_air_skala', 'op': '>=', 'label': 'Air ≥ {}'},
+    'min_keindahan_pemandangan_skala': {'kolom': 'keindahan_pemandangan_skala', 'op': '>=',
+                                        'label': 'Pemandangan ≥ {}', 'alias': ['min_keindahan_pemandangan']},
+    'min_jaringan_komunikasi': {'kolom': 'jaringan_komunikasi_skala', 'op': '>=', 'label': 'Jaringan Komunikasi ≥ {}'},
+    'min_kualitas_fasilitas_skala': {'kolom': 'kualitas_fasilitas_skala', 'op': '>=', 'label': 'Fasilitas ≥ {}'},
+    'min_kualitas_kemah_skala': {'kolom': 'kualitas_kemah_skala', 'op': '>=', 'label': 'Kemah ≥ {}'},
+    'min_perlindungan_angin': {'kolom': 'perlindungan_angin_kemah_skala', 'op': '>=', 'label': 'Perlindungan Angin ≥ {}'},
+    'min_tingkat_keamanan_insiden': {'kolom': 'tingkat_insiden_skala', 'op': '>=',
+                                     'label': 'Tingkat Keamanan Insiden ≥ {}'},
+    'min_variasi_lanskap': {'kolom': 'variasi_lanskap_skala', 'op': '>=', 'label': 'Variasi Lanskap ≥ {}'},
+    'min_variasi_jalur_skala': {'kolom': 'variasi_jalur_skala', 'op': '>=', 'label': 'Variasi Jalur ≥ {}'},
+}
+OPERATOR_FILTER = {'<=': np.less_equal, '>=': np.greater_equal}
+# Kunci preferensi yang bukan filter (paginasi, bobot per permintaan, dsb.)
+KUNCI_KONTROL = {'top_k', 'offset', 'bobot_kriteria', 'rasio_fuzzy'}
+_KUNCI_DIKENAL = (set(SPEK_FILTER) | KUNCI_KONTROL
+                  | {a for spek in SPEK_FILTER.values() for a in spek.get('alias', [])})
+_KUNCI_TIDAK_DIKENAL = set()
+
+def kompilasi_filter(preferensi_pengguna):
+    """Preferensi -> daftar (kunci, kolom, operator, nilai, label) sesuai urutan SPEK_FILTER."""
+    baru = [k for k in preferensi_pengguna if k not in _KUNCI_DIKENAL and k not in _KUNCI_TIDAK_DIKENAL]
+    if baru:
+        # Dilaporkan sekali per proses agar log worker tidak dibanjiri kunci yang sama
+        _KUNCI_TIDAK_DIKENAL.update(baru)
+        print(f"[FILTER] Kunci preferensi tidak dikenal diabaikan: {', '.join(baru)}", file=sys.stderr)
+
+    filter_aktif = []
+    for kunci, spek in SPEK_FILTER.items():
+        for nama in [kunci, *spek.get('alias', [])]:
+            if preferensi_pengguna.get(nama) is not None:
+                nilai = preferensi_pengguna[nama]
+                filter_aktif.append((nama, spek['kolom'], spek['op'], nilai, spek['label'].format(nilai)))
+                break
+    return filter_aktif
+
+def filter_kanonik(preferensi_pengguna):
+    """{kunci utama SPEK_FILTER: nilai} untuk filter yang aktif; alias diganti kunci utamanya."""
+    kanonik = {}
+    for kunci, spek in SPEK_FILTER.items():
+        for nama in [kunci, *spek.get('alias', [])]:
+            if (preferensi_pengguna or {}).get(nama) is not None:
+                kanonik[kunci] = preferensi_pengguna[nama]
+                break
+    return kanonik
+
+def mask_filter(df_jalur, filter_aktif, indeks=None):
+    """
+    Mengevaluasi semua filter sebagai satu mask boolean atas array NumPy kolom
+    (df_jalur boleh DataFrame atau TokoJalur).
+    Bila indeks (IndeksJalur untuk df_jalur yang sama) tersedia, kolom terindeks
+    dijawab dari bitmap tanpa memindai kolom.
+    """
+    if indeks is not None and indeks.n != len(df_jalur):
+        indeks = None
+    mask = np.ones(len(df_jalur), dtype=bool)
+    bitmap = None
+    filter_applied = []
+    for kunci, kolom, op, nilai, label in filter_aktif:
+        try:
+            if indeks is not None and kolom in indeks:
+                hasil = indeks.bitmap(kolom, op, nilai)
+                bitmap = hasil if bitmap is None else np.bitwise_and(bitmap, hasil, out=bitmap)
+            elif not cek_kolom(df_jalur, kolom):
+                print(f"[FILTER ERROR] Kolom '{kolom}' tidak ditemukan saat filter {kunci}", file=sys.stderr)
+                continue
+            else:
+                mask &= OPERATOR_FILTER[op](np.asarray(df_jalur[kolom]), nilai)
+        except TypeError as e:
+            print(f"[FILTER ERROR] Nilai {kunci}={nilai!r} tidak valid: {e}", file=sys.stderr)
+            continue
+        filter_applied.append(label)
+    if bitmap is not None:
+        mask &= np.unpackbits(bitmap, count=len(mask)).view(bool)
+    return mask, filter_applied
+
+def mask_filter_batch(df_jalur, daftar_filter, indeks=None):
+    """
+    mask_filter untuk banyak profil sekaligus: setiap predikat (kolom, operator, nilai) yang
+    sama hanya dievaluasi sekali lalu dipakai bersama. Mengembalikan [(mask, filter_applied)].
+    """
+    predikat = {}
+    hasil = []
+    for filter_aktif in daftar_filter:
+        mask = np.ones(len(df_jalur), dtype=bool)
+        filter_applied = []
+        for spek in filter_aktif:
+            kunci = (spek[1], spek[2], repr(spek[3]), spek[4])
+            if kunci not in predikat:
+                predikat[kunci] = mask_filter(df_jalur, [spek], indeks)
+            mask_predikat, label = predikat[kunci]
+            mask &= mask_predikat
+            filter_applied += label
+        hasil.append((mask, filter_applied))
+    return hasil
+
+# 3.5 Indeks Sekunder
+class IndeksJalur:
+    """
+    Indeks atas kolom filter, dibangun sekali saat data jalur dimuat.
+
+    Kolom dengan sedikit nilai berbeda (semua skala 0-10, biasanya juga estimasi jam dan
+    ketinggian per gunung) mendapat bitmap kumulatif per nilai unik (>= v dan <= v). Kolom
+    dengan banyak nilai berbeda memakai indeks rentang: nilai terurut + posisi baris, dengan
+    bitmap kumulatif setiap MAKS_NILAI_BITMAP-an posisi sehingga hanya sisa satu blok yang
+    perlu ditandai per permintaan. Jawaban berupa bitmap terpaket (np.packbits), jadi
+    gabungan filter cukup AND per byte.
+    """
+
+    MAKS_NILAI_BITMAP = 128
+
+    def __init__(self, df_jalur, kolom=None):
+        self.n = len(df_jalur)
+        if kolom is None:
+            kolom = {spek['kolom'] for spek in SPEK_FILTER.values()} & set(df_jalur.columns)
+        self._kumulatif = {}
+        self._terurut = {}
+        for nama in sorted(kolom):
+            try:
+                x = np.asarray(df_jalur[nama], dtype=float)
+            except (TypeError, ValueError):
+                continue  # kolom non-numerik tetap dipindai oleh mask_filter
+            unik = np.unique(x[~np.isnan(x)])
+            if len(unik) <= self.MAKS_NILAI_BITMAP:
+                # lebih_dari[i]: x >= unik[i], baris terakhir kosong;
+                # kurang_dari[i]: x <= unik[i - 1], baris pertama kosong. NaN tidak pernah lolos.
+                kosong = np.zeros((1, self.n), dtype=bool)
+                ge = np.concatenate([x >= unik[:, None], kosong])
+                le = np.concatenate([kosong, x <= unik[:, None]])
+                self._kumulatif[nama] = (unik, np.packbits(ge, axis=1), np.packbits(le, axis=1))
+            else:
+                urutan = np.argsort(x, kind='stable')
+                jumlah_valid = len(x) - int(np.isnan(x).sum())
+                langkah = -(-jumlah_valid // self.MAKS_NILAI_BITMAP)
+                batas = np.append(np.arange(0, jumlah_valid, langkah), jumlah_valid)
+                peringkat = np.empty(self.n, dtype=np.intp)
+                peringkat[urutan] = np.arange(self.n)
+                # awal[j]: posisi terurut < batas[j]; akhir[j]: batas[j] <= posisi < jumlah_valid
+                awal = np.packbits(peringkat < batas[:, None], axis=1)
+                akhir = np.packbits((peringkat >= batas[:, None]) & (peringkat < jumlah_valid), axis=1)
+                self._terurut[nama] = (x[urutan[:jumlah_valid]], urutan, batas, awal, akhir)
+
+    def __contains__(self, kolom):
+        return kolom in self._kumulatif or kolom in self._terurut
+
+    def bitmap(self, kolom, op, nilai):
+        """Bitmap terpaket untuk `kolom op nilai` (op '>=' atau '<=')."""
+        if isinstance(nilai, str) or not np.isscalar(nilai):
+            raise TypeError(f"nilai filter harus angka, bukan {type(nilai).__name__}")
+        nilai = float(nilai)
+        if kolom in self._kumulatif:
+            unik, lebih_dari, kurang_dari = self._kumulatif[kolom]
+            if np.isnan(nilai):
+                return np.zeros_like(lebih_dari[-1])
+            if op == '>=':
+                return lebih_dari[np.searchsorted(unik, nilai, 'left')].copy()
+            return kurang_dari[np.searchsorted(unik, nilai, 'right')].copy()
+
+        terurut, urutan, batas, awal, akhir = self._terurut[kolom]
+        if np.isnan(nilai):
+            return np.zeros_like(awal[0])
+        if op == '>=':
+            k = np.searchsorted(terurut, nilai, 'left')
+            j = np.searchsorted(batas, k, 'left')
+            hasil, sisa = akhir[j].copy(), urutan[k:batas[j]]
+        else:
+            k = np.searchsorted(terurut, nilai, 'right')
+            j = np.searchsorted(batas, k, 'right') - 1
+            hasil, sisa = awal[j].copy(), urutan[batas[j]:k]
+        if len(sisa):
+            mask = np.zeros(self.n, dtype=bool)
+            mask[sisa] = True
+            hasil |= np.packbits(mask)
+        return hasil
+
+# 3.6 Peringkat Top-K
+def baca_paginasi(preferensi_pengguna):
+    """(top_k, offset) dari preferensi; top_k None berarti seluruh hasil dikirim."""
+    hasil = {'top_k': None, 'offset': 0}
+    for kunci in hasil:
+        nilai = (preferensi_pengguna or {}).get(kunci)
+        if nilai is None:
+            continue
+        try:
+            nilai = int(nilai)
+            if nilai < 0:
+                raise ValueError("tidak boleh negatif")
+            hasil[kunci] = nilai
+        except (TypeError, ValueError) as e:
+            print(f"[FILTER ERROR] Nilai {kunci}={nilai!r} tidak valid: {e}", file=sys.stderr)
+    return hasil['top_k'], hasil['offset']
+
+def peringkat_teratas(skor, top_k=None, offset=0):
+    """
+    Posisi baris berperingkat offset..offset+top_k menurut skor menurun.
+    Skor seri diurutkan menurut posisi asal (stabil), sama seperti potongan dari
+    pengurutan penuh; hanya kandidat teratas yang diurutkan (np.argpartition).
+    """
+    skor = -np.asarray(skor, dtype=float)
+    n = len(skor)
+    if top_k is None or offset + top_k >= n:
+        return np.argsort(skor, kind='stable')[offset:]
+    k = offset + top_k
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    batas = skor[np.argpartition(skor, k - 1)[:k]].max()
+    # Sertakan semua yang seri dengan batas agar urutan stabil tetap terjaga
+    kandidat = np.flatnonzero(skor <= batas)
+    return kandidat[np.argsort(skor[kandidat], kind='stable')][offset:k]
+
+def ringkasan_hasil(skor_gunung, total_jalur):
+    """Total, statistik skor, dan distribusi kategori dari skor_tertinggi seluruh gunung."""
+    skor_gunung = np.asarray(skor_gunung, dtype=float)
+    if len(skor_gunung):
+        distribusi = pd.Series(kategorikan_vektor(skor_gunung)).value_counts().to_dict()
+        statistik = {"tertinggi": float(skor_gunung.max()), "terendah": float(skor_gunung.min()),
+                     "rata_rata": float(skor_gunung.mean())}
+    else:
+        distribusi = {}
+        statistik = {"tertinggi": 0.0, "terendah": 0.0, "rata_rata": 0.0}
+    return {
+        "total_gunung": len(skor_gunung),
+        "total_jalur": total_jalur,
+        "statistik_skor": statistik,
+        "distribusi_kategori": distribusi,
+    }
+
+# 3.7 Toko Jalur Kompak
+def _dtype_kompak(x):
+    """dtype terkecil yang memuat seluruh nilai x tanpa perubahan (None = pertahankan)."""
+    if x.dtype.kind not in "iuf" or len(x) == 0:
+        return None
+    if x.dtype.kind == "f" and not np.isfinite(x).all():
+        return np.float32 if np.array_equal(x.astype(np.float32), x, equal_nan=True) else None
+    if x.dtype.kind in "iu" or np.array_equal(np.round(x), x):
+        rendah, tinggi = x.min(), x.max()
+        for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if info.min <= rendah and tinggi <= info.max:
+                return dtype
+    if x.dtype.kind == "f" and np.array_equal(x.astype(np.float32), x):
+        return np.float32
+    return None
+
+class KolomTeks:
+    """Kolom teks ter-intern: kode int32 per baris (-1 = kosong) + kamus UTF-8 off-heap."""
+
+    def __init__(self, nilai):
+        kode, kamus = pd.factorize(np.asarray(nilai, dtype=object), use_na_sentinel=True)
+        bagian = [str(k).encode("utf-8") for k in kamus]
+        self.kode = kode.astype(np.int32)
+        self.offset = np.zeros(len(bagian) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in bagian], out=self.offset[1:])
+        self.blob = np.frombuffer(b"".join(bagian), dtype=np.uint8)
+
+    @property
+    def nbytes(self):
+        return self.kode.nbytes + self.offset.nbytes + self.blob.nbytes
+
+    def ambil(self, posisi=None):
+        """Array object berisi str/None untuk baris di posisi (semua baris jika None)."""
+        kode = self.kode if posisi is None else self.kode[posisi]
+        unik, balik = np.unique(kode, return_inverse=True)
+        kamus = np.array([None if k < 0 else bytes(self.blob[self.offset[k]:self.offset[k + 1]]).decode("utf-8")
+                          for k in unik] + [None], dtype=object)[:-1]
+        return kamus[balik]
+
+class TokoJalur:
+    """Katalog jalur kompak (lihat 3.7); meniru bagian DataFrame yang dipakai filter dan indeks."""
+
+    def __init__(self, df_jalur):
+        self.columns = list(df_jalur.columns)
+        self._dtype = {k: df_jalur[k].dtype for k in self.columns}
+        self._kolom = {}
+        for nama in self.columns:
+            nilai = df_jalur[nama].to_numpy()
+            if nilai.dtype.kind in "iufb":
+                dtype = _dtype_kompak(nilai)
+                self._kolom[nama] = np.ascontiguousarray(nilai.astype(dtype) if dtype else nilai)
+            elif all(v is None or isinstance(v, str) or v != v for v in nilai):
+                self._kolom[nama] = KolomTeks(nilai)
+            else:
+                self._kolom[nama] = nilai  # kolom object campuran dibiarkan apa adanya
+        self.n = len(df_jalur)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def empty(self):
+        return self.n == 0
+
+    @property
+    def nbytes(self):
+        return sum(k.nbytes for k in self._kolom.values())
+
+    def __contains__(self, nama):
+        return nama in self._kolom
+
+    def __getitem__(self, nama):
+        """Array satu kolom dengan dtype asli (numerik) atau object (teks)."""
+        return self.ambil(nama, None)
+
+    def cari(self, nama, nilai):
+        """Posisi nilai pada kolom numerik yang terurut naik (mis. id_jalur tabel skor)."""
+        return np.searchsorted(self._kolom[nama], nilai)
+
+    def ambil(self, nama, posisi):
+        """Nilai kolom untuk baris di posisi (semua baris jika None) dengan dtype asli."""
+        kolom = self._kolom[nama]
+        if isinstance(kolom, KolomTeks):
+            return kolom.ambil(posisi)
+        kolom = kolom if posisi is None else kolom[posisi]
+        dtype = self._dtype[nama]
+        return kolom.astype(dtype) if isinstance(dtype, np.dtype) and kolom.dtype != dtype else kolom
+
+    def ke_dataframe(self, posisi=None):
+        """DataFrame (kolom dan dtype asli) untuk baris di posisi / mask, atau seluruh katalog."""
+        if posisi is not None and np.asarray(posisi).dtype == bool:
+            posisi = np.flatnonzero(posisi)
+        return pd.DataFrame({nama: pd.Series(self.ambil(nama, posisi), dtype=self._dtype[nama], copy=False)
+                             for nama in self.columns})
+
+    def simpan(self, folder):
+        """Menulis setiap array ke folder sebagai .npy; mengembalikan info kolom untuk manifest."""
+        info = {}
+        for nama in self.columns:
+            kolom = self._kolom[nama]
+            if isinstance(kolom, KolomTeks):
+                for bagian in ("kode", "offset", "blob"):
+                    np.save(os.path.join(folder, f"{nama}.{bagian}.npy"), getattr(kolom, bagian))
+                jenis = "teks"
+            elif kolom.dtype.kind in "iufb":
+                np.save(os.path.join(folder, f"{nama}.npy"), kolom)
+                jenis = "angka"
             else:
-                print(f"[ERROR] Fuzzy output tidak menghasilkan skor_rekomendasi pada baris {idx}! Output: {simulasi.output}", file=sys.stderr)
-                skor_fuzzy = 0
-            # Hitung weighted score berdasarkan kriteria individual
-            weighted_score = 0
-            total_weight = 0
-            for kriteria, weight in kriteria_weights.items():
-                if kriteria in row and pd.notna(row[kriteria]):
-                    if kriteria == 'estimasi_waktu_jam':
-                        normalized_value = max(0, 100 - (row[kriteria] / 100 * 100))
-                    elif kriteria == 'ketinggian_puncak_mdpl':
-                        normalized_value = min(100, (row[kriteria] / 5500) * 100)
-                    else:
-                        normalized_value = (row[kriteria] / 10) * 100
-                    weighted_score += normalized_value * weight
-                    total_weight += weight
-            if total_weight > 0:
-                final_score = (skor_fuzzy * 0.7) + (weighted_score * 0.3)
+                raise TypeError(f"Kolom '{nama}' berisi objek campuran dan tidak bisa dibagikan")
+            info[nama] = {"jenis": jenis, "dtype": str(self._dtype[nama])}
+        return info
+
+    @classmethod
+    def buka(cls, folder, info, n):
+        """TokoJalur read-only di atas file hasil simpan() (mmap, tanpa salinan)."""
+        toko = cls.__new__(cls)
+        toko.columns = list(info)
+        toko._dtype = {nama: pd.api.types.pandas_dtype(i["dtype"]) for nama, i in info.items()}
+        toko._kolom = {}
+        toko.n = n
+        for nama, i in info.items():
+            if i["jenis"] == "teks":
+                kolom = KolomTeks.__new__(KolomTeks)
+                for bagian in ("kode", "offset", "blob"):
+                    setattr(kolom, bagian, np.load(os.path.join(folder, f"{nama}.{bagian}.npy"), mmap_mode="r"))
             else:
-                final_score = skor_fuzzy
-            skor_list.append(final_score)
-        except Exception as e:
-            print(f"❌ Error saat menghitung skor pada baris index {idx}: {e}", file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
-            skor_list.append(0)
-    df_jalur['skor_rekomendasi'] = skor_list
-
-    # Agregasi hasil per gunung dan pengurutan dengan metadata tambahan
-    df_gunung = df_jalur.groupby(['id_gunung', 'nama_gunung']).agg(
-        skor_tertinggi=('skor_rekomendasi', 'max'),
-        skor_rata_rata=('skor_rekomendasi', 'mean'),
-        jumlah_jalur=('id_jalur', 'count'),
-        jalur_terbaik=('nama_jalur', lambda x: df_jalur.loc[df_jalur.loc[x.index, 'skor_rekomendasi'].idxmax(), 'nama_jalur']),
-        kesulitan_terendah=('kesulitan_skala', 'min'),
-        kesulitan_tertinggi=('kesulitan_skala', 'max'),
-        keamanan_rata_rata=('keamanan_skala', 'mean'),
-        ketinggian=('ketinggian_puncak_mdpl', 'first'),
-        # Tambahan metadata untuk analisis
-        lokasi_administratif=('lokasi_administratif', 'first'),
-        deskripsi_singkat=('deskripsi_singkat', 'first'),
-        url_thumbnail=('url_thumbnail', 'first')
-    ).reset_index()
+                kolom = np.load(os.path.join(folder, f"{nama}.npy"), mmap_mode="r")
+            toko._kolom[nama] = kolom
+        return toko
+
+def proses_rekomendasi(df_jalur=None, preferensi_pengguna=None, engine=None,
+                       skor_jalur=None, agregat_gunung=None, indeks=None, sumber_media=None,
+                       paralel=None):
+    """
+    Fungsi utama yang melakukan seluruh proses: fetch data, filter dan kalkulasi skor.
+
+    skor_jalur (SkorJalur) dan agregat_gunung (hasil agregasi_gunung untuk df_jalur penuh)
+    opsional; dengan keduanya permintaan cukup memfilter dan mengurutkan angka tersimpan.
+    indeks (IndeksJalur untuk df_jalur penuh) menjawab filter dari bitmap.
+    Bila df_jalur ringkas (tanpa kolom media), kolom media hasil diisi lewat sumber_media.
+    df_jalur boleh TokoJalur (data hangat worker): hanya baris yang lolos filter yang
+    dijadikan DataFrame.
+    paralel (PoolSkor) membagi penilaian jalur tanpa skor tersimpan ke beberapa proses.
+    Preferensi "bobot_kriteria" / "rasio_fuzzy" (lihat baca_bobot) mengganti bobot skor akhir
+    untuk permintaan ini; skor fuzzy tersimpan tetap dipakai.
+    """
     
-    # Tambahkan kategori rekomendasi berdasarkan skor
-    def kategorikan_rekomendasi(skor):
-        if skor >= 80:
-            return "Sangat Direkomendasikan"
-        elif skor >= 65:
-            return "Direkomendasikan"
-        elif skor >= 50:
-            return "Cukup Direkomendasikan"
-        elif skor >= 35:
-            return "Kurang Direkomendasikan"
-        else:
-            return "Tidak Direkomendasikan"
+    # Jika df_jalur tidak diberikan, ambil proyeksi ringkas dari database (filter preferensi
+    # ikut didorong ke SQL; kolom media diambil belakangan untuk baris hasil)
+    if df_jalur is None:
+        df_jalur = get_data_jalur_from_database(preferensi=preferensi_pengguna, media=False)
     
-    df_gunung['kategori_rekomendasi'] = df_gunung['skor_tertinggi'].apply(kategorikan_rekomendasi)
-    df_gunung = df_gunung.sort_values(by='skor_tertinggi', ascending=False)
+    if df_jalur.empty:
+        print("❌ Tidak ada data jalur yang tersedia", file=sys.stderr)
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Engine dikompilasi sekali per proses (atau dimuat dari cache disk)
+    if engine is None:
+        engine = dapatkan_engine()
+    total_jalur = len(df_jalur)
+
+    # Filter data berdasarkan preferensi pengguna jika ada (satu mask, tanpa salinan DataFrame)
+    if preferensi_pengguna:
+        filter_aktif = kompilasi_filter(preferensi_pengguna)
+        mask, filter_applied = mask_filter(df_jalur, filter_aktif, indeks)
+        print(f"✅ Filter diterapkan: {', '.join(filter_applied) if filter_applied else 'Tidak ada'}", file=sys.stderr)
+        print(f"✅ Jalur tersisa setelah filter: {int(mask.sum())} dari {len(df_jalur)}", file=sys.stderr)
+        if not mask.all():
+            df_jalur = df_jalur.ke_dataframe(mask) if isinstance(df_jalur, TokoJalur) else df_jalur[mask]
+    if isinstance(df_jalur, TokoJalur):
+        df_jalur = df_jalur.ke_dataframe()
+    if df_jalur.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Skor tidak bergantung filter: bila tersedia, ambil dari SkorJalur (hanya jalur
+    # yang baru/berubah yang dihitung), selain itu hitung langsung
+    bobot = baca_bobot(preferensi_pengguna)
+    # assign: DataFrame milik pemanggil (tanpa filter yang memangkas) tidak ikut diubah
+    if skor_jalur is not None:
+        skor, kategori = skor_jalur.ambil(df_jalur, bobot)
+    else:
+        skor = hitung_skor_jalur(df_jalur, engine, paralel, bobot)
+        kategori = kategorikan_vektor(skor)
+    df_jalur = df_jalur.assign(skor_rekomendasi=skor, kategori_rekomendasi=kategori)
+
+    return _susun_hasil(df_jalur, preferensi_pengguna, total_jalur, agregat_gunung, bobot, sumber_media)
+
+def _susun_hasil(df_jalur, preferensi_pengguna, total_jalur, agregat_gunung=None, bobot=None, sumber_media=None):
+    """Peringkat, agregasi gunung, hidrasi media dan ringkasan untuk df_jalur yang sudah berskor."""
+    top_k, offset = baca_paginasi(preferensi_pengguna)
+    df_jalur_ranked = df_jalur.iloc[peringkat_teratas(df_jalur['skor_rekomendasi'].to_numpy(), top_k, offset)]
+
+    # Agregasi hasil per gunung dan pengurutan; agregat katalog penuh dipakai ulang jika
+    # filter tidak memangkas satu jalur pun dan bobotnya bawaan
+    if agregat_gunung is not None and len(df_jalur) == total_jalur and bobot is None:
+        skor_gunung = agregat_gunung['skor_tertinggi'].to_numpy()
+        df_gunung = agregat_gunung.iloc[peringkat_teratas(skor_gunung, top_k, offset)].copy()
+    elif top_k is None:
+        df_gunung = agregasi_gunung(df_jalur)
+        skor_gunung = df_gunung['skor_tertinggi'].to_numpy()
+        df_gunung = df_gunung.iloc[peringkat_teratas(skor_gunung)]
+    else:
+        # Skor tertinggi per gunung cukup untuk menentukan peringkat; agregat lengkap
+        # (lambda jalur_terbaik, kolom teks) hanya dihitung untuk gunung yang tampil
+        skor_per_gunung = df_jalur.groupby(['id_gunung', 'nama_gunung'])['skor_rekomendasi'].max()
+        skor_gunung = skor_per_gunung.to_numpy()
+        terpilih = skor_per_gunung.index[peringkat_teratas(skor_gunung, top_k, offset)]
+        df_gunung = agregasi_gunung(df_jalur[df_jalur['id_gunung'].isin(terpilih.get_level_values('id_gunung'))])
+        df_gunung = df_gunung.set_index(['id_gunung', 'nama_gunung']).loc[terpilih].reset_index()
 
-    # Tambahkan kategori untuk jalur individual
-    df_jalur['kategori_rekomendasi'] = df_jalur['skor_rekomendasi'].apply(kategorikan_rekomendasi)
-    df_jalur_ranked = df_jalur.sort_values(by='skor_rekomendasi', ascending=False)
+    if not set(KOLOM_MEDIA_JALUR) <= set(df_jalur_ranked.columns):
+        df_gunung, df_jalur_ranked = hidrasi_media(df_gunung, df_jalur_ranked, sumber_media)
+
+    # Total dan statistik selalu dihitung atas seluruh hasil, bukan hanya potongan top_k
+    df_gunung.attrs['ringkasan'] = ringkasan_hasil(skor_gunung, len(df_jalur))
+    if top_k is not None:
+        df_gunung.attrs['ringkasan']['paginasi'] = {
+            "top_k": top_k, "offset": offset,
+            "gunung_dikirim": len(df_gunung), "jalur_dikirim": len(df_jalur_ranked),
+        }
+    if bobot is not None:
+        vektor, rasio_fuzzy, rasio_kriteria = bobot
+        df_gunung.attrs['ringkasan']['bobot'] = {
+            "bobot_kriteria": {k: float(w) for k, w in zip(KRITERIA, vektor)},
+            "rasio_fuzzy": rasio_fuzzy, "rasio_kriteria": rasio_kriteria,
+        }
 
     return df_gunung, df_jalur_ranked
 
+def proses_rekomendasi_batch(df_jalur=None, daftar_preferensi=(), engine=None, skor_jalur=None,
+                             indeks=None, sumber_media=None, paralel=None):
+    """
+    Banyak profil preferensi terhadap satu katalog: data dimuat dan setiap jalur diberi
+    skor sekali, mask filter semua profil dievaluasi bersama (predikat yang sama cukup
+    sekali), lalu setiap profil hanya memfilter, mengurutkan dan mengagregasi.
+    Mengembalikan daftar (rekomendasi_gunung, rekomendasi_jalur) sesuai urutan profil,
+    sama dengan memanggil proses_rekomendasi untuk setiap profil.
+    """
+    daftar_preferensi = list(daftar_preferensi)
+    if df_jalur is None:
+        # Katalog penuh (filter setiap profil berbeda sehingga tidak didorong ke SQL)
+        df_jalur = get_data_jalur_from_database(media=False)
+    # Kolom media setiap id cukup diambil sekali untuk semua profil
+    sumber_media = sumber_media or CacheMedia()
+    if df_jalur.empty:
+        print("❌ Tidak ada data jalur yang tersedia", file=sys.stderr)
+        return [(pd.DataFrame(), pd.DataFrame()) for _ in daftar_preferensi]
+    engine = engine or dapatkan_engine()
+
+    daftar_filter = [kompilasi_filter(p) if p else [] for p in daftar_preferensi]
+    daftar_mask = mask_filter_batch(df_jalur, daftar_filter, indeks)
+    if isinstance(df_jalur, TokoJalur):
+        df_jalur = df_jalur.ke_dataframe()
+    else:
+        df_jalur = df_jalur.copy()
+
+    # Satu kali penilaian untuk seluruh katalog; bobot per profil memakai skor fuzzy yang sama
+    if skor_jalur is not None:
+        skor, kategori = skor_jalur.ambil(df_jalur)
+        skor_fuzzy = None
+    else:
+        skor_fuzzy = hitung_skor_fuzzy(df_jalur, engine, paralel)
+        skor = gabung_skor(skor_fuzzy, df_jalur)
+        kategori = kategorikan_vektor(skor)
+    print(f"✅ Batch {len(daftar_preferensi)} profil atas {len(df_jalur)} jalur (skor dihitung sekali)", file=sys.stderr)
+
+    hasil = []
+    for preferensi_pengguna, (mask, filter_applied) in zip(daftar_preferensi, daftar_mask):
+        if preferensi_pengguna:
+            print(f"✅ Filter diterapkan: {', '.join(filter_applied) if filter_applied else 'Tidak ada'}", file=sys.stderr)
+            print(f"✅ Jalur tersisa setelah filter: {int(mask.sum())} dari {len(df_jalur)}", file=sys.stderr)
+        if not mask.any():
+            hasil.append((pd.DataFrame(), pd.DataFrame()))
+            continue
+        df_profil = df_jalur[mask] if not mask.all() else df_jalur.copy()
+        bobot = baca_bobot(preferensi_pengguna)
+        if bobot is None:
+            df_profil['skor_rekomendasi'], df_profil['kategori_rekomendasi'] = skor[mask], kategori[mask]
+        else:
+            if skor_fuzzy is None:
+                skor_fuzzy = skor_jalur.ambil_fuzzy(df_jalur)
+            df_profil['skor_rekomendasi'] = gabung_skor(skor_fuzzy[mask], df_profil, bobot)
+            df_profil['kategori_rekomendasi'] = kategorikan_vektor(df_profil['skor_rekomendasi'])
+        hasil.append(_susun_hasil(df_profil, preferensi_pengguna, len(df_jalur), None, bobot, sumber_media))
+    return hasil
+
+# 3.8 Rekomendasi Bertenggat
+def _terbesar_ke(nilai, k):
+    """Nilai terbesar ke-k (k >= 1), atau None bila nilai kurang dari k."""
+    return np.partition(nilai, len(nilai) - k)[len(nilai) - k] if len(nilai) >= k else None
+
+# Kolom agregat gunung yang baru benar bila semua jalur kandidat gunung itu sudah dinilai
+KOLOM_AGREGAT_SEMUA_JALUR = ('jumlah_jalur', 'skor_rata_rata', 'jalur_terbaik', 'kesulitan_terendah',
+                             'kesulitan_tertinggi', 'keamanan_rata_rata')
+
+def proses_rekomendasi_tenggat(df_jalur, preferensi_pengguna, tenggat, engine=None, skor_jalur=None,
+                               agregat_gunung=None, indeks=None, sumber_media=None, ukuran_chunk=256):
+    """
+    proses_rekomendasi dengan tenggat (nilai time.monotonic()). Mengembalikan
+    (rekomendasi_gunung, rekomendasi_jalur, info); info["status"]:
+    - "lengkap": semua kandidat dinilai, hasil sama dengan proses_rekomendasi;
+    - "teratas_pasti": urutan top_k jalur dan gunung terbukti final, kandidat lain yang
+      batas atas skornya di bawah top_k tidak dinilai kecuali jalur milik gunung top_k, sehingga
+      agregat gunung yang tampil tetap sama dengan hasil lengkap (total/statistik hanya atas
+      yang dinilai);
+    - "upaya_terbaik": tenggat habis, hasil dari kandidat yang sempat dinilai; kolom
+      KOLOM_AGREGAT_SEMUA_JALUR gunung yang masih punya jalur belum dinilai diisi null dan
+      id gunungnya dicantumkan di info["gunung_agregat_sebagian"].
+    """
+    info = {"status": "lengkap", "sumber": "skor_tersimpan", "jalur_kandidat": 0,
+            "jalur_belum_dinilai": 0, "jalur_dinilai_sekarang": 0,
+            "agregat_gunung_lengkap": True, "gunung_agregat_sebagian": []}
+    if df_jalur.empty:
+        return pd.DataFrame(), pd.DataFrame(), info
+    engine = engine or dapatkan_engine()
+    total_jalur = len(df_jalur)
+    mask = np.ones(total_jalur, dtype=bool)
+    if preferensi_pengguna:
+        mask, _ = mask_filter(df_jalur, kompilasi_filter(preferensi_pengguna), indeks)
+    df_jalur = df_jalur.ke_dataframe(mask) if isinstance(df_jalur, TokoJalur) else df_jalur[mask]
+    n = len(df_jalur)
+    info["jalur_kandidat"] = n
+    if n == 0:
+        return pd.DataFrame(), pd.DataFrame(), info
+
+    bobot = baca_bobot(preferensi_pengguna)
+    if skor_jalur is not None:
+        fuzzy, ada = skor_jalur.tersimpan(df_jalur)
+    else:
+        fuzzy, ada = np.full(n, np.nan), np.zeros(n, dtype=bool)
+    skor = np.full(n, np.nan)
+    skor[ada] = gabung_skor(fuzzy[ada], df_jalur[ada], bobot)
+    pasti = True
+    dinilai = []
+    if not ada.all():
+        info["sumber"] = "penilaian_bertahap"
+        top_k, offset = baca_paginasi(preferensi_pengguna)
+        kode_gunung, unik_gunung = pd.factorize(df_jalur['id_gunung'])
+        k_jalur = n if top_k is None else min(n, offset + top_k)
+        k_gunung = len(unik_gunung) if top_k is None else min(len(unik_gunung), offset + top_k)
+        batas_atas = gabung_skor(np.full(n, float(engine.kompilasi["universe_output"].max())), df_jalur, bobot)
+        belum = np.flatnonzero(~ada)
+        antrean = belum[np.argsort(-batas_atas[belum], kind='stable')]
+
+        def nilai(chunk):
+            fuzzy[chunk] = hitung_skor_fuzzy(df_jalur.iloc[chunk], engine)
+            skor[chunk] = gabung_skor(fuzzy[chunk], df_jalur.iloc[chunk], bobot)
+            ada[chunk] = True
+            dinilai.append(chunk)
+
+        def ke_k_gunung_sekarang():
+            maks_gunung = np.full(len(unik_gunung), -np.inf)
+            bergunung = ada & (kode_gunung >= 0)
+            np.fmax.at(maks_gunung, kode_gunung[bergunung], skor[bergunung])
+            ke_k = _terbesar_ke(maks_gunung[np.isfinite(maks_gunung)], k_gunung) if k_gunung else np.inf
+            return maks_gunung, ke_k
+
+        while len(antrean):
+            # Top-k pasti bila skor ke-k (jalur dan maksimum per gunung) melampaui batas atas sisa
+            maks_gunung, ke_k_gunung = ke_k_gunung_sekarang()
+            ke_k_jalur = _terbesar_ke(skor[ada], k_jalur) if k_jalur else np.inf
+            if ke_k_jalur is not None and ke_k_gunung is not None and \
+                    min(ke_k_jalur, ke_k_gunung) > batas_atas[antrean[0]]:
+                break
+            # Tenggat habis: hasil dari yang sudah dinilai (minimal satu chunk bila belum ada)
+            if time.monotonic() >= tenggat and ada.any():
+                pasti = False
+                break
+            chunk, antrean = antrean[:ukuran_chunk], antrean[ukuran_chunk:]
+            nilai(chunk)
+        if pasti and not ada.all() and len(unik_gunung):
+            # Peringkat sudah final; sisa jalur gunung top_k tetap dinilai agar agregatnya lengkap
+            maks_gunung, ke_k_gunung = ke_k_gunung_sekarang()
+            tampil = np.isfinite(maks_gunung) & (maks_gunung >= ke_k_gunung)
+            sisa = np.flatnonzero(~ada & (kode_gunung >= 0) & tampil[kode_gunung])
+            if len(sisa):
+                nilai(sisa)
+    if dinilai and isinstance(skor_jalur, SkorJalur):
+        # Skor yang sudah dihitung disimpan agar permintaan berikutnya tidak menilai ulang
+        baru = np.concatenate(dinilai)
+        skor_jalur.perbarui(df_jalur.iloc[baru], fuzzy[baru])
+
+    lengkap = bool(ada.all())
+    info["jalur_belum_dinilai"] = int(n - ada.sum())
+    info["jalur_dinilai_sekarang"] = int(sum(len(c) for c in dinilai))
+    info["status"] = "lengkap" if lengkap else ("teratas_pasti" if pasti else "upaya_terbaik")
+    gunung_belum_lengkap = set()
+    if not lengkap:
+        if not pasti:
+            gunung_belum_lengkap = set(df_jalur['id_gunung'].to_numpy()[~ada].tolist())
+        df_jalur, skor = df_jalur[ada], skor[ada]
+        agregat_gunung = None
+    df_jalur = df_jalur.assign(skor_rekomendasi=skor, kategori_rekomendasi=kategorikan_vektor(skor))
+    df_gunung, df_jalur_ranked = _susun_hasil(df_jalur, preferensi_pengguna, total_jalur, agregat_gunung,
+                                              bobot, sumber_media)
+    if gunung_belum_lengkap and not df_gunung.empty:
+        # Agregat atas sebagian jalur akan menyesatkan; skor_tertinggi tetap ada (dasar peringkat)
+        sebagian = df_gunung['id_gunung'].isin(gunung_belum_lengkap).to_numpy()
+        if sebagian.any():
+            for kolom in KOLOM_AGREGAT_SEMUA_JALUR:
+                df_gunung[kolom] = df_gunung[kolom].where(~sebagian)
+            info["agregat_gunung_lengkap"] = False
+            info["gunung_agregat_sebagian"] = df_gunung['id_gunung'].to_numpy()[sebagian].tolist()
+    return df_gunung, df_jalur_ranked, info
+
+# 3.9 Penyempitan Kandidat (sesi)
+def lebih_ketat(filter_baru, filter_lama):
+    """
+    True bila setiap jalur yang lolos filter_baru pasti lolos filter_lama (keduanya dari
+    filter_kanonik): semua batas lama tetap ada dan tidak dilonggarkan. Nilai non-angka
+    tidak dibandingkan (dianggap tidak lebih ketat).
+    """
+    if not all(isinstance(v, (int, float, np.number)) for v in [*filter_baru.values(), *filter_lama.values()]):
+        return False
+    for kunci, lama in filter_lama.items():
+        baru = filter_baru.get(kunci)
+        if baru is None:
+            return False
+        if not (baru <= lama if SPEK_FILTER[kunci]['op'] == '<=' else baru >= lama):
+            return False
+    return True
+
+def _baris_jalur(df_jalur, posisi):
+    return df_jalur.ke_dataframe(posisi) if isinstance(df_jalur, TokoJalur) else df_jalur.iloc[posisi].copy()
+
+def proses_rekomendasi_kandidat(df_jalur, preferensi_pengguna, kandidat=None, engine=None, skor_jalur=None,
+                                agregat_gunung=None, indeks=None, sumber_media=None):
+    """
+    proses_rekomendasi yang juga mengembalikan kandidatnya: (gunung, jalur, (posisi, skor))
+    dengan posisi baris df_jalur yang lolos filter (naik) dan skor akhirnya.
+    Bila kandidat dari filter yang lebih longgar (lihat lebih_ketat) dan bobot yang sama
+    diberikan, hanya kandidat itu yang difilter; skornya dipakai apa adanya.
+    Hasil sama dengan proses_rekomendasi untuk df_jalur yang sama.
+    """
+    kosong = (np.empty(0, dtype=np.int32), np.empty(0))
+    if df_jalur.empty:
+        return pd.DataFrame(), pd.DataFrame(), kosong
+    filter_aktif = kompilasi_filter(preferensi_pengguna) if preferensi_pengguna else []
+    bobot = baca_bobot(preferensi_pengguna)
+    if kandidat is None:
+        mask, _ = mask_filter(df_jalur, filter_aktif, indeks)
+        posisi = np.flatnonzero(mask).astype(np.int32)
+        df_kandidat = _baris_jalur(df_jalur, posisi)
+        if skor_jalur is not None:
+            skor, kategori = skor_jalur.ambil(df_kandidat, bobot)
+        else:
+            skor = hitung_skor_jalur(df_kandidat, engine or dapatkan_engine(), bobot=bobot)
+            kategori = kategorikan_vektor(skor)
+    else:
+        # Cukup kolom yang difilter untuk kandidat, bukan seluruh baris katalog
+        posisi, skor = kandidat
+        kolom = {spek[1] for spek in filter_aktif if spek[1] in df_jalur.columns}
+        df_filter = pd.DataFrame({k: (df_jalur.ambil(k, posisi) if isinstance(df_jalur, TokoJalur)
+                                      else np.asarray(df_jalur[k])[posisi]) for k in kolom},
+                                 index=np.arange(len(posisi)))
+        mask, _ = mask_filter(df_filter, filter_aktif)
+        print(f"[SESI] Kandidat dipersempit: {int(mask.sum())} dari {len(posisi)} (tanpa penilaian ulang)",
+              file=sys.stderr)
+        posisi, skor = posisi[mask], skor[mask]
+        df_kandidat = _baris_jalur(df_jalur, posisi)
+        kategori = kategorikan_vektor(skor)
+    if df_kandidat.empty:
+        return pd.DataFrame(), pd.DataFrame(), (posisi, np.asarray(skor, dtype=float))
+    df_kandidat['skor_rekomendasi'], df_kandidat['kategori_rekomendasi'] = skor, kategori
+    skor = df_kandidat['skor_rekomendasi'].to_numpy(dtype=float)
+    return (*_susun_hasil(df_kandidat, preferensi_pengguna, len(df_jalur), agregat_gunung, bobot, sumber_media),
+            (posisi, skor))
+
 # 4. Eksekusi dan Simulasi
 def jalankan_simulasi():
     """Fungsi untuk menjalankan simulasi dan menampilkan hasilnya dengan berbagai skenario."""
@@ -578,8 +1555,18 @@ def jalankan_simulasi():
         "max_ketinggian_mdpl": 3000  # Hindari gunung sangat tinggi
     }
     
+    preferensi_berpengalaman = {
+        "min_keindahan_pemandangan": 8,  # Mengutamakan pemandangan istimewa
+        "min_keamanan_skala": 5,         # Bisa terima risiko sedang
+        "max_kesulitan_skala": 10        # Tidak masalah dengan kesulitan tinggi
+    }
+    # Ketiga skenario dinilai dalam satu batch: skor jalur dihitung sekali lalu
+    # setiap skenario hanya menerapkan filternya sendiri
+    (rekomendasi_gunung, rekomendasi_jalur), (rekomendasi_gunung2, rekomendasi_jalur2), \
+        (rekomendasi_gunung_full, rekomendasi_jalur_full) = proses_rekomendasi_batch(
+            df_data, [preferensi_pemula, preferensi_berpengalaman, None])
+
     print(f"Preferensi: {preferensi_pemula}")
-    rekomendasi_gunung, rekomendasi_jalur = proses_rekomendasi(df_data.copy(), preferensi_pemula)
     
     if not rekomendasi_gunung.empty:
         print("\n🏆 TOP 3 REKOMENDASI GUNUNG UNTUK PEMULA:")
@@ -589,14 +1576,7 @@ def jalankan_simulasi():
     # Skenario 2: Pendaki Berpengalaman
     print("\n\n📍 SKENARIO 2: PENDAKI BERPENGALAMAN")
     print("-" * 50)
-    preferensi_berpengalaman = {
-        "min_keindahan_pemandangan": 8,  # Mengutamakan pemandangan istimewa
-        "min_keamanan_skala": 5,         # Bisa terima risiko sedang
-        "max_kesulitan_skala": 10        # Tidak masalah dengan kesulitan tinggi
-    }
-    
     print(f"Preferensi: {preferensi_berpengalaman}")
-    rekomendasi_gunung2, rekomendasi_jalur2 = proses_rekomendasi(df_data.copy(), preferensi_berpengalaman)
     
     if not rekomendasi_gunung2.empty:
         print("\n🏆 TOP 3 REKOMENDASI GUNUNG UNTUK PENDAKI BERPENGALAMAN:")
@@ -606,8 +1586,6 @@ def jalankan_simulasi():
     # Skenario 3: Tanpa Filter (Semua Data)
     print("\n\n📍 SKENARIO 3: REKOMENDASI UMUM (TANPA FILTER)")
     print("-" * 50)
-    rekomendasi_gunung_full, rekomendasi_jalur_full = proses_rekomendasi(df_data.copy())
-    
     if not rekomendasi_gunung_full.empty:
         print("\n🏆 TOP 5 REKOMENDASI GUNUNG SECARA UMUM:")
         top_umum = rekomendasi_gunung_full.head(5)[['nama_gunung', 'jalur_terbaik', 'skor_tertinggi', 'kategori_rekomendasi', 'jumlah_jalur', 'keamanan_rata_rata']]
@@ -628,15 +1606,156 @@ def jalankan_simulasi():
 
 
 # 5. Fungsi Main untuk Integrasi dengan Node.js
+# 5.1 Serialisasi Ringkas
+TATA_LETAK_TABEL = ('records', 'kolom')
+
+def _nilai_json(nilai):
+    """Satu nilai sel (object/NumPy/pandas) menjadi nilai yang aman untuk JSON."""
+    if isinstance(nilai, np.generic):
+        nilai = nilai.item()
+    if isinstance(nilai, float):
+        return nilai if np.isfinite(nilai) else None
+    if nilai is None or isinstance(nilai, (str, int, bool)):
+        return nilai
+    if isinstance(nilai, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(nilai) else pd.Timestamp(nilai).isoformat()
+    if pd.api.types.is_scalar(nilai) and pd.isna(nilai):
+        return None
+    if isinstance(nilai, Decimal):
+        return float(nilai)
+    return str(nilai)
+
+def _kolom_json(kolom):
+    """Satu kolom DataFrame menjadi list nilai JSON (NaN/inf -> null, skalar NumPy -> Python)."""
+    array = kolom.to_numpy()
+    if array.dtype.kind == 'f':
+        hasil = array.tolist()
+        tidak_hingga = ~np.isfinite(array)
+        if tidak_hingga.any():
+            for i in np.flatnonzero(tidak_hingga):
+                hasil[i] = None
+        return hasil
+    if array.dtype.kind in 'iub':
+        return array.tolist()
+    return [_nilai_json(v) for v in array.tolist()]
+
+def tabel_json(df, tata_letak='records'):
+    """
+    DataFrame menjadi struktur JSON tanpa to_json/json.loads.
+    'records': list dict per baris (format lama); 'kolom': satu array per field.
+    """
+    kolom = {str(nama): _kolom_json(df[nama]) for nama in df.columns}
+    if tata_letak == 'kolom':
+        return kolom
+    nama = list(kolom)
+    return [dict(zip(nama, baris)) for baris in zip(*kolom.values())]
+
+def _default_json(objek):
+    if isinstance(objek, np.generic):
+        return objek.item()
+    raise TypeError(f"Object of type {type(objek).__name__} is not JSON serializable")
+
+def dumps_ringkas(objek, indent=None):
+    """Enkode JSON satu baris (tanpa spasi) yang menolak NaN agar JSON.parse di Node tidak gagal."""
+    pemisah = (',', ':') if indent is None else None
+    return json.dumps(objek, ensure_ascii=False, separators=pemisah, indent=indent,
+                      allow_nan=False, default=_default_json)
+
+def bangun_hasil_akhir(rekomendasi_gunung, rekomendasi_jalur, preferensi_pengguna, engine=None,
+                       tata_letak='records'):
+    """
+    Menyusun dictionary respons (rekomendasi + metadata) yang dikirim ke Node.js.
+    tata_letak 'kolom' mengirim tabel sebagai satu array per field (lebih ringkas).
+    """
+    if tata_letak not in TATA_LETAK_TABEL:
+        raise ValueError(f"Tata letak tidak dikenal: {tata_letak}")
+    return {
+        "rekomendasi_gunung": tabel_json(rekomendasi_gunung, tata_letak),
+        "rekomendasi_jalur": tabel_json(rekomendasi_jalur, tata_letak),
+        "metadata": bangun_metadata(rekomendasi_gunung, rekomendasi_jalur, preferensi_pengguna, engine, tata_letak),
+    }
+
+def bangun_metadata(rekomendasi_gunung, rekomendasi_jalur, preferensi_pengguna, engine=None,
+                    tata_letak='records'):
+    """Metadata respons: total, statistik skor, distribusi kategori, paginasi, info engine."""
+    engine = engine or dapatkan_engine()
+    # Total dan statistik dari proses_rekomendasi (seluruh hasil walau hanya top_k yang dikirim)
+    ringkasan = rekomendasi_gunung.attrs.get('ringkasan')
+    if ringkasan is None:
+        skor_gunung = rekomendasi_gunung['skor_tertinggi'] if not rekomendasi_gunung.empty else []
+        ringkasan = ringkasan_hasil(skor_gunung, len(rekomendasi_jalur))
+
+    metadata_paginasi = {"paginasi": ringkasan["paginasi"]} if "paginasi" in ringkasan else {}
+    if "bobot" in ringkasan:
+        metadata_paginasi["bobot"] = ringkasan["bobot"]
+    if tata_letak != 'records':
+        metadata_paginasi["tata_letak"] = tata_letak
+    return {
+        "total_gunung": ringkasan["total_gunung"],
+        "total_jalur": ringkasan["total_jalur"],
+        "preferensi_diterapkan": preferensi_pengguna is not None,
+        "preferensi_detail": preferensi_pengguna if preferensi_pengguna else {},
+        "statistik_skor": ringkasan["statistik_skor"],
+        "distribusi_kategori": ringkasan["distribusi_kategori"],
+        **metadata_paginasi,
+        "engine_info": {
+            "versi": "5.0 - Sesuai Standar Dokumentasi",
+            "total_variabel": 13,
+            "sistem_bobot": True,
+            "database_integration": True,
+            # Hash definisi MF + rules; mengikat skor dengan rule set yang menghasilkannya
+            "versi_aturan": engine.versi
+        }
+    }
+
+# 5.2 Keluaran Stream (NDJSON)
+TABEL_STREAM = ('gunung', 'jalur')
+
+def pesan_stream(rekomendasi_gunung, rekomendasi_jalur, preferensi_pengguna, engine=None,
+                 tabel=TABEL_STREAM, ukuran_chunk=500):
+    """Generator pesan stream: header, baris berperingkat per tabel, lalu penutup."""
+    yield {"jenis": "header",
+           "metadata": bangun_metadata(rekomendasi_gunung, rekomendasi_jalur, preferensi_pengguna, engine)}
+    jumlah = {}
+    for jenis, df in (("gunung", rekomendasi_gunung), ("jalur", rekomendasi_jalur)):
+        if jenis not in tabel:
+            continue
+        jumlah[jenis] = len(df)
+        for awal in range(0, len(df), ukuran_chunk):
+            for peringkat, baris in enumerate(tabel_json(df.iloc[awal:awal + ukuran_chunk]), start=awal + 1):
+                yield {"jenis": jenis, "peringkat": peringkat, "data": baris}
+    yield {"jenis": "selesai", "jumlah_baris": jumlah}
+
+def bangun_respons_error(e):
+    """Respons error yang tetap bisa diparse oleh Node.js."""
+    return {
+        "error": True,
+        "message": str(e),
+        "rekomendasi_gunung": [],
+        "rekomendasi_jalur": [],
+        "metadata": {
+            "total_gunung": 0,
+            "total_jalur": 0,
+            "preferensi_diterapkan": False,
+            "engine_info": {
+                "versi": "5.0 - Error State",
+                "error_detail": str(e)
+            }
+        }
+    }
+
 def main():
     print("[PYTHON DEBUG] Mulai main()", file=sys.stderr)
     preferensi_pengguna = None
     
     # Parse command line arguments dari Node.js
-    if len(sys.argv) > 1:
+    # Flag opsional: --kolom, --pretty, --stream (NDJSON), --paralel, --batch (daftar preferensi)
+    argumen = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flag = {a for a in sys.argv[1:] if a.startswith("--")}
+    if argumen:
         try:
             # Ambil string JSON dari argumen baris perintah
-            preferensi_json = sys.argv[1]
+            preferensi_json = argumen[0]
             # Ubah string JSON menjadi dictionary Python
             preferensi_pengguna = json.loads(preferensi_json)
             print(f"✅ Menerima preferensi: {preferensi_pengguna}", file=sys.stderr)
@@ -648,75 +1767,53 @@ def main():
     try:
         print("[PYTHON DEBUG] Sebelum proses_rekomendasi", file=sys.stderr)
         # 1. Jalankan proses utama dengan data dari database
-        rekomendasi_gunung, rekomendasi_jalur = proses_rekomendasi(None, preferensi_pengguna)
+        paralel = PoolSkor() if "--paralel" in flag else PoolSkor.dari_env()
+        try:
+            if "--batch" in flag:
+                daftar_preferensi = preferensi_pengguna or []
+                daftar_hasil = proses_rekomendasi_batch(None, daftar_preferensi, skor_jalur=SkorJalur(paralel=paralel))
+            else:
+                rekomendasi_gunung, rekomendasi_jalur = proses_rekomendasi(
+                    None, preferensi_pengguna, skor_jalur=SkorJalur(paralel=paralel))
+        finally:
+            if paralel is not None:
+                paralel.tutup()
         print("[PYTHON DEBUG] Setelah proses_rekomendasi", file=sys.stderr)
+
+        if "--batch" in flag:
+            hasil = [bangun_hasil_akhir(g, j, p, tata_letak='kolom' if "--kolom" in flag else 'records')
+                     for (g, j), p in zip(daftar_hasil, daftar_preferensi)]
+            print(dumps_ringkas({"hasil": hasil}, indent=2 if "--pretty" in flag else None))
+            return
         
-        print("[PYTHON DEBUG] Sebelum konversi DataFrame ke JSON", file=sys.stderr)
-        # 2. Hitung statistik tambahan untuk metadata
-        if not rekomendasi_gunung.empty:
-            distribusi_kategori = rekomendasi_gunung['kategori_rekomendasi'].value_counts().to_dict()
-            skor_tertinggi = rekomendasi_gunung['skor_tertinggi'].max()
-            skor_terendah = rekomendasi_gunung['skor_tertinggi'].min()
-            skor_rata_rata = rekomendasi_gunung['skor_tertinggi'].mean()
-        else:
-            distribusi_kategori = {}
-            skor_tertinggi = skor_terendah = skor_rata_rata = 0
-        
-        # 3. Siapkan hasil dalam format dictionary agar bisa dikonversi ke JSON
-        hasil_akhir = {
-            "rekomendasi_gunung": json.loads(rekomendasi_gunung.to_json(orient='records')),
-            "rekomendasi_jalur": json.loads(rekomendasi_jalur.to_json(orient='records')),
-            "metadata": {
-                "total_gunung": len(rekomendasi_gunung),
-                "total_jalur": len(rekomendasi_jalur),
-                "preferensi_diterapkan": preferensi_pengguna is not None,
-                "preferensi_detail": preferensi_pengguna if preferensi_pengguna else {},
-                "statistik_skor": {
-                    "tertinggi": float(skor_tertinggi),
-                    "terendah": float(skor_terendah),
-                    "rata_rata": float(skor_rata_rata)
-                },
-                "distribusi_kategori": distribusi_kategori,
-                "engine_info": {
-                    "versi": "5.0 - Sesuai Standar Dokumentasi",
-                    "total_variabel": 13,
-                    "sistem_bobot": True,
-                    "database_integration": True
-                }
-            }
-        }
-        print("[PYTHON DEBUG] Setelah konversi DataFrame ke JSON", file=sys.stderr)
+        # 2. Siapkan hasil dalam format dictionary agar bisa dikonversi ke JSON
+        if "--stream" in flag:
+            # Satu baris JSON per pesan agar pembaca bisa meneruskan hasil sambil jalan
+            for pesan in pesan_stream(rekomendasi_gunung, rekomendasi_jalur, preferensi_pengguna):
+                print(dumps_ringkas(pesan), flush=True)
+            return
+        hasil_akhir = bangun_hasil_akhir(rekomendasi_gunung, rekomendasi_jalur, preferensi_pengguna,
+                                         tata_letak='kolom' if "--kolom" in flag else 'records')
 
-        # 4. Cetak hasil akhir sebagai satu string JSON ke output standar
+        # 3. Cetak hasil akhir sebagai satu string JSON ke output standar
         # Inilah yang akan ditangkap oleh server.js
-        print(json.dumps(hasil_akhir, indent=2, ensure_ascii=False))
+        print(dumps_ringkas(hasil_akhir, indent=2 if "--pretty" in flag else None))
     except Exception as e:
         print(f"❌ Error in fuzzy engine: {e}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         # Return error response yang bisa diparse oleh Node.js
-        error_response = {
-            "error": True,
-            "message": str(e),
-            "rekomendasi_gunung": [],
-            "rekomendasi_jalur": [],
-            "metadata": {
-                "total_gunung": 0,
-                "total_jalur": 0,
-                "preferensi_diterapkan": False,
-                "engine_info": {
-                    "versi": "5.0 - Error State",
-                    "error_detail": str(e)
-                }
-            }
-        }
-        print(json.dumps(error_response))
+        print(dumps_ringkas(bangun_respons_error(e)))
         sys.exit(1)
 
 
 if __name__ == "__main__":
+    # --serve: worker jangka panjang untuk Node.js (lihat fuzzy_engine_worker.py)
     # Jika dipanggil dengan argumen (dari Node.js), jalankan main()
     # Jika tidak ada argumen, jalankan simulasi untuk testing
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        from fuzzy_engine_worker import jalankan_server
+        jalankan_server()
+    elif len(sys.argv) > 1:
         main()
     else:
-        jalankan_simulasi()
\ No newline at end of file
+        jalankan_simulasi()
@@ -15,11 +15,14 @@ import os
 import traceback
 
 # --- Import fungsi utama dari fuzzy_engine.py ---
-from fuzzy_engine import get_data_jalur_from_database, proses_rekomendasi
+from fuzzy_engine import get_data_jalur_from_database, proses_rekomendasi, proses_rekomendasi_batch
 
-def analisis_distribusi(preferensi_pengguna=None):
-    df = get_data_jalur_from_database()
-    rekomendasi_gunung, rekomendasi_jalur = proses_rekomendasi(df, preferensi_pengguna)
+def analisis_distribusi(preferensi_pengguna=None, hasil=None):
+    # hasil = (rekomendasi_gunung, rekomendasi_jalur) yang sudah dihitung (mis. dari batch)
+    if hasil is None:
+        df = get_data_jalur_from_database()
+        hasil = proses_rekomendasi(df, preferensi_pengguna)
+    rekomendasi_gunung, rekomendasi_jalur = hasil
     
     print("\n===== ANALISIS DISTRIBUSI KATEGORI REKOMENDASI GUNUNG =====")
     if not rekomendasi_gunung.empty:
@@ -53,7 +56,9 @@ if __name__ == "__main__":
         "min_ketersediaan_air": 4,
         "max_ketinggian_mdpl": 4000
     }
+    # Kedua profil dinilai dalam satu batch (data dimuat dan skor dihitung sekali)
+    hasil_filter, hasil_semua = proses_rekomendasi_batch(None, [preferensi, None])
     print("Preferensi untuk analisis distribusi:", preferensi)
-    analisis_distribusi(preferensi)
+    analisis_distribusi(preferensi, hasil_filter)
     print("\nAnalisis tanpa filter preferensi:")
-    analisis_distribusi(None)
+    analisis_distribusi(None, hasil_semua)
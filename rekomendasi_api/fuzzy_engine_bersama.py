@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Dataset Bersama Fuzzy Engine
+
+Beberapa worker --serve di mesin yang sama memakai satu katalog hangat: satu proses
+(pemegang kunci) menerbitkan TokoJalur katalog, tabel skor per id_jalur dan agregat
+gunung sebagai file .npy lalu mengganti manifest.json secara atomik; worker lain
+membukanya dengan mmap read-only sehingga halaman data dibagi lewat page cache.
+
+Diaktifkan dengan FUZZY_DATASET_BERSAMA=<direktori> (lihat fuzzy_engine_worker.py).
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: penerbitan dataset bersama tanpa kunci antar proses
+    fcntl = None
+
+from fuzzy_engine import TokoJalur, dapatkan_engine, gabung_skor, kategorikan_vektor
+
+FORMAT_DATASET_BERSAMA = 2
+
+class SkorTerbit:
+    """Skor dan kategori dari dataset bersama; antarmuka ambil() sama dengan SkorJalur."""
+
+    def __init__(self, tabel):
+        self.tabel = tabel
+
+    def ambil(self, df_jalur, bobot=None):
+        posisi = self.tabel.cari('id_jalur', df_jalur['id_jalur'].to_numpy(dtype=np.int64))
+        if bobot is not None:
+            skor = gabung_skor(self.tabel.ambil('skor_fuzzy', posisi), df_jalur, bobot)
+            return skor, kategorikan_vektor(skor)
+        return (self.tabel.ambil('skor_rekomendasi', posisi),
+                self.tabel.ambil('kategori_rekomendasi', posisi))
+
+    def ambil_fuzzy(self, df_jalur):
+        posisi = self.tabel.cari('id_jalur', df_jalur['id_jalur'].to_numpy(dtype=np.int64))
+        return self.tabel.ambil('skor_fuzzy', posisi)
+
+    def tersimpan(self, df_jalur):
+        # Dataset bersama selalu diterbitkan lengkap dengan skornya
+        return self.ambil_fuzzy(df_jalur), np.ones(len(df_jalur), dtype=bool)
+
+class DatasetBersama:
+    """Penerbitan dan pembukaan katalog hangat (mmap) yang dipakai bersama beberapa worker."""
+
+    def __init__(self, direktori, engine=None):
+        self.direktori = direktori
+        self.engine = engine or dapatkan_engine()
+        self.path_manifest = os.path.join(direktori, "manifest.json")
+
+    @classmethod
+    def dari_env(cls, engine=None):
+        """DatasetBersama di FUZZY_DATASET_BERSAMA, atau None bila tidak diatur (data per proses)."""
+        direktori = os.getenv("FUZZY_DATASET_BERSAMA")
+        return cls(direktori, engine) if direktori else None
+
+    def manifest(self):
+        try:
+            with open(self.path_manifest, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format") != FORMAT_DATASET_BERSAMA or manifest.get("engine") != self.engine.versi:
+            return None
+        return manifest
+
+    @contextmanager
+    def kunci(self):
+        """Kunci antar proses agar hanya satu worker yang membangun versi baru."""
+        os.makedirs(self.direktori, exist_ok=True)
+        with open(os.path.join(self.direktori, ".kunci"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def buka(self, manifest=None):
+        """(manifest, toko, skor_terbit, agregat_gunung) versi aktif, atau None bila belum ada."""
+        for _ in range(3):
+            manifest = manifest or self.manifest()
+            if manifest is None:
+                return None
+            folder = os.path.join(self.direktori, manifest["versi"])
+            try:
+                toko = TokoJalur.buka(folder, manifest["jalur"], manifest["jumlah_jalur"])
+                skor = SkorTerbit(TokoJalur.buka(os.path.join(folder, "skor"), manifest["skor"],
+                                                 manifest["jumlah_jalur"]))
+                agregat = None
+                if manifest["agregat"] is not None:
+                    agregat = TokoJalur.buka(os.path.join(folder, "agregat"), manifest["agregat"],
+                                             manifest["jumlah_gunung"]).ke_dataframe()
+                return manifest, toko, skor, agregat
+            except (OSError, ValueError) as e:
+                # Versi ini baru saja dibersihkan penerbit: baca ulang manifest
+                print(f"⚠️ Dataset bersama versi {manifest['versi']} tidak dapat dibuka: {e}", file=sys.stderr)
+                manifest = None
+        return None
+
+    def terbitkan(self, df_jalur, skor_fuzzy, skor, kategori, agregat_gunung, sidik):
+        """Menulis versi baru lalu menjadikannya aktif; versi lama (selain pendahulunya) dihapus."""
+        lama = self.manifest()
+        versi = f"{time.time_ns():x}-{os.getpid()}"
+        folder = os.path.join(self.direktori, versi)
+        for sub in ("skor", "agregat"):
+            os.makedirs(os.path.join(folder, sub))
+        urutan = np.argsort(df_jalur['id_jalur'].to_numpy(), kind='stable')
+        tabel_skor = pd.DataFrame({
+            'id_jalur': df_jalur['id_jalur'].to_numpy()[urutan],
+            'skor_fuzzy': np.asarray(skor_fuzzy, dtype=float)[urutan],
+            'skor_rekomendasi': np.asarray(skor)[urutan],
+            'kategori_rekomendasi': np.asarray(kategori, dtype=object)[urutan],
+        })
+        manifest = {
+            "format": FORMAT_DATASET_BERSAMA, "engine": self.engine.versi, "sidik": sidik, "versi": versi,
+            "jumlah_jalur": len(df_jalur), "jalur": TokoJalur(df_jalur).simpan(folder),
+            "skor": TokoJalur(tabel_skor).simpan(os.path.join(folder, "skor")),
+            "jumlah_gunung": 0 if agregat_gunung is None else len(agregat_gunung),
+            "agregat": None,
+        }
+        if agregat_gunung is not None:
+            manifest["agregat"] = TokoJalur(agregat_gunung).simpan(os.path.join(folder, "agregat"))
+        sementara = f"{self.path_manifest}.{os.getpid()}.tmp"
+        with open(sementara, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(sementara, self.path_manifest)
+        # Pendahulu dipertahankan untuk pembaca yang masih memegang manifest lama
+        simpan = {versi, lama["versi"] if lama else None}
+        for nama in os.listdir(self.direktori):
+            if nama not in simpan and os.path.isdir(os.path.join(self.direktori, nama)):
+                shutil.rmtree(os.path.join(self.direktori, nama), ignore_errors=True)
+        print(f"📤 Dataset bersama versi {versi} diterbitkan ({len(df_jalur)} jalur)", file=sys.stderr)
+        return manifest
+
+    def siapkan(self, sidik, bangun):
+        """
+        Membuka versi untuk sidik katalog ini; bila belum ada, satu proses memanggil
+        bangun() -> (df_jalur, skor_fuzzy, skor, kategori, agregat_gunung) lalu menerbitkannya.
+        """
+        manifest = self.manifest()
+        if manifest is not None and manifest["sidik"] == sidik:
+            terbuka = self.buka(manifest)
+            if terbuka is not None:
+                return terbuka
+        with self.kunci():
+            # Worker lain mungkin sudah menerbitkan selama kita menunggu kunci
+            manifest = self.manifest()
+            if manifest is None or manifest["sidik"] != sidik or self.buka(manifest) is None:
+                manifest = self.terbitkan(*bangun(), sidik)
+            return self.buka(manifest)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Cache, Penggabungan dan Sesi Worker Fuzzy Engine
+
+Struktur yang menyimpan hasil di antara permintaan worker --serve:
+- CacheHasil            : hasil (DataFrame gunung, jalur) per preferensi kanonik dan versi data
+- PenggabungPermintaan  : permintaan identik yang datang selama komputasinya berjalan
+                          memakai Future yang sama
+- SesiPreferensi        : kandidat permintaan sebelumnya per token sesi; filter yang hanya
+                          diperketat dijawab dari kandidat itu (lihat proses_rekomendasi_kandidat)
+
+Konfigurasi lewat environment:
+- FUZZY_CACHE_HASIL_MAKS / FUZZY_CACHE_HASIL_TTL_DETIK : ukuran dan umur cache hasil (default 256 / 300)
+- FUZZY_SESI_MAKS / FUZZY_SESI_MAKS_MB / FUZZY_SESI_TTL_DETIK : batas sesi (default 1024 / 32 / 900)
+"""
+
+import os
+import json
+import time
+import secrets
+import threading
+import numpy as np
+from collections import OrderedDict
+from functools import partial
+
+from fuzzy_engine import KUNCI_KONTROL, filter_kanonik
+
+# 1. Cache Hasil
+def _nilai_kanonik(nilai):
+    if isinstance(nilai, dict):
+        return {str(k): _nilai_kanonik(v) for k, v in nilai.items()}
+    if isinstance(nilai, (list, tuple)):
+        return [_nilai_kanonik(v) for v in nilai]
+    # 4, 4.0, True dan np.int64(4) menghasilkan mask dan skor yang sama
+    if isinstance(nilai, (int, float, np.number)):
+        return float(nilai)
+    return nilai
+
+def kunci_preferensi(preferensi_pengguna):
+    """
+    Bentuk kanonik preferensi (string JSON berurutan kunci): alias diganti kunci utamanya
+    (kunci utama menang, sama seperti kompilasi_filter), angka disamakan tipenya dan kunci
+    yang tidak dikenal dibuang karena tidak memengaruhi hasil.
+    """
+    preferensi_pengguna = preferensi_pengguna or {}
+    kanonik = {kunci: _nilai_kanonik(nilai) for kunci, nilai in filter_kanonik(preferensi_pengguna).items()}
+    for kunci in sorted(KUNCI_KONTROL & set(preferensi_pengguna)):
+        kanonik[kunci] = _nilai_kanonik(preferensi_pengguna[kunci])
+    return json.dumps(kanonik, sort_keys=True, separators=(',', ':'), default=repr)
+
+class CacheHasil:
+    """
+    Cache LRU hasil rekomendasi dengan TTL. maks = jumlah entri (0 mematikan cache),
+    ttl = umur entri dalam detik (0 = tanpa kedaluwarsa); default dari
+    FUZZY_CACHE_HASIL_MAKS / FUZZY_CACHE_HASIL_TTL_DETIK. TTL menjaga perubahan data yang
+    tidak diberitahukan ke worker; perubahan yang diketahui mengosongkan cache.
+    """
+
+    def __init__(self, maks=None, ttl=None):
+        self.maks = int(os.getenv("FUZZY_CACHE_HASIL_MAKS", "256")) if maks is None else maks
+        self.ttl = float(os.getenv("FUZZY_CACHE_HASIL_TTL_DETIK", "300")) if ttl is None else ttl
+        self._isi = OrderedDict()
+        self._kunci = threading.Lock()
+        self.hit = 0
+        self.miss = 0
+
+    def ambil(self, kunci):
+        with self._kunci:
+            entri = self._isi.get(kunci)
+            if entri is not None and self.ttl > 0 and time.monotonic() - entri[0] > self.ttl:
+                del self._isi[kunci]
+                entri = None
+            if entri is None:
+                self.miss += 1
+                return None
+            self._isi.move_to_end(kunci)
+            self.hit += 1
+            return entri[1]
+
+    def simpan(self, kunci, hasil):
+        if self.maks <= 0:
+            return
+        with self._kunci:
+            self._isi[kunci] = (time.monotonic(), hasil)
+            self._isi.move_to_end(kunci)
+            while len(self._isi) > self.maks:
+                self._isi.popitem(last=False)
+
+    def kosongkan(self):
+        with self._kunci:
+            self._isi.clear()
+
+    def __len__(self):
+        return len(self._isi)
+
+    def statistik(self):
+        return {"hit": self.hit, "miss": self.miss, "ukuran": len(self._isi)}
+
+# 2. Penggabungan Permintaan Identik (single-flight)
+class PenggabungPermintaan:
+    """Peta kunci -> Future yang sedang berjalan, beserta statistik penghematannya."""
+
+    def __init__(self):
+        self._berjalan = {}
+        self._kunci = threading.Lock()
+        self.komputasi = 0
+        self.digabung = 0
+        self.hemat_ms = 0.0
+        self.total_tunggu_ms = 0.0
+
+    def jalankan(self, kunci, eksekutor, fungsi):
+        """(Future, digabung): Future komputasi kunci yang masih berjalan, atau fungsi() yang baru dikirim."""
+        with self._kunci:
+            future = self._berjalan.get(kunci)
+            if future is not None:
+                self.digabung += 1
+                return future, True
+            future = eksekutor.submit(fungsi)
+            self._berjalan[kunci] = future
+            self.komputasi += 1
+        future.add_done_callback(partial(self._selesai, kunci))
+        return future, False
+
+    def _selesai(self, kunci, future):
+        with self._kunci:
+            if self._berjalan.get(kunci) is future:
+                del self._berjalan[kunci]
+
+    def catat(self, digabung, tunggu_ms, durasi_ms):
+        """Mencatat satu permintaan yang selesai; mengembalikan info untuk metadata responsnya."""
+        with self._kunci:
+            self.total_tunggu_ms += tunggu_ms
+            if digabung:
+                # Komputasi yang tidak perlu diulang untuk permintaan ini
+                self.hemat_ms += durasi_ms
+        return {"digabung": digabung, "tunggu_ms": round(tunggu_ms, 1), **self.statistik()}
+
+    def statistik(self):
+        return {"komputasi": self.komputasi, "permintaan_digabung": self.digabung,
+                "hemat_ms": round(self.hemat_ms, 1), "total_tunggu_ms": round(self.total_tunggu_ms, 1),
+                "berjalan": len(self._berjalan)}
+
+# 3. Sesi Penyempitan Preferensi
+class SesiPreferensi:
+    """
+    Penyimpan kandidat per token dengan batas memori. maks = jumlah sesi, maks_byte = total
+    byte array kandidat, ttl = umur sesi sejak terakhir dipakai (detik); default dari
+    FUZZY_SESI_MAKS / FUZZY_SESI_MAKS_MB / FUZZY_SESI_TTL_DETIK. Sesi yang paling lama tidak
+    dipakai dibuang lebih dulu; kandidat yang sendirian melebihi maks_byte tidak disimpan.
+    """
+
+    def __init__(self, maks=None, maks_byte=None, ttl=None):
+        self.maks = int(os.getenv("FUZZY_SESI_MAKS", "1024")) if maks is None else maks
+        if maks_byte is None:
+            maks_byte = int(float(os.getenv("FUZZY_SESI_MAKS_MB", "32")) * 1024 * 1024)
+        self.maks_byte = maks_byte
+        self.ttl = float(os.getenv("FUZZY_SESI_TTL_DETIK", "900")) if ttl is None else ttl
+        self._isi = OrderedDict()
+        self._kunci = threading.Lock()
+        self.nbytes = 0
+        self.dibuang = 0
+
+    def _buang(self, token):
+        self.nbytes -= self._isi.pop(token)["nbytes"]
+
+    def ambil(self, token):
+        """Sesi untuk token (dict filter, bobot, posisi, skor), atau None bila tidak ada/kedaluwarsa."""
+        with self._kunci:
+            sesi = self._isi.get(token)
+            if sesi is not None and self.ttl > 0 and time.monotonic() - sesi["waktu"] > self.ttl:
+                self._buang(token)
+                sesi = None
+            if sesi is None:
+                return None
+            sesi["waktu"] = time.monotonic()
+            self._isi.move_to_end(token)
+            return sesi
+
+    def simpan(self, token, filter_aktif, bobot, posisi, skor):
+        """Menyimpan kandidat ke token (token baru bila None); None bila kandidat tidak muat."""
+        ukuran = posisi.nbytes + skor.nbytes
+        with self._kunci:
+            if token in self._isi:
+                self._buang(token)
+            if self.maks <= 0 or ukuran > self.maks_byte:
+                return None
+            token = token or secrets.token_urlsafe(16)
+            self._isi[token] = {"waktu": time.monotonic(), "filter": filter_aktif, "bobot": bobot,
+                                "posisi": posisi, "skor": skor, "nbytes": ukuran}
+            self.nbytes += ukuran
+            while len(self._isi) > self.maks or self.nbytes > self.maks_byte:
+                self._buang(next(iter(self._isi)))
+                self.dibuang += 1
+            return token
+
+    def kosongkan(self):
+        with self._kunci:
+            self._isi.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._isi)
+
+    def statistik(self):
+        return {"sesi": len(self._isi), "byte": self.nbytes, "dibuang": self.dibuang}
@@ -3,15 +3,19 @@
 Fuzzy Engine Mountify - Google Colab Version
 
 - Standalone, tidak ada koneksi database (gunakan data mock/manual)
+- Membership function dan rules berasal dari fuzzy_engine_definisi.py (unggah ke Colab)
 - Mudah diubah untuk eksperimen membership function, rule, dan visualisasi
 - Cocok untuk analisis, tuning, dan edukasi
 """
 
+import copy
+
 import numpy as np
 import pandas as pd
-import skfuzzy as fuzz
 from skfuzzy import control as ctrl
 
+from fuzzy_engine_definisi import DEFINISI_FUZZY, bangun_control_system
+
 # 1. Contoh Data Dummy (bisa diganti manual di Colab)
 data = [
     # ketinggian, kesulitan, keamanan, fasilitas, kemah, pemandangan, waktu, lanskap, angin, air, komunikasi, insiden, variasi_jalur
@@ -28,41 +32,18 @@ kolom = [
 ]
 df = pd.DataFrame(data, columns=kolom)
 
-# 2. Definisi Universe
-ketinggian_univ = np.arange(0, 5501, 1)
-skala_univ = np.arange(0, 11, 1)
-waktu_univ = np.arange(0, 101, 1)
-skor_univ = np.arange(0, 101, 1)
+# 2-3. Universe, Antecedents & Consequent diambil dari definisi deklaratif fuzzy_engine.py
+definisi = copy.deepcopy(DEFINISI_FUZZY)
 
-# 3. Definisi Antecedents & Consequent
-antecedents = {
-    'ketinggian_puncak_mdpl': ctrl.Antecedent(ketinggian_univ, 'ketinggian_puncak_mdpl'),
-    'kesulitan_skala': ctrl.Antecedent(skala_univ, 'kesulitan_skala'),
-    'keamanan_skala': ctrl.Antecedent(skala_univ, 'keamanan_skala'),
-    'kualitas_fasilitas_skala': ctrl.Antecedent(skala_univ, 'kualitas_fasilitas_skala'),
-    'kualitas_kemah_skala': ctrl.Antecedent(skala_univ, 'kualitas_kemah_skala'),
-    'keindahan_pemandangan_skala': ctrl.Antecedent(skala_univ, 'keindahan_pemandangan_skala'),
-    'estimasi_waktu_jam': ctrl.Antecedent(waktu_univ, 'estimasi_waktu_jam'),
-    'variasi_lanskap_skala': ctrl.Antecedent(skala_univ, 'variasi_lanskap_skala'),
-    'perlindungan_angin_kemah_skala': ctrl.Antecedent(skala_univ, 'perlindungan_angin_kemah_skala'),
-    'ketersediaan_sumber_air_skala': ctrl.Antecedent(skala_univ, 'ketersediaan_sumber_air_skala'),
-    'jaringan_komunikasi_skala': ctrl.Antecedent(skala_univ, 'jaringan_komunikasi_skala'),
-    'tingkat_insiden_skala': ctrl.Antecedent(skala_univ, 'tingkat_insiden_skala'),
-    'variasi_jalur_skala': ctrl.Antecedent(skala_univ, 'variasi_jalur_skala')
-}
-skor_rekomendasi = ctrl.Consequent(skor_univ, 'skor_rekomendasi')
+# 4. Membership Function (bisa diubah di Colab), contoh:
+# definisi["antecedents"]["ketinggian_puncak_mdpl"]["terms"]["sedang"] = [1500, 2000, 3000, 3500]
 
-# 4. Membership Function (bisa diubah di Colab)
-antecedents['ketinggian_puncak_mdpl']['rendah'] = fuzz.trapmf(ketinggian_univ, [0, 0, 1000, 1500])
-antecedents['ketinggian_puncak_mdpl']['sedang'] = fuzz.trapmf(ketinggian_univ, [1500, 2000, 3000, 3500])
-antecedents['ketinggian_puncak_mdpl']['tinggi'] = fuzz.trapmf(ketinggian_univ, [3500, 4000, 5500, 5500])
-# ... (lanjutkan definisi membership function lain sesuai fuzzy_engine.py) ...
+# 5. Definisi Rules (bisa diubah di Colab), contoh:
+# definisi["rules"].append({"jika": ["and", ["keindahan_pemandangan_skala", "istimewa"],
+#                                    ["keamanan_skala", "aman"]],
+#                           "maka": "sangat_tinggi"})
 
-# 5. Definisi Rules (bisa diubah di Colab)
-rules = [
-    ctrl.Rule(antecedents['keindahan_pemandangan_skala']['tinggi'] & antecedents['keamanan_skala']['aman'], skor_rekomendasi['sangat_tinggi']),
-    # ... (tambahkan rules lain sesuai kebutuhan) ...
-]
+antecedents, skor_rekomendasi, rules = bangun_control_system(definisi)
 
 # 6. Sistem Kontrol & Simulasi
 sistem_kontrol = ctrl.ControlSystem(rules)
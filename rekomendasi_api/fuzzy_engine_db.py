@@ -0,0 +1,768 @@
+# -*- coding: utf-8 -*-
+"""
+Akses Database Fuzzy Engine
+
+Lapisan data untuk fuzzy_engine.py: pool koneksi PostgreSQL yang dipakai ulang
+antar pemanggilan (worker, simulasi, pytest), query jalur yang di-PREPARE sekali
+per koneksi, dan jalur ambil biner (COPY ... FORMAT binary) yang mengisi kolom
+NumPy langsung tanpa membangun tuple Python per baris.
+
+Konfigurasi lewat environment:
+- DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT  : parameter koneksi (sama dengan backend Node)
+- FUZZY_DB_POOL_MIN / FUZZY_DB_POOL_MAX            : ukuran pool (default 1 / 4)
+- FUZZY_DB_CEK_DETIK                               : koneksi yang menganggur lebih lama dari ini
+                                                     diperiksa dengan SELECT 1 sebelum dipakai (default 30)
+- FUZZY_DB_BINER                                   : "0" mematikan jalur ambil biner
+- FUZZY_SNAPSHOT                                   : "0" mematikan snapshot kolumnar katalog di disk
+- FUZZY_NOTIFY_KANAL                               : kanal LISTEN/NOTIFY perubahan katalog
+                                                     (default fuzzy_katalog, kosong = tidak mendengar)
+
+Riwayat pencarian (search_history) dibaca untuk menghangatkan cache hasil worker
+(lihat ambil_filter_populer).
+
+Filter preferensi numerik dapat didorong ke WHERE (lihat kompilasi_kondisi_sql); indeks
+ekspresi yang cocok dapat dilihat/dibuat dengan:
+    python fuzzy_engine_db.py --saran-indeks ['{"max_kesulitan_skala": 5, ...}']
+    python fuzzy_engine_db.py --buat-indeks ['{...}']
+
+Kesegaran snapshot katalog diperiksa dari penghitung versi yang dinaikkan trigger
+(tanpa memindai tabel); wajib dipasang sekali agar snapshot dan dataset bersama dipakai:
+    python fuzzy_engine_db.py --pasang-versi-katalog
+"""
+
+import io
+import os
+import re
+import json
+import shutil
+import select
+import sys
+import math
+import time
+import struct
+import hashlib
+import threading
+from decimal import Decimal
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import errors as pg_errors
+from psycopg2 import extensions as pg_ext
+from psycopg2 import pool as pg_pool
+
+# 1. Definisi Query Jalur
+# (alias, ekspresi SQL, numerik?) — satu sumber untuk query penuh maupun proyeksi biner
+KOLOM_JALUR = [
+    ("id_jalur", "j.id_jalur", True),
+    ("id_gunung", "j.id_gunung", True),
+    ("nama_jalur", "j.nama_jalur", False),
+    ("nama_gunung", "g.nama_gunung", False),
+    ("ketinggian_puncak_mdpl", "COALESCE(g.ketinggian_puncak_mdpl, 2000)", True),
+    ("variasi_jalur_skala", "COALESCE(g.variasi_jalur_skala, 5)", True),
+    ("kesulitan_skala", "COALESCE(j.kesulitan_skala, 5)", True),
+    ("keamanan_skala", "COALESCE(j.keamanan_skala, 5)", True),
+    ("kualitas_fasilitas_skala", "COALESCE(j.kualitas_fasilitas_skala, 5)", True),
+    ("kualitas_kemah_skala", "COALESCE(j.kualitas_kemah_skala, 5)", True),
+    ("keindahan_pemandangan_skala", "COALESCE(j.keindahan_pemandangan_skala, 5)", True),
+    ("estimasi_waktu_jam", "COALESCE(j.estimasi_waktu_jam, 24)", True),
+    ("variasi_lanskap_skala", "COALESCE(j.variasi_lanskap_skala, 5)", True),
+    ("perlindungan_angin_kemah_skala", "COALESCE(j.perlindungan_angin_kemah_skala, 5)", True),
+    ("ketersediaan_sumber_air_skala", "COALESCE(j.ketersediaan_sumber_air_skala, 5)", True),
+    ("jaringan_komunikasi_skala", "COALESCE(j.jaringan_komunikasi_skala, 5)", True),
+    ("tingkat_insiden_skala", "COALESCE(j.tingkat_insiden_skala, 5)", True),
+    ("status_jalur", "j.status_jalur", False),
+    ("deskripsi_jalur", "COALESCE(j.deskripsi_jalur, '')", False),
+    ("lokasi_pintu_masuk", "COALESCE(j.lokasi_pintu_masuk, '')", False),
+    ("lokasi_administratif", "COALESCE(g.lokasi_administratif, '')", False),
+    ("deskripsi_singkat", "COALESCE(g.deskripsi_singkat, '')", False),
+    ("url_thumbnail", "COALESCE(g.url_thumbnail, '')", False),
+]
+
+EKSPRESI_KOLOM = {alias: ekspresi for alias, ekspresi, _ in KOLOM_JALUR}
+URUTAN_KOLOM_JALUR = [alias for alias, _, _ in KOLOM_JALUR]
+
+# Kolom teks/media; pada pengambilan ringkas (media=False) diambil belakangan per id (ambil_media)
+KOLOM_MEDIA_JALUR = ["deskripsi_jalur", "lokasi_pintu_masuk"]
+KOLOM_MEDIA_GUNUNG = ["lokasi_administratif", "deskripsi_singkat", "url_thumbnail"]
+KOLOM_MEDIA = KOLOM_MEDIA_JALUR + KOLOM_MEDIA_GUNUNG
+
+# $1 = id_jalur[], $2 = id_gunung[] (NULL = seluruh katalog); filter tambahan memakai $3 dst.
+# Urutan id_jalur membuat query numerik dan teks pada jalur biner sejajar per posisi
+FROM_JALUR = """
+            FROM jalur_pendakian j
+            JOIN gunung g ON j.id_gunung = g.id_gunung
+            WHERE j.id_jalur IS NOT NULL
+              AND (($1::int[] IS NULL AND $2::int[] IS NULL)
+                   OR j.id_jalur = ANY($1::int[]) OR j.id_gunung = ANY($2::int[]))"""
+ORDER_JALUR = """
+            ORDER BY g.nama_gunung, j.nama_jalur, j.id_jalur"""
+
+
+def _select(kolom):
+    return "SELECT " + ",\n                ".join(f"{ekspresi} AS {alias}" for alias, ekspresi in kolom)
+
+
+def _kolom(numerik=None, media=True):
+    return [(alias, ekspresi) for alias, ekspresi, angka in KOLOM_JALUR
+            if (numerik is None or angka == numerik) and (media or alias not in KOLOM_MEDIA)]
+
+
+def _query_jalur(kolom, kondisi_sql=""):
+    return _select(kolom) + FROM_JALUR + kondisi_sql + ORDER_JALUR
+
+
+def _statement_jalur(nama_dasar, kondisi_sql="", media=True):
+    """
+    (nama, query) statement jalur. Proyeksi penuh / ringkas (tanpa media) dan setiap
+    kombinasi kondisi filter mendapat statement sendiri (nama + sidik kondisi).
+    """
+    if nama_dasar == "fuzzy_ambil_teks_jalur":
+        kolom = [("id_jalur", "j.id_jalur")] + _kolom(numerik=False, media=media)
+    else:
+        kolom = _kolom(media=media)
+    nama = nama_dasar if media else nama_dasar + "_ringkas"
+    if kondisi_sql:
+        nama += "_" + hashlib.sha1(kondisi_sql.encode()).hexdigest()[:10]
+    return nama, _query_jalur(kolom, kondisi_sql)
+
+
+# Query media berkunci id, hanya untuk baris yang dikirim ke klien
+STATEMENT_MEDIA = {
+    "fuzzy_media_jalur": _select([("id_jalur", "j.id_jalur")] + [(k, EKSPRESI_KOLOM[k]) for k in KOLOM_MEDIA_JALUR])
+                         + "\n            FROM jalur_pendakian j WHERE j.id_jalur = ANY($1::int[])",
+    "fuzzy_media_gunung": _select([("id_gunung", "g.id_gunung")] + [(k, EKSPRESI_KOLOM[k]) for k in KOLOM_MEDIA_GUNUNG])
+                          + "\n            FROM gunung g WHERE g.id_gunung = ANY($1::int[])",
+}
+
+# OID tipe integer PostgreSQL (int2, int4, int8); tipe numerik lain dibaca sebagai float8
+OID_INTEGER = {20, 21, 23}
+SIGNATURE_COPY = b"PGCOPY\n\xff\r\n\x00"
+
+
+def _nilai_angka(nilai):
+    return (isinstance(nilai, (int, float, np.integer, np.floating))
+            and not isinstance(nilai, (bool, np.bool_)) and math.isfinite(nilai))
+
+
+def kompilasi_kondisi_sql(kondisi, tipe):
+    """
+    Filter (kolom, op, nilai) -> (potongan WHERE, parameter) dengan placeholder $3 dst.
+
+    Kondisi memakai ekspresi COALESCE yang sama dengan SELECT, jadi nilai default
+    berlaku persis seperti filter di memori. Hanya nilai angka berhingga yang didorong;
+    nilai lain tetap ditangani (dan dilaporkan) oleh mask_filter. Kolom integer memakai
+    batas floor/ceil (setara dan tetap bisa memakai indeks); kolom pecahan dilonggarkan
+    satu ULP ke luar sehingga hasil SQL selalu superset dari filter di memori, yang
+    tetap dijalankan sesudahnya.
+    """
+    bagian, parameter = [], []
+    for kolom, op, nilai in kondisi:
+        if kolom not in tipe or op not in ("<=", ">=") or not _nilai_angka(nilai):
+            continue
+        nilai = float(nilai)
+        if tipe[kolom] == ">i8":
+            batas = math.floor(nilai) if op == "<=" else math.ceil(nilai)
+            batas, cast = max(-2**63, min(2**63 - 1, batas)), "int8"
+        else:
+            batas = Decimal(float(np.nextafter(nilai, np.inf if op == "<=" else -np.inf)))
+            cast = "numeric"
+        parameter.append(batas)
+        bagian.append(f"{EKSPRESI_KOLOM[kolom]} {op} ${len(parameter) + 2}::{cast}")
+    kondisi_sql = "".join(f"\n              AND {b}" for b in bagian)
+    return kondisi_sql, parameter
+
+
+def _isi_parameter(cur, sql, parameter):
+    """Ganti $n dengan literal ter-escape (COPY tidak menerima parameter bind)."""
+    return re.sub(r"\$(\d+)", lambda m: cur.mogrify("%s", (parameter[int(m.group(1)) - 1],)).decode(), sql)
+
+
+def saran_indeks(kolom_filter=None):
+    """
+    Perintah CREATE INDEX untuk ekspresi COALESCE kolom filter, satu indeks komposit per tabel.
+
+    Tanpa argumen memakai filter yang paling sering dikirim form/chatbot. Indeks ekspresi
+    wajib memakai ekspresi yang sama persis dengan WHERE agar dipakai planner.
+    """
+    if kolom_filter is None:
+        kolom_filter = ["kesulitan_skala", "keamanan_skala", "estimasi_waktu_jam",
+                        "ketersediaan_sumber_air_skala", "ketinggian_puncak_mdpl"]
+    per_tabel = {}
+    for kolom in kolom_filter:
+        cocok = re.search(r"\b([jg])\.(\w+)", EKSPRESI_KOLOM.get(kolom, ""))
+        if cocok:
+            ekspresi = EKSPRESI_KOLOM[kolom].replace(f"{cocok.group(1)}.", "")
+            daftar = per_tabel.setdefault(cocok.group(1), [])
+            if ekspresi not in daftar:
+                daftar.append(ekspresi)
+    perintah = ["CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fuzzy_jalur_id_gunung ON jalur_pendakian (id_gunung)"]
+    for alias_tabel, ekspresi in per_tabel.items():
+        tabel = "jalur_pendakian" if alias_tabel == "j" else "gunung"
+        sidik = hashlib.sha1("|".join(ekspresi).encode()).hexdigest()[:8]
+        daftar = ", ".join(f"({e})" for e in ekspresi)
+        perintah.append(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fuzzy_{tabel}_{sidik} ON {tabel} ({daftar})")
+    return perintah
+
+
+def buat_indeks(perintah, conn_params=None):
+    """
+    Menjalankan perintah saran_indeks() (atau DDL lain seperti PERINTAH_VERSI_KATALOG) lewat
+    koneksi autocommit tersendiri (pool bersifat read-only).
+    """
+    conn = psycopg2.connect(**(conn_params or parameter_koneksi()))
+    try:
+        conn.autocommit = True  # CREATE INDEX CONCURRENTLY tidak boleh di dalam transaksi
+        with conn.cursor() as cur:
+            for sql in perintah:
+                cur.execute(sql)
+                print(f"✅ {sql}", file=sys.stderr)
+    finally:
+        conn.close()
+
+
+def parameter_koneksi():
+    """Konfigurasi koneksi database dari environment (default sama dengan versi sebelumnya)."""
+    return {
+        "dbname": os.getenv("DB_NAME", "db_gunung2"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432")
+    }
+
+
+# 2. Pool Koneksi
+class _KoneksiPool(pg_ext.connection):
+    """Koneksi yang mengingat statement yang sudah di-PREPARE dan kapan terakhir dipakai."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Engine hanya membaca; REPEATABLE READ membuat beberapa query dalam satu
+        # transaksi melihat snapshot yang sama (dipakai jalur ambil biner)
+        self.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        self.disiapkan = set()
+        self.terakhir_dipakai = time.monotonic()
+
+
+class PoolDatabase:
+    """
+    Pool koneksi read-only (REPEATABLE READ) dengan pemeriksaan kesehatan.
+
+    Koneksi yang tertutup atau gagal SELECT 1 dibuang dan diganti koneksi baru;
+    operasi yang gagal karena koneksi putus diulang sekali (lihat jalankan()).
+    """
+
+    def __init__(self, minconn=None, maxconn=None, cek_setelah_detik=None, **conn_params):
+        self.minconn = int(minconn if minconn is not None else os.getenv("FUZZY_DB_POOL_MIN", "1"))
+        self.maxconn = max(self.minconn, int(maxconn if maxconn is not None else os.getenv("FUZZY_DB_POOL_MAX", "4")))
+        self.cek_setelah_detik = float(cek_setelah_detik if cek_setelah_detik is not None
+                                       else os.getenv("FUZZY_DB_CEK_DETIK", "30"))
+        self.conn_params = conn_params or parameter_koneksi()
+        self._pool = None
+        self._kunci = threading.Lock()
+
+    def _dapatkan_pool(self):
+        with self._kunci:
+            if self._pool is None:
+                self._pool = pg_pool.ThreadedConnectionPool(
+                    self.minconn, self.maxconn, connection_factory=_KoneksiPool, **self.conn_params
+                )
+                print(f"🔌 Pool database dibuat (min {self.minconn}, max {self.maxconn})", file=sys.stderr)
+            return self._pool
+
+    def _sehat(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.terakhir_dipakai < self.cek_setelah_detik:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    @contextmanager
+    def koneksi(self):
+        """Pinjam koneksi sehat dari pool; transaksi selalu diakhiri sebelum dikembalikan."""
+        pool = self._dapatkan_pool()
+        conn = pool.getconn()
+        # Maksimal satu kali tiap koneksi di pool + satu koneksi baru
+        for _ in range(self.maxconn + 1):
+            if self._sehat(conn):
+                break
+            print("⚠️ Koneksi database tidak sehat, membuat koneksi baru", file=sys.stderr)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        rusak = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            rusak = True
+            raise
+        finally:
+            if not rusak and not conn.closed:
+                try:
+                    conn.rollback()
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    rusak = True
+            conn.terakhir_dipakai = time.monotonic()
+            pool.putconn(conn, close=rusak or bool(conn.closed))
+
+    def jalankan(self, fungsi):
+        """Panggil fungsi(conn); diulang sekali dengan koneksi baru jika koneksi putus di tengah jalan."""
+        try:
+            with self.koneksi() as conn:
+                return fungsi(conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as error:
+            print(f"⚠️ Koneksi database terputus ({error}), mencoba ulang sekali", file=sys.stderr)
+            with self.koneksi() as conn:
+                return fungsi(conn)
+
+    def tutup(self):
+        with self._kunci:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+
+_POOL = None
+_KUNCI_POOL = threading.Lock()
+
+
+def dapatkan_pool():
+    """Pool bersama per proses, dibuat saat pertama kali dibutuhkan."""
+    global _POOL
+    with _KUNCI_POOL:
+        if _POOL is None:
+            _POOL = PoolDatabase()
+        return _POOL
+
+
+def tutup_pool():
+    global _POOL
+    with _KUNCI_POOL:
+        if _POOL is not None:
+            _POOL.tutup()
+            _POOL = None
+
+
+# 3. Statement Siap Pakai
+def eksekusi_siap(cur, nama, query, parameter, tipe_parameter="int[], int[]"):
+    """EXECUTE statement bernama; PREPARE dulu jika belum ada di sesi koneksi ini."""
+    conn = cur.connection
+    if nama not in conn.disiapkan:
+        cur.execute(f"PREPARE {nama} ({tipe_parameter}) AS {query}")
+        conn.disiapkan.add(nama)
+    try:
+        cur.execute(f"EXECUTE {nama} ({', '.join(['%s'] * len(parameter))})", parameter)
+    except pg_errors.InvalidSqlStatementName:
+        # Sesi di-reset dari luar (mis. DISCARD ALL oleh pooler); siapkan ulang
+        conn.rollback()
+        conn.disiapkan.discard(nama)
+        eksekusi_siap(cur, nama, query, parameter, tipe_parameter)
+
+
+def _parameter_filter(id_jalur, id_gunung):
+    if id_jalur is None and id_gunung is None:
+        return (None, None)
+    return ([int(i) for i in (id_jalur or [])], [int(i) for i in (id_gunung or [])])
+
+
+# 4. Jalur Ambil Biner
+def baca_copy_biner(data, kolom):
+    """
+    Urai keluaran COPY ... (FORMAT binary) yang seluruh field-nya lebar tetap 8 byte.
+
+    kolom: list (nama, dtype big-endian '>i8' / '>f8'). Setiap tuple di-overlay dengan
+    dtype terstruktur dan dibaca lewat np.frombuffer, jadi tidak ada loop per baris.
+    Menolak data dengan NULL atau lebar field lain (ValueError).
+    """
+    data = memoryview(data)
+    if bytes(data[:len(SIGNATURE_COPY)]) != SIGNATURE_COPY:
+        raise ValueError("Bukan keluaran COPY biner PostgreSQL")
+    panjang_ext = struct.unpack_from(">i", data, len(SIGNATURE_COPY) + 4)[0]
+    awal = len(SIGNATURE_COPY) + 8 + panjang_ext
+
+    field = [("jumlah_field", ">i2")]
+    for i, (nama, tipe) in enumerate(kolom):
+        field += [(f"_panjang_{i}", ">i4"), (nama, tipe)]
+    dtype = np.dtype(field)
+    n = (len(data) - awal - 2) // dtype.itemsize
+    if awal + n * dtype.itemsize + 2 != len(data) or struct.unpack_from(">h", data, len(data) - 2)[0] != -1:
+        raise ValueError("Ukuran data COPY biner tidak sesuai (ada NULL atau field lebar tidak tetap)")
+
+    baris = np.frombuffer(data, dtype=dtype, count=n, offset=awal)
+    if n and ((baris["jumlah_field"] != len(kolom)).any()
+              or any((baris[f"_panjang_{i}"] != 8).any() for i in range(len(kolom)))):
+        raise ValueError("Field COPY biner tidak lebar tetap 8 byte")
+    return {nama: baris[nama].astype(np.dtype(tipe).newbyteorder("=")) for nama, tipe in kolom}
+
+
+_TIPE_NUMERIK = {}
+
+
+def _tipe_kolom_numerik(cur):
+    """Tipe keluaran kolom numerik ('>i8' untuk integer, '>f8' selainnya); dibaca sekali per proses."""
+    if not _TIPE_NUMERIK:
+        kolom = _kolom(numerik=True)
+        cur.execute(_isi_parameter(cur, _query_jalur(kolom), (None, None)) + " LIMIT 0")
+        for (alias, _), deskripsi in zip(kolom, cur.description):
+            _TIPE_NUMERIK[alias] = ">i8" if deskripsi.type_code in OID_INTEGER else ">f8"
+    return _TIPE_NUMERIK
+
+
+def ambil_kolom_numerik(cur, parameter, kondisi_sql=""):
+    """Kolom numerik jalur sebagai dict array NumPy via COPY biner."""
+    tipe = _tipe_kolom_numerik(cur)
+    kolom = _kolom(numerik=True)
+    cast = [(alias, f"({ekspresi})::{'int8' if tipe[alias] == '>i8' else 'float8'}") for alias, ekspresi in kolom]
+    query = _isi_parameter(cur, _query_jalur(cast, kondisi_sql), parameter)
+    buffer = io.BytesIO()
+    cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT binary)", buffer)
+    return baca_copy_biner(buffer.getbuffer(), [(alias, tipe[alias]) for alias, _ in kolom])
+
+
+# 5. Ambil Data Jalur
+def ambil_data_jalur(id_jalur=None, id_gunung=None, kondisi=None, biner=None, pool=None, media=True):
+    """
+    DataFrame jalur + info gunung (kolom dan nilai sama dengan query lama).
+
+    media=False: proyeksi ringkas tanpa KOLOM_MEDIA (id, nama, status dan 13 input);
+    kolom media diambil kemudian dengan ambil_media() untuk baris yang dikirim saja.
+
+    kondisi: daftar (kolom, op, nilai) filter preferensi yang didorong ke WHERE sehingga
+    hanya kandidat yang dikirim database (hasilnya superset; filter di memori tetap final).
+    biner=True: kolom numerik lewat COPY biner dan kolom teks lewat statement terpisah
+    dalam satu snapshot REPEATABLE READ, lalu digabung per kolom. Jika COPY biner
+    tidak bisa dipakai (mis. NULL tak terduga) otomatis kembali ke query biasa.
+    """
+    return (pool or dapatkan_pool()).jalankan(
+        lambda conn: _ambil_data_jalur(conn, id_jalur, id_gunung, kondisi, biner, media)
+    )
+
+
+def _ambil_data_jalur(conn, id_jalur=None, id_gunung=None, kondisi=None, biner=None, media=True):
+    if biner is None:
+        biner = os.getenv("FUZZY_DB_BINER", "1") != "0"
+    with conn.cursor() as cur:
+        kondisi_sql, nilai_kondisi = kompilasi_kondisi_sql(kondisi or [], _tipe_kolom_numerik(cur))
+        parameter = (*_parameter_filter(id_jalur, id_gunung), *nilai_kondisi)
+        if biner:
+            try:
+                return _ambil_biner(cur, parameter, kondisi_sql, media)
+            except ValueError as error:
+                conn.rollback()
+                print(f"⚠️ Jalur ambil biner tidak dapat dipakai ({error}), memakai query biasa", file=sys.stderr)
+        eksekusi_siap(cur, *_statement_jalur("fuzzy_ambil_jalur", kondisi_sql, media), parameter)
+        kolom = [d.name for d in cur.description]
+        return pd.DataFrame.from_records(cur.fetchall(), columns=kolom, coerce_float=True)
+
+
+def _ambil_biner(cur, parameter, kondisi_sql, media=True):
+    numerik = ambil_kolom_numerik(cur, parameter, kondisi_sql)
+    eksekusi_siap(cur, *_statement_jalur("fuzzy_ambil_teks_jalur", kondisi_sql, media), parameter)
+    nama_teks = [d.name for d in cur.description]
+    baris_teks = cur.fetchall()
+    teks = dict(zip(nama_teks, (list(k) for k in zip(*baris_teks)))) if baris_teks else {n: [] for n in nama_teks}
+    if not np.array_equal(np.asarray(teks.pop("id_jalur"), dtype=np.int64), numerik["id_jalur"]):
+        raise ValueError("Urutan kolom numerik dan teks tidak sejajar")
+    return pd.DataFrame({alias: numerik[alias] if angka else teks[alias] for alias, _, angka in KOLOM_JALUR
+                         if media or alias not in KOLOM_MEDIA})
+
+
+def ambil_media(id_jalur, id_gunung, pool=None):
+    """
+    Kolom media untuk jalur dan gunung tertentu saja (tahap kedua pengambilan ringkas).
+    Mengembalikan (df_media_jalur berindeks id_jalur, df_media_gunung berindeks id_gunung).
+    """
+    def ambil(conn):
+        hasil = []
+        with conn.cursor() as cur:
+            for nama, kunci in (("fuzzy_media_jalur", id_jalur), ("fuzzy_media_gunung", id_gunung)):
+                eksekusi_siap(cur, nama, STATEMENT_MEDIA[nama], ([int(i) for i in kunci],), "int[]")
+                kolom = [d.name for d in cur.description]
+                df = pd.DataFrame.from_records(cur.fetchall(), columns=kolom)
+                hasil.append(df.set_index(kolom[0]))
+        return tuple(hasil)
+
+    return (pool or dapatkan_pool()).jalankan(ambil)
+
+
+# 6. Snapshot Kolumnar Katalog
+# Satu file .npy per kolom (dibuka dengan mmap); teks di-intern seperti KolomTeks
+FORMAT_SNAPSHOT = 2
+
+# Penghitung versi katalog yang dinaikkan trigger per statement (lihat sidik_katalog)
+PERINTAH_VERSI_KATALOG = [
+    "CREATE TABLE IF NOT EXISTS fuzzy_versi_katalog"
+    " (id boolean PRIMARY KEY DEFAULT true CHECK (id), versi bigint NOT NULL)",
+    "INSERT INTO fuzzy_versi_katalog (versi) VALUES (0) ON CONFLICT (id) DO NOTHING",
+    "CREATE OR REPLACE FUNCTION fuzzy_naikkan_versi_katalog() RETURNS trigger LANGUAGE plpgsql AS $$"
+    " BEGIN UPDATE fuzzy_versi_katalog SET versi = versi + 1; RETURN NULL; END $$",
+] + [perintah for tabel in ("jalur_pendakian", "gunung") for perintah in (
+    f"DROP TRIGGER IF EXISTS trg_fuzzy_versi_katalog ON {tabel}",
+    f"CREATE TRIGGER trg_fuzzy_versi_katalog AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabel}"
+    " FOR EACH STATEMENT EXECUTE FUNCTION fuzzy_naikkan_versi_katalog()",
+)]
+QUERY_VERSI_KATALOG = "SELECT versi FROM fuzzy_versi_katalog"
+
+
+class VersiKatalogBelumDipasang(RuntimeError):
+    """Penghitung versi katalog tidak ada, sehingga kesegaran snapshot tidak bisa dibuktikan."""
+
+
+def sidik_katalog(conn):
+    """Sidik kesegaran katalog ('versi-<n>'); VersiKatalogBelumDipasang bila penghitung belum dipasang."""
+    with conn.cursor() as cur:
+        # Dicek dulu agar tabel yang belum ada tidak menggagalkan transaksi
+        cur.execute("SELECT to_regclass('fuzzy_versi_katalog') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute(QUERY_VERSI_KATALOG)
+            baris = cur.fetchone()
+            if baris is not None:
+                return f"versi-{baris[0]}"
+    raise VersiKatalogBelumDipasang(
+        "Penghitung versi katalog belum dipasang; jalankan: python fuzzy_engine_db.py --pasang-versi-katalog")
+
+
+class SnapshotKatalog:
+    """Snapshot katalog jalur di disk: simpan(df, sidik) dan muat(sidik) -> DataFrame atau None."""
+
+    def __init__(self, direktori):
+        self.direktori = direktori
+        self.path_manifest = os.path.join(direktori, "manifest.json")
+
+    def manifest(self):
+        try:
+            with open(self.path_manifest, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get("format") == FORMAT_SNAPSHOT else None
+
+    def muat(self, sidik=None, kondisi=None):
+        """
+        DataFrame dari snapshot bila sidiknya cocok (None = sidik apa pun). kondisi (kolom,
+        op, nilai) seperti pada ambil_data_jalur dievaluasi atas kolom mmap lebih dulu,
+        sehingga hanya baris yang lolos yang disalin dan teksnya didekode.
+        """
+        manifest = self.manifest()
+        if manifest is None or (sidik is not None and manifest["sidik"] != sidik):
+            return None
+        folder = os.path.join(self.direktori, manifest["versi"])
+        try:
+            # view ndarray biasa di atas mmap (tanpa salinan, bukan subclass np.memmap)
+            angka = {nama: np.load(os.path.join(folder, f"{nama}.npy"), mmap_mode="r").view(np.ndarray)
+                     for nama, info in manifest["kolom"].items() if info["jenis"] == "angka"}
+            posisi = None
+            if kondisi:
+                mask = _mask_kondisi(angka, kondisi, manifest["jumlah_baris"])
+                if not mask.all():
+                    posisi = np.flatnonzero(mask)
+            kolom = {}
+            for nama, info in manifest["kolom"].items():
+                if info["jenis"] == "angka":
+                    kolom[nama] = angka[nama] if posisi is None else angka[nama][posisi]
+                else:
+                    kolom[nama] = self._muat_teks(folder, nama, posisi)
+        except (OSError, ValueError) as e:
+            # Versi lama sudah dibersihkan proses lain / file rusak: anggap tidak ada snapshot
+            print(f"⚠️ Snapshot katalog tidak dapat dibaca: {e}", file=sys.stderr)
+            return None
+        return pd.DataFrame(kolom, copy=False)
+
+    @staticmethod
+    def _muat_teks(folder, nama, posisi=None):
+        kode = np.load(os.path.join(folder, f"{nama}.kode.npy"), mmap_mode="r")
+        offset = np.load(os.path.join(folder, f"{nama}.offset.npy")).tolist()
+        blob = np.load(os.path.join(folder, f"{nama}.blob.npy"), mmap_mode="r").tobytes()
+        # Elemen terakhir None: kode -1 (kosong) menunjuk ke sana
+        kamus = np.array([blob[offset[i]:offset[i + 1]].decode("utf-8") for i in range(len(offset) - 1)] + [None],
+                         dtype=object)
+        return kamus[kode if posisi is None else kode[posisi]]
+
+    def simpan(self, df, sidik):
+        versi = hashlib.sha1(f"{sidik}|{time.time()}|{os.getpid()}".encode()).hexdigest()[:12]
+        folder = os.path.join(self.direktori, versi)
+        try:
+            os.makedirs(folder)
+            info_kolom = {}
+            for nama in df.columns:
+                nilai = df[nama]
+                if nilai.dtype.kind in "iufb":
+                    np.save(os.path.join(folder, f"{nama}.npy"), nilai.to_numpy())
+                    info_kolom[nama] = {"jenis": "angka", "dtype": nilai.dtype.str}
+                else:
+                    self._simpan_teks(folder, nama, nilai.tolist())
+                    info_kolom[nama] = {"jenis": "teks"}
+            manifest = {"format": FORMAT_SNAPSHOT, "sidik": sidik, "versi": versi,
+                        "jumlah_baris": len(df), "kolom": info_kolom}
+            sementara = f"{self.path_manifest}.{os.getpid()}.tmp"
+            with open(sementara, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(sementara, self.path_manifest)
+        except OSError as e:
+            print(f"⚠️ Snapshot katalog tidak bisa disimpan ke {folder}: {e}", file=sys.stderr)
+            shutil.rmtree(folder, ignore_errors=True)
+            return
+        # Versi lama tidak lagi ditunjuk manifest; pembaca yang sudah membuka mmap tetap aman
+        for lama in os.listdir(self.direktori):
+            if lama != versi and os.path.isdir(os.path.join(self.direktori, lama)):
+                shutil.rmtree(os.path.join(self.direktori, lama), ignore_errors=True)
+
+    @staticmethod
+    def _simpan_teks(folder, nama, nilai):
+        kode, kamus = pd.factorize(np.asarray(nilai, dtype=object), use_na_sentinel=True)
+        bagian = [str(k).encode("utf-8") for k in kamus]
+        offset = np.zeros(len(bagian) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in bagian], out=offset[1:])
+        np.save(os.path.join(folder, f"{nama}.kode.npy"), kode.astype(np.int32))
+        np.save(os.path.join(folder, f"{nama}.offset.npy"), offset)
+        np.save(os.path.join(folder, f"{nama}.blob.npy"), np.frombuffer(b"".join(bagian), dtype=np.uint8))
+
+
+def _mask_kondisi(kolom, kondisi, n):
+    """Mask baris untuk kondisi (kolom, op, nilai) atas array kolom; aturan sama dengan kompilasi_kondisi_sql."""
+    mask = np.ones(n, dtype=bool)
+    for nama, op, nilai in kondisi:
+        if nama in kolom and op in ("<=", ">=") and _nilai_angka(nilai):
+            mask &= (np.less_equal if op == "<=" else np.greater_equal)(kolom[nama], nilai)
+    return mask
+
+
+def ambil_katalog_ringkas(direktori, kondisi=None, pool=None):
+    """
+    Katalog ringkas dari snapshot jika sidik database masih sama; selain itu diambil
+    ulang (sidik dan data dalam satu transaksi REPEATABLE READ) lalu snapshot ditulis ulang.
+
+    kondisi (lihat ambil_data_jalur) membatasi baris: snapshot difilter sebelum
+    dimaterialisasi, dan tanpa snapshot (FUZZY_SNAPSHOT=0 atau sidik berubah) kondisi
+    didorong ke WHERE. Hasil terfilter tidak disimpan sebagai snapshot; snapshot hanya
+    ditulis ulang oleh pengambilan katalog penuh (mis. worker saat start). Tanpa penghitung
+    versi snapshot tidak dipakai sama sekali (error dicetak setiap pemanggilan).
+    """
+    pool = pool or dapatkan_pool()
+    snapshot = SnapshotKatalog(direktori)
+    if os.getenv("FUZZY_SNAPSHOT", "1") == "0":
+        return ambil_data_jalur(kondisi=kondisi, media=False, pool=pool)
+    try:
+        sidik = pool.jalankan(sidik_katalog)
+    except VersiKatalogBelumDipasang as e:
+        print(f"❌ Snapshot katalog tidak dipakai: {e}", file=sys.stderr)
+        return ambil_data_jalur(kondisi=kondisi, media=False, pool=pool)
+    df = snapshot.muat(sidik, kondisi)
+    if df is not None:
+        print(f"⚡ Katalog dibuka dari snapshot ({len(df)} jalur)", file=sys.stderr)
+        return df
+    if kondisi:
+        return ambil_data_jalur(kondisi=kondisi, media=False, pool=pool)
+    sidik, df = pool.jalankan(lambda conn: (sidik_katalog(conn), _ambil_data_jalur(conn, media=False)))
+    snapshot.simpan(df, sidik)
+    return df
+
+
+# 7. LISTEN/NOTIFY Perubahan Katalog
+# Payload dari route admin Node.js: {"id_jalur": [...], "id_gunung": [...]}
+KANAL_NOTIFY = os.getenv("FUZZY_NOTIFY_KANAL", "fuzzy_katalog")
+
+
+class PendengarKatalog(threading.Thread):
+    """
+    Thread yang LISTEN pada kanal perubahan katalog dan memanggil callback(id_jalur, id_gunung).
+    Memakai koneksi autocommit tersendiri (bukan dari pool) dan menyambung ulang bila putus.
+    """
+
+    def __init__(self, callback, kanal=None, conn_params=None, jeda_sambung_ulang=5.0):
+        super().__init__(name="pendengar-katalog", daemon=True)
+        self.callback = callback
+        self.kanal = kanal or KANAL_NOTIFY
+        self.conn_params = conn_params or parameter_koneksi()
+        self.jeda_sambung_ulang = jeda_sambung_ulang
+        self._berhenti = threading.Event()
+
+    def hentikan(self):
+        self._berhenti.set()
+
+    def run(self):
+        while not self._berhenti.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.conn_params)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.kanal}")
+                print(f"👂 Mendengarkan perubahan katalog pada kanal '{self.kanal}'", file=sys.stderr)
+                while not self._berhenti.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._teruskan(conn.notifies.pop(0).payload)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                print(f"⚠️ Pendengar katalog terputus ({e}), menyambung ulang", file=sys.stderr)
+                self._berhenti.wait(self.jeda_sambung_ulang)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _teruskan(self, payload):
+        try:
+            data = json.loads(payload or "{}")
+            self.callback(data.get("id_jalur") or [], data.get("id_gunung") or [])
+        except Exception as e:
+            print(f"⚠️ Notifikasi katalog diabaikan ({payload!r}): {e}", file=sys.stderr)
+
+
+# 8. Riwayat Pencarian
+# Dikelompokkan per teks JSON apa adanya; penyamaan bentuk dilakukan pemanggil (kunci_preferensi)
+QUERY_FILTER_POPULER = """
+    SELECT filters::text, count(*) FROM search_history
+    WHERE created_at >= now() - %s * interval '1 day' AND filters IS NOT NULL
+    GROUP BY filters::text ORDER BY count(*) DESC LIMIT %s"""
+QUERY_TOTAL_PENCARIAN = "SELECT count(*) FROM search_history WHERE created_at >= now() - %s * interval '1 day'"
+
+
+def ambil_filter_populer(hari, maks_grup=1000, pool=None):
+    """
+    Kelompok filter pencarian terbanyak dalam `hari` terakhir.
+    Mengembalikan ([(filter_dict, jumlah)], total_pencarian); filter yang bukan objek dilewati.
+    """
+    def ambil(conn):
+        with conn.cursor() as cur:
+            cur.execute(QUERY_FILTER_POPULER, (float(hari), int(maks_grup)))
+            baris = cur.fetchall()
+            cur.execute(QUERY_TOTAL_PENCARIAN, (float(hari),))
+            total = cur.fetchone()[0]
+        return baris, total
+
+    baris, total = (pool or dapatkan_pool()).jalankan(ambil)
+    grup = []
+    for teks, jumlah in baris:
+        try:
+            filters = json.loads(teks)
+        except ValueError:
+            continue
+        if isinstance(filters, dict):
+            grup.append((filters, int(jumlah)))
+    return grup, int(total)
+
+
+if __name__ == "__main__":
+    # --saran-indeks / --buat-indeks [preferensi JSON], --pasang-versi-katalog
+    if "--pasang-versi-katalog" in sys.argv:
+        buat_indeks(PERINTAH_VERSI_KATALOG)
+        sys.exit(0)
+    argumen = [a for a in sys.argv[1:] if not a.startswith("--")]
+    kolom_filter = None
+    if argumen:
+        from fuzzy_engine import kompilasi_filter
+        kolom_filter = [kolom for _, kolom, _, _, _ in kompilasi_filter(json.loads(argumen[0]))]
+    perintah = saran_indeks(kolom_filter)
+    if "--buat-indeks" in sys.argv:
+        buat_indeks(perintah)
+    else:
+        print(";\n".join(perintah) + ";")
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Definisi Deklaratif Fuzzy Engine Mountify
+
+Satu-satunya sumber universe, membership function, dan rules fuzzy engine.
+Dipakai oleh fuzzy_engine.py (kernel batch + cache kompilasi) dan oleh versi
+Colab (fuzzy_engine_colab*.py) sehingga definisinya tidak lagi diduplikasi.
+
+Format:
+- universe: [awal, akhir, langkah] seperti np.arange
+- terms antecedent: trapmf [awal_kiri, puncak_kiri, puncak_kanan, akhir_kanan]
+- rules: kondisi berupa ["variabel", "term"] atau ["and"|"or", kondisi, kondisi, ...]
+"""
+
+import hashlib
+import json
+from functools import reduce
+
+import numpy as np
+import skfuzzy as fuzz
+from skfuzzy import control as ctrl
+
+DEFINISI_FUZZY = {
+    "universe": {
+        "ketinggian": [0, 5501, 1],
+        "skala": [0, 11, 1],
+        "waktu": [0, 101, 1],
+        "skor": [0, 101, 1],
+    },
+    # Urutan antecedent = urutan kolom input kernel batch
+    "antecedents": {
+        "ketinggian_puncak_mdpl": {"universe": "ketinggian", "terms": {
+            "rendah": [0, 0, 1000, 1500],
+            "sedang": [1500, 2000, 3000, 3500],
+            "tinggi": [3500, 4000, 5500, 5500],
+        }},
+        "kesulitan_skala": {"universe": "skala", "terms": {
+            "mudah": [0, 0, 2, 4],
+            "sedang": [3, 4, 5, 7],
+            "sulit": [6, 8, 10, 10],
+        }},
+        "keamanan_skala": {"universe": "skala", "terms": {
+            "berbahaya": [0, 0, 2, 4],
+            "cukup_aman": [3, 4, 5, 7],
+            "aman": [6, 8, 10, 10],
+        }},
+        "kualitas_fasilitas_skala": {"universe": "skala", "terms": {
+            "minim": [0, 0, 2, 4],
+            "cukup": [3, 4, 5, 7],
+            "lengkap": [6, 8, 10, 10],
+        }},
+        "kualitas_kemah_skala": {"universe": "skala", "terms": {
+            "buruk": [0, 0, 2, 4],
+            "cukup": [3, 4, 5, 7],
+            "baik": [6, 8, 10, 10],
+        }},
+        "keindahan_pemandangan_skala": {"universe": "skala", "terms": {
+            "biasa": [0, 0, 2, 4],
+            "indah": [3, 5, 6, 7],
+            "istimewa": [6, 8, 10, 10],
+        }},
+        # Estimasi Waktu, ditambahkan 'ekspedisi'
+        "estimasi_waktu_jam": {"universe": "waktu", "terms": {
+            "pendek": [0, 0, 10, 14],
+            "sedang": [12, 18, 30, 36],
+            "panjang": [34, 40, 80, 100],
+            "ekspedisi": [90, 100, 101, 101],
+        }},
+        "variasi_lanskap_skala": {"universe": "skala", "terms": {
+            "monoton": [0, 0, 2, 4],
+            "cukup_bervariasi": [3, 4, 5, 7],
+            "sangat_bervariasi": [6, 8, 10, 10],
+        }},
+        "perlindungan_angin_kemah_skala": {"universe": "skala", "terms": {
+            "sangat_terekspos": [0, 0, 2, 4],
+            "cukup_terlindungi": [3, 4, 5, 7],
+            "terlindungi": [6, 8, 10, 10],
+        }},
+        "ketersediaan_sumber_air_skala": {"universe": "skala", "terms": {
+            "langka": [0, 0, 1, 3],
+            "terbatas": [2, 4, 5, 7],
+            "melimpah": [6, 8, 10, 10],
+        }},
+        "jaringan_komunikasi_skala": {"universe": "skala", "terms": {
+            "tidak_ada": [0, 0, 1, 2],
+            "terbatas": [2, 4, 5, 7],
+            "baik": [6, 8, 10, 10],
+        }},
+        # Skor tinggi berarti lebih aman/jarang insiden
+        "tingkat_insiden_skala": {"universe": "skala", "terms": {
+            "tinggi": [0, 0, 2, 4],  # Artinya insiden sering terjadi (berisiko)
+            "sedang": [3, 5, 6, 8],
+            "rendah": [8, 9, 10, 10],  # Artinya insiden jarang terjadi (aman)
+        }},
+        "variasi_jalur_skala": {"universe": "skala", "terms": {
+            "tunggal": [0, 0, 2, 3],
+            "beberapa": [4, 5, 6, 7],
+            "banyak": [8, 9, 10, 10],
+        }},
+    },
+    "consequent": {
+        "label": "skor_rekomendasi",
+        "universe": "skor",
+        "automf": ["sangat_rendah", "rendah", "sedang", "tinggi", "sangat_tinggi"],
+    },
+    # Aturan dirancang berdasarkan prioritas dan kriteria yang tercantum dalam
+    # "detail standard fuzzy engine" dengan fokus pada keamanan, kenyamanan, dan pengalaman.
+    "rules": [
+        # === ATURAN PRIORITAS SANGAT TINGGI (SANGAT POSITIF) ===
+        # Kombinasi ideal: Pemandangan istimewa + Keamanan tinggi + Insiden rendah
+        {"jika": ["and", ["keindahan_pemandangan_skala", "istimewa"], ["keamanan_skala", "aman"],
+                  ["tingkat_insiden_skala", "rendah"]],
+         "maka": "sangat_tinggi"},
+        # Kombinasi ideal: Lanskap bervariasi + Fasilitas lengkap + Air melimpah
+        {"jika": ["and", ["variasi_lanskap_skala", "sangat_bervariasi"], ["kualitas_fasilitas_skala", "lengkap"],
+                  ["ketersediaan_sumber_air_skala", "melimpah"], ["tingkat_insiden_skala", "rendah"]],
+         "maka": "sangat_tinggi"},
+
+        # === ATURAN PRIORITAS TINGGI ===
+        # Fokus pada keamanan dan kenyamanan logistik
+        {"jika": ["and", ["keamanan_skala", "aman"], ["tingkat_insiden_skala", "rendah"],
+                  ["or", ["kesulitan_skala", "mudah"], ["kesulitan_skala", "sedang"]]],
+         "maka": "tinggi"},
+        # Kualitas kemah dan perlindungan yang baik
+        {"jika": ["and", ["kualitas_kemah_skala", "baik"], ["perlindungan_angin_kemah_skala", "terlindungi"],
+                  ["ketersediaan_sumber_air_skala", "melimpah"]],
+         "maka": "tinggi"},
+        # Pengalaman visual yang istimewa dengan keamanan memadai
+        {"jika": ["and", ["keindahan_pemandangan_skala", "istimewa"], ["variasi_lanskap_skala", "sangat_bervariasi"],
+                  ["keamanan_skala", "aman"]],
+         "maka": "tinggi"},
+        # Fasilitas lengkap dan komunikasi baik (penting untuk keamanan)
+        {"jika": ["and", ["kualitas_fasilitas_skala", "lengkap"], ["jaringan_komunikasi_skala", "baik"],
+                  ["tingkat_insiden_skala", "rendah"]],
+         "maka": "tinggi"},
+
+        # === ATURAN PRIORITAS SEDANG ===
+        # Kondisi cukup baik dengan beberapa tantangan
+        {"jika": ["and", ["kesulitan_skala", "sedang"], ["keamanan_skala", "cukup_aman"],
+                  ["tingkat_insiden_skala", "sedang"]],
+         "maka": "sedang"},
+        # Waktu menantang tapi fasilitas mendukung
+        {"jika": ["and", ["or", ["estimasi_waktu_jam", "panjang"], ["ketinggian_puncak_mdpl", "tinggi"]],
+                  ["kualitas_fasilitas_skala", "lengkap"], ["keamanan_skala", "aman"]],
+         "maka": "sedang"},
+        # Banyak pilihan jalur dengan kualitas cukup
+        {"jika": ["and", ["variasi_jalur_skala", "banyak"], ["keamanan_skala", "cukup_aman"]],
+         "maka": "sedang"},
+        # Pemandangan indah meski fasilitas terbatas
+        {"jika": ["and", ["keindahan_pemandangan_skala", "indah"], ["variasi_lanskap_skala", "cukup_bervariasi"],
+                  ["keamanan_skala", "cukup_aman"]],
+         "maka": "sedang"},
+
+        # === ATURAN PRIORITAS RENDAH (PENALTI) ===
+        # Masalah logistik dan kenyamanan
+        {"jika": ["and", ["kualitas_fasilitas_skala", "minim"], ["kualitas_kemah_skala", "buruk"]],
+         "maka": "rendah"},
+        # Masalah perlindungan dan sumber daya
+        {"jika": ["and", ["perlindungan_angin_kemah_skala", "sangat_terekspos"],
+                  ["ketersediaan_sumber_air_skala", "terbatas"]],
+         "maka": "rendah"},
+        # Komunikasi buruk dan insiden sedang
+        {"jika": ["and", ["jaringan_komunikasi_skala", "tidak_ada"], ["tingkat_insiden_skala", "sedang"]],
+         "maka": "rendah"},
+        # Kesulitan tinggi tanpa dukungan fasilitas
+        {"jika": ["and", ["kesulitan_skala", "sulit"], ["kualitas_fasilitas_skala", "minim"],
+                  ["keamanan_skala", "cukup_aman"]],
+         "maka": "rendah"},
+
+        # === ATURAN PRIORITAS SANGAT RENDAH (SANGAT NEGATIF) ===
+        # Masalah keamanan kritis
+        {"jika": ["or", ["keamanan_skala", "berbahaya"], ["tingkat_insiden_skala", "tinggi"]],
+         "maka": "sangat_rendah"},
+        # Kombinasi berbahaya: Kesulitan tinggi + Insiden tinggi
+        {"jika": ["and", ["kesulitan_skala", "sulit"], ["tingkat_insiden_skala", "tinggi"]],
+         "maka": "sangat_rendah"},
+        # Krisis logistik: Air langka + Fasilitas minim + Komunikasi tidak ada
+        {"jika": ["and", ["ketersediaan_sumber_air_skala", "langka"], ["kualitas_fasilitas_skala", "minim"],
+                  ["jaringan_komunikasi_skala", "tidak_ada"]],
+         "maka": "sangat_rendah"},
+        # Kondisi ekstrem: Ekspedisi + Berbahaya + Air langka
+        {"jika": ["and", ["estimasi_waktu_jam", "ekspedisi"], ["keamanan_skala", "berbahaya"],
+                  ["ketersediaan_sumber_air_skala", "langka"]],
+         "maka": "sangat_rendah"},
+
+        # === RULE FALLBACK ===
+        # Jika tidak ada rule lain yang match, set skor ke 'sedang' (catch-all)
+        # Fallback: gunakan OR semua antecedent utama pada kondisi "normal" (misal: sedang)
+        {"jika": ["or",
+                  ["keamanan_skala", "cukup_aman"],
+                  ["kesulitan_skala", "sedang"],
+                  ["ketersediaan_sumber_air_skala", "terbatas"],
+                  ["kualitas_fasilitas_skala", "cukup"],
+                  ["kualitas_kemah_skala", "cukup"],
+                  ["keindahan_pemandangan_skala", "indah"],
+                  ["variasi_lanskap_skala", "cukup_bervariasi"],
+                  ["perlindungan_angin_kemah_skala", "cukup_terlindungi"],
+                  ["jaringan_komunikasi_skala", "terbatas"],
+                  ["tingkat_insiden_skala", "sedang"],
+                  ["variasi_jalur_skala", "beberapa"],
+                  ["estimasi_waktu_jam", "sedang"],
+                  ["ketinggian_puncak_mdpl", "sedang"]],
+         "maka": "sedang"},
+    ],
+}
+
+
+def hash_definisi(definisi=DEFINISI_FUZZY):
+    """Hash konten (sha256) definisi; berubah setiap kali MF atau rules berubah."""
+    kanonik = json.dumps(definisi, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(kanonik.encode("utf-8")).hexdigest()
+
+
+def buat_universe(definisi, nama):
+    awal, akhir, langkah = definisi["universe"][nama]
+    return np.arange(awal, akhir, langkah)
+
+
+def bangun_control_system(definisi=DEFINISI_FUZZY):
+    """
+    Membangun objek skfuzzy (antecedents, consequent, rules) dari definisi.
+    Operator n-ary dirangkai dari kiri, sama dengan a & b & c pada skfuzzy.
+    """
+    antecedents = {}
+    for label, spek in definisi["antecedents"].items():
+        universe = buat_universe(definisi, spek["universe"])
+        antecedents[label] = ctrl.Antecedent(universe, label)
+        for nama_term, abcd in spek["terms"].items():
+            antecedents[label][nama_term] = fuzz.trapmf(universe, abcd)
+
+    spek_output = definisi["consequent"]
+    consequent = ctrl.Consequent(buat_universe(definisi, spek_output["universe"]), spek_output["label"])
+    consequent.automf(names=spek_output["automf"])
+
+    def kondisi(ekspresi):
+        if ekspresi[0] in ("and", "or"):
+            anak = [kondisi(e) for e in ekspresi[1:]]
+            if ekspresi[0] == "and":
+                return reduce(lambda kiri, kanan: kiri & kanan, anak)
+            return reduce(lambda kiri, kanan: kiri | kanan, anak)
+        variabel, term = ekspresi
+        return antecedents[variabel][term]
+
+    rules = [ctrl.Rule(kondisi(rule["jika"]), consequent[rule["maka"]]) for rule in definisi["rules"]]
+    return antecedents, consequent, rules
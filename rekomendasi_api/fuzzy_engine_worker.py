@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+"""
+Mode Worker (--serve) Fuzzy Engine untuk Node.js
+
+Dijalankan lewat `python fuzzy_engine.py --serve`. Setiap baris stdin adalah satu
+permintaan JSON dan setiap baris stdout satu respons JSON; field "id" dikembalikan
+apa adanya sehingga Node.js bisa mengirim beberapa permintaan sekaligus.
+
+    {"id": 7, "preferensi": {...}}        -> {"id": 7, "rekomendasi_gunung": [...], ...}
+        "tata_letak": "kolom"             -> tabel dikirim sebagai satu array per field
+        "stream": true                    -> {"jenis": "header"}, {"jenis": "gunung"/"jalur", ...},
+                                             {"jenis": "selesai"} dengan id yang sama
+        "batas_waktu_ms": 1500            -> rencana termurah dalam batas waktu (proses_rekomendasi_tenggat);
+                                             metadata "tenggat": {"status": "lengkap"/"teratas_pasti"/"upaya_terbaik", ...}
+        "sesi": true / "<token>"          -> metadata "sesi": {"token", "status", "kandidat", ...}
+    {"id": 12, "op": "rekomendasi_batch", "daftar_preferensi": [...]} -> {"id": 12, "hasil": [...]}
+    {"id": 8, "op": "ping"}               -> {"id": 8, "status": "ok"}
+    {"id": 9, "op": "muat_ulang"}         -> data jalur diambil ulang dari database
+    {"id": 11, "op": "segarkan", "id_jalur": [3], "id_gunung": []} -> hanya jalur/gunung tsb. diambil ulang
+    {"id": 13, "op": "hangatkan"}         -> cache hasil dihangatkan dari search_history
+    {"id": 14, "op": "statistik"}         -> statistik cache, penggabungan, penghangatan dan sesi
+    {"id": 10, "op": "berhenti"}          -> worker keluar dengan bersih (sama seperti EOF/SIGTERM)
+
+Perubahan katalog juga diterima dari NOTIFY pada KANAL_NOTIFY. Permintaan rekomendasi
+identik yang datang selama komputasinya berjalan menunggu hasil yang sama (lihat
+fuzzy_engine_cache.py); metadata respons memuat "cache" dan "penggabungan".
+
+Konfigurasi lewat environment:
+- FUZZY_DATA_TTL_DETIK                    : umur data hangat sebelum dimuat ulang (default 300, 0 = tidak pernah)
+- FUZZY_DATASET_BERSAMA                   : direktori dataset mmap yang dipakai bersama beberapa worker
+                                            (lihat fuzzy_engine_bersama.py)
+- FUZZY_PARALEL_PEKERJA                   : jumlah proses penilaian ulang katalog (lihat PoolSkor)
+- FUZZY_HANGAT_TOP_N / FUZZY_HANGAT_HARI  : penghangatan cache dari search_history (default 20 / 7)
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import threading
+import traceback
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from fuzzy_engine import (CacheMedia, IndeksJalur, PoolSkor, SkorJalur, TokoJalur, TABEL_STREAM,
+                          agregasi_gunung, bangun_hasil_akhir, bangun_respons_error, dapatkan_engine,
+                          dumps_ringkas, filter_kanonik, get_data_jalur_from_database, lebih_ketat,
+                          pesan_stream, proses_rekomendasi, proses_rekomendasi_batch,
+                          proses_rekomendasi_kandidat, proses_rekomendasi_tenggat)
+from fuzzy_engine_bersama import DatasetBersama
+from fuzzy_engine_cache import CacheHasil, PenggabungPermintaan, SesiPreferensi, kunci_preferensi
+from fuzzy_engine_db import KANAL_NOTIFY, PendengarKatalog, ambil_filter_populer, dapatkan_pool, sidik_katalog
+
+class WorkerFuzzy:
+    """Menyimpan sistem fuzzy dan data jalur agar tetap hangat di antara permintaan."""
+
+    def __init__(self, ttl_data=None):
+        self.engine = dapatkan_engine()
+        # Data dianggap basi setelah TTL (detik); 0 berarti tidak pernah dimuat ulang otomatis
+        if ttl_data is None:
+            ttl_data = float(os.getenv("FUZZY_DATA_TTL_DETIK", "300"))
+        self.ttl_data = ttl_data
+        # Katalog hangat dalam bentuk kompak (TokoJalur), bukan DataFrame
+        self.toko = None
+        self.waktu_muat = 0.0
+        # Skor per jalur (persisten) dan agregat per gunung untuk katalog penuh
+        self.paralel = PoolSkor.dari_env(self.engine)
+        # Mode dataset bersama: katalog, skor dan agregat dibuka read-only (mmap)
+        self.bersama = DatasetBersama.dari_env(self.engine)
+        self.versi_bersama = None
+        self.skor_jalur = SkorJalur(self.engine, paralel=self.paralel) if self.bersama is None else None
+        self.agregat_gunung = None
+        self.indeks = None
+        # Data hangat hanya proyeksi ringkas; kolom media diambil per id lalu disimpan di sini
+        self.media = CacheMedia()
+        # Hasil per preferensi kanonik; versi_data naik setiap katalog berubah
+        self.cache = CacheHasil()
+        self.versi_data = 0
+        # versi_data juga dibaca thread utama (kunci penggabungan) saat eksekutor menyegarkan katalog
+        self._kunci_versi = threading.Lock()
+        # Penghangatan cache: N kelompok filter terbanyak di search_history dalam jendela (hari)
+        self.hangat_top_n = int(os.getenv("FUZZY_HANGAT_TOP_N", "20"))
+        self.hangat_hari = float(os.getenv("FUZZY_HANGAT_HARI", "7"))
+        self.laporan_hangat = None
+        self.perlu_hangat = False
+        self.gabung = PenggabungPermintaan()
+        # Kandidat per token sesi; dikosongkan setiap katalog berubah
+        self.sesi = SesiPreferensi()
+        # Perubahan dari pendengar NOTIFY (thread lain), diterapkan di thread utama
+        self._perubahan = []
+        self._kunci_perubahan = threading.Lock()
+
+    def _dengan_skor(self, df_jalur):
+        df_jalur = df_jalur.copy()
+        df_jalur['skor_rekomendasi'], df_jalur['kategori_rekomendasi'] = self.skor_jalur.ambil(df_jalur)
+        return df_jalur
+
+    def _data_berubah(self):
+        # Hasil yang tersimpan milik versi data lama
+        self._naikkan_versi()
+        self.cache.kosongkan()
+        self.sesi.kosongkan()
+        self.perlu_hangat = True
+
+    def _naikkan_versi(self):
+        # Juga saat NOTIFY dicatat: permintaan sesudahnya tidak menumpang komputasi katalog lama
+        with self._kunci_versi:
+            self.versi_data += 1
+
+    def muat_data(self):
+        if self.bersama is not None:
+            self._buka_bersama(dapatkan_pool().jalankan(sidik_katalog))
+            return
+        df_jalur = get_data_jalur_from_database(media=False)
+        self.media = CacheMedia()
+        # Jalur yang inputnya sama dengan skor tersimpan tidak dihitung ulang
+        self.skor_jalur.hapus(np.setdiff1d(self.skor_jalur.id_jalur, df_jalur['id_jalur'].to_numpy()))
+        self.agregat_gunung = agregasi_gunung(self._dengan_skor(df_jalur)) if not df_jalur.empty else None
+        self.toko = TokoJalur(df_jalur)
+        self.indeks = IndeksJalur(self.toko)
+        self.waktu_muat = time.monotonic()
+        self._data_berubah()
+        print(f"📦 Katalog hangat: {len(self.toko)} jalur, {self.toko.nbytes / 1024:.1f} KiB", file=sys.stderr)
+
+    def _bangun_bersama(self):
+        """Dijalankan hanya oleh worker pemegang kunci: katalog + skor untuk diterbitkan."""
+        df_jalur = get_data_jalur_from_database(media=False)
+        skor_jalur = SkorJalur(self.engine, paralel=self.paralel)
+        skor_jalur.hapus(np.setdiff1d(skor_jalur.id_jalur, df_jalur['id_jalur'].to_numpy()))
+        df_skor = df_jalur.copy()
+        df_skor['skor_rekomendasi'], df_skor['kategori_rekomendasi'] = skor_jalur.ambil(df_skor)
+        agregat = agregasi_gunung(df_skor) if not df_jalur.empty else None
+        return (df_jalur, skor_jalur.ambil_fuzzy(df_jalur), df_skor['skor_rekomendasi'],
+                df_skor['kategori_rekomendasi'], agregat)
+
+    def _buka_bersama(self, sidik=None):
+        """Memakai versi dataset bersama untuk sidik (None = versi aktif di manifest)."""
+        if sidik is None:
+            terbuka = self.bersama.buka()
+        else:
+            terbuka = self.bersama.siapkan(sidik, self._bangun_bersama)
+        if terbuka is None:
+            return
+        manifest, toko, skor, agregat = terbuka
+        self.waktu_muat = time.monotonic()
+        if manifest["versi"] == self.versi_bersama:
+            return
+        self.media = CacheMedia()
+        self.toko, self.skor_jalur, self.agregat_gunung = toko, skor, agregat
+        # Tanpa indeks bitmap per proses: filter dipindai langsung dari kolom mmap
+        self.indeks = None
+        self.versi_bersama = manifest["versi"]
+        self._data_berubah()
+        print(f"📎 Dataset bersama versi {self.versi_bersama} dipakai ({len(toko)} jalur)", file=sys.stderr)
+
+    def segarkan(self, id_jalur=(), id_gunung=()):
+        """Mengambil ulang jalur/gunung yang diubah admin; skor dan agregat lain tidak disentuh."""
+        if self.bersama is not None:
+            # Versi baru diterbitkan sekali (worker pertama yang melihat sidik baru)
+            self.muat_data()
+            return
+        if self.toko is None or self.agregat_gunung is None:
+            self.muat_data()
+            return
+        # Penyegaran jarang terjadi: cukup lewat DataFrame lalu dipadatkan lagi
+        df_lama = self.toko.ke_dataframe()
+        id_jalur = [int(i) for i in id_jalur or []]
+        id_gunung = [int(i) for i in id_gunung or []]
+        baru = get_data_jalur_from_database(id_jalur=id_jalur, id_gunung=id_gunung, media=False)
+        lama = df_lama['id_jalur'].isin(id_jalur) | df_lama['id_gunung'].isin(id_gunung)
+        # Gunung asal jalur yang dipindah/dihapus juga harus diagregasi ulang
+        terdampak = set(df_lama.loc[lama, 'id_gunung']) | set(baru['id_gunung']) | set(id_gunung)
+        self.media.buang(set(df_lama.loc[lama, 'id_jalur']) | set(baru['id_jalur']), terdampak)
+
+        self.skor_jalur.hapus(set(df_lama.loc[lama, 'id_jalur']) - set(baru['id_jalur']))
+        df_jalur = pd.concat([df_lama[~lama], baru], ignore_index=True)
+        df_jalur = df_jalur.sort_values(['nama_gunung', 'nama_jalur'], kind='stable').reset_index(drop=True)
+
+        agregat = self.agregat_gunung[~self.agregat_gunung['id_gunung'].isin(terdampak)]
+        df_terdampak = df_jalur[df_jalur['id_gunung'].isin(terdampak)]
+        if not df_terdampak.empty:
+            agregat = pd.concat([agregat, agregasi_gunung(self._dengan_skor(df_terdampak))])
+        self.agregat_gunung = agregat.sort_values(['id_gunung', 'nama_gunung']).reset_index(drop=True)
+        self.toko = TokoJalur(df_jalur)
+        self.indeks = IndeksJalur(self.toko)
+        self._data_berubah()
+        print(f"🔄 Katalog disegarkan: {len(baru)} jalur, {len(terdampak)} gunung", file=sys.stderr)
+
+    def catat_perubahan(self, id_jalur, id_gunung):
+        """Callback PendengarKatalog; hanya mencatat, penyegaran dilakukan oleh data_jalur()."""
+        with self._kunci_perubahan:
+            self._perubahan.append((list(id_jalur), list(id_gunung)))
+        self._naikkan_versi()
+
+    def _terapkan_perubahan(self):
+        with self._kunci_perubahan:
+            perubahan, self._perubahan = self._perubahan, []
+        if perubahan and self.toko is not None:
+            self.segarkan([i for j, _ in perubahan for i in j], [i for _, g in perubahan for i in g])
+
+    def basi(self):
+        return self.ttl_data > 0 and time.monotonic() - self.waktu_muat > self.ttl_data
+
+    def data_jalur(self, boleh_basi=False):
+        """Katalog hangat; boleh_basi=True menunda pemuatan ulang TTL (permintaan bertenggat)."""
+        self._terapkan_perubahan()
+        if self.toko is None or (self.basi() and not boleh_basi):
+            self.muat_data()
+        elif self.bersama is not None:
+            # Worker lain sudah menerbitkan versi baru: beralih sebelum permintaan diproses
+            manifest = self.bersama.manifest()
+            if manifest is not None and manifest["versi"] != self.versi_bersama:
+                self._buka_bersama()
+        return self.toko
+
+    def tangani(self, permintaan, diterima=None):
+        """
+        Memproses satu permintaan protokol dan mengembalikan dictionary respons (tanpa id).
+        diterima (time.monotonic()) adalah awal batas_waktu_ms; default saat ini.
+        """
+        op = permintaan.get("op", "rekomendasi")
+        if op == "ping":
+            return {"status": "ok"}
+        if op == "muat_ulang":
+            self.muat_data()
+            return {"status": "ok", "total_jalur": len(self.toko)}
+        if op == "segarkan":
+            self.segarkan(permintaan.get("id_jalur"), permintaan.get("id_gunung"))
+            return {"status": "ok", "total_jalur": len(self.toko)}
+        if op == "hangatkan":
+            return {"status": "ok", "hangat": self.hangatkan()}
+        if op == "statistik":
+            return {"status": "ok", "cache": self.cache.statistik(), "penggabungan": self.gabung.statistik(),
+                    "hangat": self.laporan_hangat, "sesi": self.sesi.statistik()}
+        if op == "rekomendasi_batch":
+            daftar_preferensi = permintaan.get("daftar_preferensi") or []
+            daftar_hasil = []
+            for (g, j, info_cache), p in zip(self.ambil_rekomendasi_batch(daftar_preferensi), daftar_preferensi):
+                hasil = bangun_hasil_akhir(g, j, p, self.engine, permintaan.get("tata_letak", "records"))
+                hasil["metadata"]["cache"] = info_cache
+                daftar_hasil.append(hasil)
+            return {"hasil": daftar_hasil}
+        if op != "rekomendasi":
+            raise ValueError(f"Operasi tidak dikenal: {op}")
+
+        if permintaan.get("batas_waktu_ms") is not None:
+            hasil, info_tenggat = self.ambil_rekomendasi_tenggat(
+                permintaan.get("preferensi"), self._tenggat(permintaan, diterima))
+            return self.respons_rekomendasi(permintaan, hasil, {"tenggat": info_tenggat})
+        if permintaan.get("sesi"):
+            hasil, info_sesi = self.ambil_rekomendasi_sesi(permintaan.get("preferensi"), permintaan["sesi"])
+            return self.respons_rekomendasi(permintaan, hasil, {"sesi": info_sesi})
+        return self.respons_rekomendasi(permintaan, self.ambil_rekomendasi(permintaan.get("preferensi")))
+
+    @staticmethod
+    def _tenggat(permintaan, diterima=None):
+        return (time.monotonic() if diterima is None else diterima) + float(permintaan["batas_waktu_ms"]) / 1000
+
+    def respons_rekomendasi(self, permintaan, hasil_rekomendasi, info_tambahan=None):
+        """Respons untuk hasil ambil_rekomendasi; info_tambahan digabung ke metadata."""
+        rekomendasi_gunung, rekomendasi_jalur, info_cache = hasil_rekomendasi
+        hasil = bangun_hasil_akhir(rekomendasi_gunung, rekomendasi_jalur, permintaan.get("preferensi"), self.engine,
+                                   permintaan.get("tata_letak", "records"))
+        hasil["metadata"]["cache"] = info_cache
+        hasil["metadata"].update(info_tambahan or {})
+        return hasil
+
+    def kunci_cache(self, preferensi_pengguna):
+        with self._kunci_versi:
+            versi_data = self.versi_data
+        return (kunci_preferensi(preferensi_pengguna), versi_data, self.engine.versi)
+
+    def gabungkan(self, preferensi_pengguna, eksekutor, fungsi):
+        """gabung.jalankan dengan kunci versi saat ini; versi tidak bisa naik di antara baca kunci dan bergabung."""
+        with self._kunci_versi:
+            kunci = (kunci_preferensi(preferensi_pengguna), self.versi_data, self.engine.versi)
+            return self.gabung.jalankan(kunci, eksekutor, fungsi)
+
+    def ambil_rekomendasi(self, preferensi_pengguna):
+        """rekomendasi() lewat cache hasil: (gunung, jalur, info cache untuk metadata)."""
+        self.data_jalur()
+        kunci = self.kunci_cache(preferensi_pengguna)
+        hasil = self.cache.ambil(kunci)
+        status = "hit"
+        if hasil is None:
+            status = "miss"
+            hasil = self.rekomendasi(preferensi_pengguna)
+            self.cache.simpan(kunci, hasil)
+        return (*hasil, {"status": status, **self.cache.statistik()})
+
+    def ambil_rekomendasi_tenggat(self, preferensi_pengguna, tenggat):
+        """
+        ambil_rekomendasi dalam tenggat (time.monotonic()): cache, lalu skor tersimpan, lalu
+        penilaian bertahap (proses_rekomendasi_tenggat). Pemuatan ulang TTL ditunda sampai
+        respons terkirim. Mengembalikan ((gunung, jalur, info cache), info tenggat);
+        hanya hasil lengkap yang disimpan ke cache.
+        """
+        mulai = time.monotonic()
+        ditunda = self.toko is not None and self.basi()
+        toko = self.data_jalur(boleh_basi=True)
+        kunci = self.kunci_cache(preferensi_pengguna)
+        hasil = self.cache.ambil(kunci)
+        if hasil is not None:
+            status_cache = "hit"
+            info = {"status": "lengkap", "sumber": "cache", "agregat_gunung_lengkap": True,
+                    "gunung_agregat_sebagian": []}
+        else:
+            status_cache = "miss"
+            *hasil, info = proses_rekomendasi_tenggat(
+                toko, preferensi_pengguna, tenggat, self.engine, self.skor_jalur, self.agregat_gunung,
+                self.indeks, self.media)
+            hasil = tuple(hasil)
+            if info["status"] == "lengkap":
+                self.cache.simpan(kunci, hasil)
+        info.update({"lengkap": info["status"] == "lengkap", "data_ditunda": ditunda,
+                     "sisa_ms": round((tenggat - time.monotonic()) * 1000, 1),
+                     "durasi_ms": round((time.monotonic() - mulai) * 1000, 1)})
+        return (*hasil, {"status": status_cache, **self.cache.statistik()}), info
+
+    def ambil_rekomendasi_sesi(self, preferensi_pengguna, token=True):
+        """
+        Rekomendasi dalam sesi penyempitan (lihat SesiPreferensi). token True (atau token yang tidak
+        dikenal/kedaluwarsa) membuka sesi baru. Mengembalikan ((gunung, jalur, info cache),
+        info sesi); status sesi "dipersempit" (dari kandidat tersimpan), "penuh" (filter
+        dilonggarkan, query penuh) atau "baru". Cache hasil tidak dibaca karena sesi butuh
+        kandidatnya, tetapi hasil query penuh tetap disimpan ke cache.
+        """
+        mulai = time.monotonic()
+        toko = self.data_jalur()
+        filter_baru = filter_kanonik(preferensi_pengguna)
+        bobot = kunci_preferensi({k: v for k, v in (preferensi_pengguna or {}).items()
+                                  if k in ('bobot_kriteria', 'rasio_fuzzy')})
+        sesi = self.sesi.ambil(token) if isinstance(token, str) else None
+        argumen = (self.engine, self.skor_jalur, self.agregat_gunung, self.indeks, self.media)
+        if sesi is not None and sesi["bobot"] == bobot and lebih_ketat(filter_baru, sesi["filter"]):
+            status = "dipersempit"
+            g, j, (posisi, _) = proses_rekomendasi_kandidat(
+                toko, preferensi_pengguna, (sesi["posisi"], sesi["skor"]), *argumen)
+        else:
+            status = "baru" if sesi is None else "penuh"
+            g, j, (posisi, skor) = proses_rekomendasi_kandidat(toko, preferensi_pengguna, None, *argumen)
+            self.cache.simpan(self.kunci_cache(preferensi_pengguna), (g, j))
+            token = self.sesi.simpan(token if sesi is not None else None, filter_baru, bobot, posisi, skor)
+        info = {"token": token, "status": status, "kandidat": len(posisi),
+                "ttl_detik": self.sesi.ttl, "durasi_ms": round((time.monotonic() - mulai) * 1000, 1)}
+        return (g, j, {"status": "dilewati", **self.cache.statistik()}), info
+
+    def ambil_rekomendasi_batch(self, daftar_preferensi):
+        """Seperti ambil_rekomendasi untuk banyak profil; profil yang belum ada dihitung dalam satu batch."""
+        self.data_jalur()
+        daftar_kunci = [self.kunci_cache(p) for p in daftar_preferensi]
+        hasil = [self.cache.ambil(kunci) for kunci in daftar_kunci]
+        status = ["miss" if h is None else "hit" for h in hasil]
+        # Profil kembar dalam satu batch cukup dihitung sekali
+        kurang = list(dict.fromkeys(k for k, h in zip(daftar_kunci, hasil) if h is None))
+        if kurang:
+            contoh = {k: p for k, p in zip(daftar_kunci, daftar_preferensi)}
+            baru = dict(zip(kurang, self.rekomendasi_batch([contoh[k] for k in kurang])))
+            for kunci in kurang:
+                self.cache.simpan(kunci, baru[kunci])
+            hasil = [baru[k] if h is None else h for k, h in zip(daftar_kunci, hasil)]
+        statistik = self.cache.statistik()
+        return [(*h, {"status": s, **statistik}) for h, s in zip(hasil, status)]
+
+    def rekomendasi(self, preferensi_pengguna):
+        # TokoJalur tidak diubah: proses_rekomendasi membuat DataFrame baru untuk baris hasil filter
+        return proses_rekomendasi(
+            self.data_jalur(), preferensi_pengguna, self.engine, self.skor_jalur, self.agregat_gunung, self.indeks,
+            self.media
+        )
+
+    def rekomendasi_batch(self, daftar_preferensi):
+        return proses_rekomendasi_batch(
+            self.data_jalur(), daftar_preferensi, self.engine, self.skor_jalur, self.indeks, self.media
+        )
+
+    def hangatkan(self):
+        """
+        Mengisi cache hasil dengan kelompok filter terbanyak di search_history (setelah
+        disamakan dengan kunci_preferensi), dihitung dalam satu batch. Mengembalikan laporan
+        cakupan, atau None bila dimatikan atau gagal (worker tetap melayani tanpa cache hangat).
+        """
+        if self.hangat_top_n <= 0 or self.cache.maks <= 0:
+            self.perlu_hangat = False
+            return None
+        mulai = time.perf_counter()
+        try:
+            grup, total = ambil_filter_populer(self.hangat_hari)
+            per_kunci = {}
+            for filters, jumlah in grup:
+                kunci = kunci_preferensi(filters)
+                contoh, n = per_kunci.get(kunci, (filters, 0))
+                per_kunci[kunci] = (contoh, n + jumlah)
+            teratas = sorted(per_kunci.values(), key=lambda g: -g[1])[:min(self.hangat_top_n, self.cache.maks)]
+            self.data_jalur()
+            daftar_preferensi = [p for p, _ in teratas]
+            for preferensi_pengguna, hasil in zip(daftar_preferensi, self.rekomendasi_batch(daftar_preferensi)):
+                self.cache.simpan(self.kunci_cache(preferensi_pengguna), hasil)
+        except Exception as e:
+            print(f"⚠️ Penghangatan cache dilewati: {e}", file=sys.stderr)
+            return None
+        finally:
+            self.perlu_hangat = False
+        tercakup = sum(n for _, n in teratas)
+        self.laporan_hangat = {
+            "profil": len(teratas), "pencarian_tercakup": tercakup, "total_pencarian": total,
+            "cakupan": round(tercakup / total, 4) if total else 0.0, "hari": self.hangat_hari,
+            "durasi_ms": round((time.perf_counter() - mulai) * 1000, 1),
+        }
+        print(f"🔥 Cache dihangatkan: {len(teratas)} profil mencakup {tercakup}/{total} pencarian "
+              f"{self.hangat_hari:g} hari terakhir ({self.laporan_hangat['durasi_ms']} ms)", file=sys.stderr)
+        return self.laporan_hangat
+
+    def tangani_stream(self, permintaan, hasil_rekomendasi=None, info_tambahan=None, diterima=None):
+        """Permintaan rekomendasi dengan "stream": true; menghasilkan beberapa pesan (lihat pesan_stream)."""
+        preferensi_pengguna = permintaan.get("preferensi")
+        if hasil_rekomendasi is None and permintaan.get("batas_waktu_ms") is not None:
+            hasil_rekomendasi, info_tenggat = self.ambil_rekomendasi_tenggat(
+                preferensi_pengguna, self._tenggat(permintaan, diterima))
+            info_tambahan = {**(info_tambahan or {}), "tenggat": info_tenggat}
+        elif hasil_rekomendasi is None and permintaan.get("sesi"):
+            hasil_rekomendasi, info_sesi = self.ambil_rekomendasi_sesi(preferensi_pengguna, permintaan["sesi"])
+            info_tambahan = {**(info_tambahan or {}), "sesi": info_sesi}
+        elif hasil_rekomendasi is None:
+            hasil_rekomendasi = self.ambil_rekomendasi(preferensi_pengguna)
+        rekomendasi_gunung, rekomendasi_jalur, info_cache = hasil_rekomendasi
+        pesan = pesan_stream(rekomendasi_gunung, rekomendasi_jalur, preferensi_pengguna, self.engine,
+                             tuple(permintaan.get("tabel") or TABEL_STREAM))
+        header = next(pesan)
+        header["metadata"]["cache"] = info_cache
+        header["metadata"].update(info_tambahan or {})
+        yield header
+        yield from pesan
+
+
+def jalankan_server(masukan=None, keluaran=None):
+    """Loop worker: membaca NDJSON dari stdin dan menulis satu baris JSON per respons."""
+    masukan = masukan or sys.stdin
+    keluaran = keluaran or sys.stdout
+
+    kunci_kirim = threading.Lock()
+
+    def kirim(pesan):
+        baris = dumps_ringkas(pesan) + "\n"
+        with kunci_kirim:
+            keluaran.write(baris)
+            keluaran.flush()
+
+    def hentikan(signum, frame):
+        raise SystemExit(0)
+
+    if masukan is sys.stdin:
+        signal.signal(signal.SIGTERM, hentikan)
+
+    worker = WorkerFuzzy()
+    try:
+        worker.muat_data()
+        worker.hangatkan()
+    except Exception as e:
+        # Database belum siap: data akan dicoba dimuat lagi pada permintaan pertama
+        print(f"⚠️ Data awal gagal dimuat, dicoba ulang saat permintaan: {e}", file=sys.stderr)
+    # Pendengar NOTIFY hanya untuk worker sungguhan (stdin), bukan pemanggilan dari pengujian
+    pendengar = None
+    if masukan is sys.stdin and KANAL_NOTIFY:
+        pendengar = PendengarKatalog(worker.catat_perubahan)
+        pendengar.start()
+    kirim({"status": "siap", "pid": os.getpid(), "dengar_notify": pendengar is not None,
+           "hangat": worker.laporan_hangat})
+
+    def gagal(id_permintaan, e):
+        print(f"❌ Error in fuzzy engine worker: {e}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        kirim({"id": id_permintaan, **bangun_respons_error(e)})
+
+    # Satu thread eksekutor (urutan FIFO); thread utama hanya membaca stdin dan menggabungkan
+    eksekutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fuzzy-worker")
+
+    def jalankan(permintaan, diterima):
+        id_permintaan = permintaan.get("id")
+        try:
+            if permintaan.get("stream") and permintaan.get("op", "rekomendasi") == "rekomendasi":
+                for pesan in worker.tangani_stream(permintaan, diterima=diterima):
+                    kirim({"id": id_permintaan, **pesan})
+            else:
+                kirim({"id": id_permintaan, **worker.tangani(permintaan, diterima)})
+        except Exception as e:
+            gagal(id_permintaan, e)
+
+    def hitung(preferensi_pengguna):
+        mulai = time.perf_counter()
+        hasil = worker.ambil_rekomendasi(preferensi_pengguna)
+        return hasil, (time.perf_counter() - mulai) * 1000
+
+    def kirim_rekomendasi(permintaan, diterima, digabung, future):
+        id_permintaan = permintaan.get("id")
+        try:
+            hasil, durasi_ms = future.result()
+            info = {"penggabungan": worker.gabung.catat(digabung, (time.perf_counter() - diterima) * 1000, durasi_ms)}
+            if permintaan.get("stream"):
+                for pesan in worker.tangani_stream(permintaan, hasil, info):
+                    kirim({"id": id_permintaan, **pesan})
+            else:
+                kirim({"id": id_permintaan, **worker.respons_rekomendasi(permintaan, hasil, info)})
+        except Exception as e:
+            gagal(id_permintaan, e)
+
+    thread_utama = threading.get_ident()
+
+    def selesai_rekomendasi(permintaan, diterima, digabung, future):
+        # Future yang sudah selesai memanggil callback di thread utama: pindahkan ke eksekutor
+        if threading.get_ident() == thread_utama:
+            eksekutor.submit(kirim_rekomendasi, permintaan, diterima, digabung, future)
+        else:
+            kirim_rekomendasi(permintaan, diterima, digabung, future)
+
+    def pemeliharaan():
+        # Pemuatan ulang dan penghangatan yang ditunda, setelah respons sebelumnya terkirim
+        if worker.toko is not None and worker.basi():
+            worker.data_jalur()
+        if worker.perlu_hangat:
+            worker.hangatkan()
+
+    try:
+        for baris in masukan:
+            baris = baris.strip()
+            if not baris:
+                continue
+            try:
+                permintaan = json.loads(baris)
+            except json.JSONDecodeError as e:
+                eksekutor.submit(kirim, {"id": None, **bangun_respons_error(f"Invalid JSON format: {e}")})
+                continue
+
+            id_permintaan = permintaan.get("id")
+            if permintaan.get("op") == "berhenti":
+                # Permintaan yang sudah diterima tetap dijawab dulu
+                eksekutor.shutdown(wait=True)
+                kirim({"id": id_permintaan, "status": "berhenti"})
+                break
+            preferensi_pengguna = permintaan.get("preferensi")
+            # Permintaan bertenggat atau bersesi tidak menumpang komputasi penuh
+            if permintaan.get("op", "rekomendasi") == "rekomendasi" and permintaan.get("batas_waktu_ms") is None \
+                    and not permintaan.get("sesi") and isinstance(preferensi_pengguna, (dict, type(None))):
+                diterima = time.perf_counter()
+                future, digabung = worker.gabungkan(preferensi_pengguna, eksekutor, partial(hitung, preferensi_pengguna))
+                future.add_done_callback(partial(selesai_rekomendasi, permintaan, diterima, digabung))
+            else:
+                eksekutor.submit(jalankan, permintaan, time.monotonic())
+            eksekutor.submit(pemeliharaan)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Juga saat SIGTERM (SystemExit): pool proses dan koneksi LISTEN tidak boleh tertinggal
+        eksekutor.shutdown(wait=True)
+        if pendengar is not None:
+            pendengar.hentikan()
+        if worker.paralel is not None:
+            worker.paralel.tutup()
+        print("✅ Worker fuzzy engine berhenti", file=sys.stderr)
@@ -1,5 +1,17 @@
+import io
+import json
+import time
+import threading
 import pytest
+import numpy as np
 import pandas as pd
+import psycopg2
+import skfuzzy as fuzz
+import fuzzy_engine
+import fuzzy_engine_db
+import fuzzy_engine_bersama
+import fuzzy_engine_cache
+import fuzzy_engine_worker
 from fuzzy_engine import proses_rekomendasi, get_data_jalur_from_database
 
 # Test dengan data asli dari database, bukan mock
@@ -168,3 +180,1022 @@ def test_rekomendasi_kombinasi_ekstrem():
     # Boleh kosong jika filter terlalu ketat, tapi tidak error
     assert rekomendasi_gunung is not None
     assert rekomendasi_jalur is not None
+
+# Test 11: Mode worker (--serve) menjawab setiap baris NDJSON dengan id yang sama
+def test_worker_serve_protokol(katalog_sintetis):
+    katalog_sintetis()
+    masukan = io.StringIO(
+        '{"id": 1, "preferensi": {"max_kesulitan_skala": 5}}\n'
+        'bukan json\n'
+        '{"id": "b", "op": "ping"}\n'
+        '{"id": 3, "op": "berhenti"}\n'
+        '{"id": 4, "preferensi": {}}\n'
+    )
+    keluaran = io.StringIO()
+    fuzzy_engine_worker.jalankan_server(masukan, keluaran)
+    respons = [json.loads(baris) for baris in keluaran.getvalue().splitlines()]
+    assert respons[0]['status'] == 'siap'
+    assert respons[1]['id'] == 1
+    assert all(j['kesulitan_skala'] <= 5 for j in respons[1]['rekomendasi_jalur'])
+    assert respons[2]['id'] is None and respons[2]['error'] is True
+    assert respons[3] == {'id': 'b', 'status': 'ok'}
+    # Permintaan setelah "berhenti" tidak diproses
+    assert respons[4] == {'id': 3, 'status': 'berhenti'}
+    assert len(respons) == 5
+
+# Test 12: Kernel batch harus sama dengan ControlSystemSimulation (termasuk nilai pecahan dan di luar universe)
+def test_inferensi_batch_sama_dengan_skfuzzy():
+    engine = fuzzy_engine.dapatkan_engine()
+    rng = np.random.default_rng(7)
+    kolom = []
+    for variabel in engine.variabel:
+        if variabel == 'ketinggian_puncak_mdpl':
+            kolom.append(rng.uniform(-100, 6000, 40))
+        elif variabel == 'estimasi_waktu_jam':
+            kolom.append(rng.uniform(-5, 130, 40))
+        else:
+            kolom.append(rng.integers(-1, 12, 40).astype(float))
+    X = np.column_stack(kolom)
+    skor, _ = fuzzy_engine.inferensi_batch(engine.kompilasi, X, ukuran_chunk=16)
+    referensi = engine.skor_fuzzy_referensi(X)
+    assert np.abs(skor - referensi).max() <= fuzzy_engine.TOLERANSI_INFERENSI
+
+# Test 13: Artefak engine di-cache per hash definisi dan versinya muncul di metadata
+def test_engine_cache_artefak(tmp_path, buat_katalog):
+    engine = fuzzy_engine.FuzzyEngine.muat(direktori_cache=str(tmp_path))
+    artefak = list(tmp_path.glob('fuzzy_engine_*.npz'))
+    assert len(artefak) == 1 and engine.versi in artefak[0].name
+    dimuat = fuzzy_engine.FuzzyEngine.muat(direktori_cache=str(tmp_path))
+    X = buat_katalog()[engine.variabel].to_numpy(dtype=float)
+    assert np.array_equal(engine.skor_fuzzy(X)[0], dimuat.skor_fuzzy(X)[0])
+
+    hasil = fuzzy_engine.bangun_hasil_akhir(*proses_rekomendasi(buat_katalog(), None, dimuat), None, dimuat)
+    assert hasil['metadata']['engine_info']['versi_aturan'] == engine.versi
+
+# Test 14: Derajat keanggotaan analitik/LUT sama dengan fuzz.interp_membership pada universe skfuzzy
+def test_derajat_keanggotaan_tanpa_universe(buat_katalog):
+    engine = fuzzy_engine.dapatkan_engine()
+    antecedents, _ = engine.sistem_skfuzzy()
+    rng = np.random.default_rng(3)
+    for X in (buat_katalog()[engine.variabel].to_numpy(dtype=float),
+              rng.uniform(-10, 6000, (50, len(engine.variabel)))):
+        derajat = engine.derajat_keanggotaan(X)
+        for j, nama in enumerate(engine.kompilasi['term_nama']):
+            variabel, term = nama.split('.', 1)
+            kolom = engine.variabel.index(variabel)
+            univ = antecedents[variabel].universe
+            x = np.clip(X[:, kolom], univ[0], univ[-1])
+            referensi = [fuzz.interp_membership(univ, antecedents[variabel][term].mf, v) for v in x]
+            assert np.allclose(derajat[:, j], referensi, atol=1e-12)
+
+# Test 15: Skor tersimpan per id_jalur; edit admin hanya menghitung ulang jalur yang berubah
+def test_skor_jalur_segarkan_parsial(monkeypatch, tmp_path, buat_katalog, katalog_sintetis):
+    monkeypatch.setattr(fuzzy_engine, 'DIREKTORI_CACHE', str(tmp_path))
+    katalog = buat_katalog(n=60)
+
+    def ambil_dari_db(id_jalur=None, id_gunung=None, **_):
+        if id_jalur is None and id_gunung is None:
+            return katalog.copy()
+        pilih = katalog['id_jalur'].isin(id_jalur or []) | katalog['id_gunung'].isin(id_gunung or [])
+        return katalog[pilih].copy()
+
+    jumlah_dihitung = []
+    hitung_asli = fuzzy_engine.hitung_skor_fuzzy
+    def hitung_tercatat(df_jalur, engine=None, paralel=None):
+        jumlah_dihitung.append(len(df_jalur))
+        return hitung_asli(df_jalur, engine, paralel)
+    katalog_sintetis(katalog, ambil=ambil_dari_db)
+    monkeypatch.setattr(fuzzy_engine, 'hitung_skor_fuzzy', hitung_tercatat)
+
+    worker = fuzzy_engine_worker.WorkerFuzzy(ttl_data=0)
+    worker.muat_data()
+    assert jumlah_dihitung == [60]
+    # Skor dimuat dari disk oleh proses lain tanpa inferensi ulang
+    assert len(fuzzy_engine.SkorJalur(worker.engine).id_jalur) == 60
+
+    # Admin mengubah satu jalur dan menghapus jalur lain
+    katalog.loc[katalog['id_jalur'] == 5, 'keamanan_skala'] = 10
+    katalog.loc[katalog['id_jalur'] == 5, 'kesulitan_skala'] = 1
+    katalog = katalog[katalog['id_jalur'] != 9].reset_index(drop=True)
+    worker.tangani({'op': 'segarkan', 'id_jalur': [5, 9]})
+    assert jumlah_dihitung == [60, 1]
+
+    for preferensi in (None, {'max_kesulitan_skala': 6}):
+        hasil = worker.tangani({'preferensi': preferensi})
+        assert hasil['metadata'].pop('cache')['status'] == 'miss'
+        acuan = fuzzy_engine.bangun_hasil_akhir(
+            *proses_rekomendasi(katalog.copy(), preferensi, worker.engine), preferensi, worker.engine)
+        assert hasil == acuan
+
+# Test 16: Filter preferensi dikompilasi menjadi satu mask; alias lama dan kunci asing
+def test_filter_preferensi_satu_mask(capsys, buat_katalog):
+    df = buat_katalog(n=80)
+    preferensi = {
+        'max_kesulitan_skala': 6,
+        'min_keindahan_pemandangan': 3,
+        'max_estimasi_waktu_jam': 24,
+        'kunci_asing': 1,
+    }
+    _, jalur = proses_rekomendasi(df.copy(), preferensi)
+    harapan = df[(df['kesulitan_skala'] <= 6) & (df['keindahan_pemandangan_skala'] >= 3)
+                 & (df['estimasi_waktu_jam'] <= 24)]
+    assert sorted(jalur['id_jalur']) == sorted(harapan['id_jalur'])
+
+    # Kunci utama menang atas alias; kunci asing hanya dilaporkan sekali
+    filter_aktif = fuzzy_engine.kompilasi_filter(
+        {'min_keindahan_pemandangan_skala': 7, 'min_keindahan_pemandangan': 2, 'kunci_asing': 1})
+    assert [(f[0], f[3]) for f in filter_aktif] == [('min_keindahan_pemandangan_skala', 7)]
+    assert capsys.readouterr().err.count('kunci_asing') == 1
+
+# Test 17: Bitmap indeks sekunder menghasilkan mask yang sama dengan pemindaian kolom
+def test_indeks_jalur_sama_dengan_pemindaian(buat_katalog):
+    df = buat_katalog(n=500, n_gunung=30, seed=4)
+    df.loc[::7, 'estimasi_waktu_jam'] = np.nan
+    df.loc[::5, 'estimasi_waktu_jam'] += 0.5
+    # Ketinggian dengan ratusan nilai berbeda memakai indeks rentang, bukan bitmap per nilai
+    df['ketinggian_puncak_mdpl'] = np.random.default_rng(5).uniform(500, 5500, len(df)).round(1)
+    indeks = fuzzy_engine.IndeksJalur(df)
+    assert 'kesulitan_skala' in indeks and 'estimasi_waktu_jam' in indeks
+    rng = np.random.default_rng(11)
+    kunci = list(fuzzy_engine.SPEK_FILTER)
+    for _ in range(200):
+        preferensi = {k: float(rng.choice([-1, 0, 3, 4.5, 7, 10, 11, 12.5, 30, 2500, 3721.4, 6000]))
+                      for k in rng.choice(kunci, rng.integers(1, 6), replace=False)}
+        filter_aktif = fuzzy_engine.kompilasi_filter(preferensi)
+        mask_indeks, _ = fuzzy_engine.mask_filter(df, filter_aktif, indeks)
+        mask_pindai, _ = fuzzy_engine.mask_filter(df, filter_aktif)
+        assert np.array_equal(mask_indeks, mask_pindai), preferensi
+
+# Test 18: top_k/offset mengirim potongan peringkat penuh, metadata tetap atas seluruh hasil
+def test_top_k_offset_potongan_peringkat(buat_katalog):
+    df = buat_katalog(n=120, n_gunung=25, seed=2)
+    for filter_ in ({}, {'min_keamanan_skala': 3}):
+        penuh = fuzzy_engine.bangun_hasil_akhir(*proses_rekomendasi(df.copy(), filter_ or None), filter_ or None)
+        for top_k, offset in ((3, 0), (5, 4), (1000, 0), (2, 500)):
+            preferensi = {**filter_, 'top_k': top_k, 'offset': offset}
+            hasil = fuzzy_engine.bangun_hasil_akhir(*proses_rekomendasi(df.copy(), preferensi), preferensi)
+            for tabel in ('rekomendasi_gunung', 'rekomendasi_jalur'):
+                assert hasil[tabel] == penuh[tabel][offset:offset + top_k]
+            for kunci in ('total_gunung', 'total_jalur', 'statistik_skor', 'distribusi_kategori'):
+                assert hasil['metadata'][kunci] == penuh['metadata'][kunci]
+            assert hasil['metadata']['paginasi']['jalur_dikirim'] == len(hasil['rekomendasi_jalur'])
+
+    # Skor seri: urutan stabil sama dengan pengurutan penuh
+    skor = np.random.default_rng(0).integers(0, 5, 200).astype(float)
+    penuh = np.argsort(-skor, kind='stable')
+    for top_k, offset in ((1, 0), (7, 3), (50, 10)):
+        assert list(fuzzy_engine.peringkat_teratas(skor, top_k, offset)) == list(penuh[offset:offset + top_k])
+
+# Test 19: Serialisasi ringkas setara dengan to_json (records) dan mendukung tata letak kolom
+def test_serialisasi_ringkas(buat_katalog):
+    _, jalur = proses_rekomendasi(buat_katalog())
+    jalur = jalur.copy()
+    jalur.loc[jalur.index[0], 'estimasi_waktu_jam'] = np.nan
+    jalur.loc[jalur.index[1], 'deskripsi_jalur'] = None
+    records = fuzzy_engine.tabel_json(jalur)
+    acuan = json.loads(jalur.to_json(orient='records'))
+    assert len(records) == len(acuan)
+    for baris, baris_acuan in zip(records, acuan):
+        assert baris.keys() == baris_acuan.keys()
+        for kunci, nilai in baris.items():
+            if isinstance(nilai, float):
+                assert nilai == pytest.approx(baris_acuan[kunci])
+            else:
+                assert nilai == baris_acuan[kunci]
+    assert records[0]['estimasi_waktu_jam'] is None and records[1]['deskripsi_jalur'] is None
+
+    kolom = fuzzy_engine.tabel_json(jalur, 'kolom')
+    assert list(kolom) == list(jalur.columns)
+    assert kolom['id_jalur'] == [b['id_jalur'] for b in records]
+
+    teks = fuzzy_engine.dumps_ringkas({'a': np.int64(1), 'b': [np.float64(0.5), None]})
+    assert teks == '{"a":1,"b":[0.5,null]}'
+    with pytest.raises(ValueError):
+        fuzzy_engine.dumps_ringkas({'a': float('nan')})
+
+# Test 20: Mode stream mengirim header metadata lalu baris sesuai peringkat, isinya sama dengan respons penuh
+def test_stream_ndjson_sama_dengan_respons_penuh(buat_katalog, katalog_sintetis):
+    df = buat_katalog()
+    prefs = {'max_kesulitan_skala': 7}
+    gunung, jalur = proses_rekomendasi(df.copy(), prefs)
+    penuh = json.loads(fuzzy_engine.dumps_ringkas(fuzzy_engine.bangun_hasil_akhir(gunung, jalur, prefs)))
+    pesan = [json.loads(fuzzy_engine.dumps_ringkas(p))
+             for p in fuzzy_engine.pesan_stream(gunung, jalur, prefs, ukuran_chunk=3)]
+    assert pesan[0] == {'jenis': 'header', 'metadata': penuh['metadata']}
+    assert [p['data'] for p in pesan if p['jenis'] == 'gunung'] == penuh['rekomendasi_gunung']
+    assert [p['data'] for p in pesan if p['jenis'] == 'jalur'] == penuh['rekomendasi_jalur']
+    assert [p['peringkat'] for p in pesan if p['jenis'] == 'jalur'] == list(range(1, len(jalur) + 1))
+    assert pesan[-1] == {'jenis': 'selesai', 'jumlah_baris': {'gunung': len(gunung), 'jalur': len(jalur)}}
+
+    # Lewat worker: semua baris membawa id permintaan, "tabel" membatasi yang dikirim
+    katalog_sintetis(df)
+    masukan = io.StringIO('{"id": 7, "stream": true, "tabel": ["gunung"], "preferensi": {"max_kesulitan_skala": 7}}\n')
+    keluaran = io.StringIO()
+    fuzzy_engine_worker.jalankan_server(masukan, keluaran)
+    respons = [json.loads(baris) for baris in keluaran.getvalue().splitlines()][1:]
+    assert all(r['id'] == 7 for r in respons)
+    assert [r['jenis'] for r in respons] == ['header'] + ['gunung'] * len(gunung) + ['selesai']
+
+# Test 21: Parser COPY biner mengisi kolom NumPy dan menolak field NULL / lebar tidak tetap
+def test_baca_copy_biner():
+    import struct
+    def buat(baris):
+        data = fuzzy_engine_db.SIGNATURE_COPY + struct.pack('>ii', 0, 0)
+        for id_jalur, jam in baris:
+            data += struct.pack('>h', 2) + struct.pack('>iq', 8, id_jalur)
+            data += struct.pack('>i', -1) if jam is None else struct.pack('>id', 8, jam)
+        return data + struct.pack('>h', -1)
+    kolom = [('id_jalur', '>i8'), ('estimasi_waktu_jam', '>f8')]
+    hasil = fuzzy_engine_db.baca_copy_biner(buat([(3, 7.5), (1, 24.0)]), kolom)
+    assert hasil['id_jalur'].tolist() == [3, 1] and hasil['id_jalur'].dtype == np.int64
+    assert hasil['estimasi_waktu_jam'].tolist() == [7.5, 24.0]
+    assert len(fuzzy_engine_db.baca_copy_biner(buat([]), kolom)['id_jalur']) == 0
+    with pytest.raises(ValueError):
+        fuzzy_engine_db.baca_copy_biner(buat([(3, None)]), kolom)
+
+# Katalog kecil untuk Postgres sementara; sebagian kolom NULL agar default COALESCE ikut teruji
+SKEMA_UJI = """
+CREATE TABLE gunung (id_gunung serial PRIMARY KEY, nama_gunung varchar(100) NOT NULL, ketinggian_puncak_mdpl integer,
+    variasi_jalur_skala integer, lokasi_administratif text, deskripsi_singkat text, url_thumbnail text);
+CREATE TABLE jalur_pendakian (id_jalur serial PRIMARY KEY, id_gunung integer REFERENCES gunung (id_gunung),
+    nama_jalur varchar(100), kesulitan_skala integer, keamanan_skala integer, kualitas_fasilitas_skala integer,
+    kualitas_kemah_skala integer, keindahan_pemandangan_skala integer, estimasi_waktu_jam numeric(5, 1),
+    variasi_lanskap_skala integer, perlindungan_angin_kemah_skala integer, ketersediaan_sumber_air_skala integer,
+    jaringan_komunikasi_skala integer, tingkat_insiden_skala integer, status_jalur varchar(20),
+    deskripsi_jalur text, lokasi_pintu_masuk text);
+"""
+
+@pytest.fixture(scope='module')
+def db_sekali_pakai():
+    """Parameter koneksi Postgres sementara (testing.postgresql, lihat requirements-dev.txt) berisi katalog uji; dilewati bila tidak tersedia."""
+    testing_postgresql = pytest.importorskip('testing.postgresql')
+    try:
+        server = testing_postgresql.Postgresql()
+    except (RuntimeError, OSError) as e:  # initdb tidak ada di PATH, dijalankan sebagai root, dsb.
+        pytest.skip(f'Postgres sementara tidak tersedia: {e}')
+    try:
+        parameter = server.dsn()
+        rng = np.random.default_rng(7)
+        conn = psycopg2.connect(**parameter)
+        with conn, conn.cursor() as cur:
+            cur.execute(SKEMA_UJI)
+            for g in range(12):
+                cur.execute("INSERT INTO gunung (nama_gunung, ketinggian_puncak_mdpl, variasi_jalur_skala, "
+                            "lokasi_administratif) VALUES (%s, %s, %s, %s)",
+                            (f'Gunung {g:02d}', None if g % 5 == 0 else int(rng.integers(800, 4000)),
+                             None if g % 4 == 0 else int(rng.integers(0, 11)), f'Provinsi {g % 3}'))
+            for j in range(150):
+                skala = [None if rng.random() < 0.1 else int(v) for v in rng.integers(0, 11, 10)]
+                jam = None if j % 11 == 0 else round(float(rng.uniform(3, 40)), 1)
+                cur.execute("INSERT INTO jalur_pendakian (id_gunung, nama_jalur, kesulitan_skala, keamanan_skala, "
+                            "kualitas_fasilitas_skala, kualitas_kemah_skala, keindahan_pemandangan_skala, "
+                            "estimasi_waktu_jam, variasi_lanskap_skala, perlindungan_angin_kemah_skala, "
+                            "ketersediaan_sumber_air_skala, jaringan_komunikasi_skala, tingkat_insiden_skala, "
+                            "status_jalur) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                            (int(rng.integers(1, 13)), f'Jalur {j:03d}', *skala[:5], jam, *skala[5:],
+                             None if j % 7 == 0 else 'Buka'))
+        conn.close()
+        yield parameter
+    finally:
+        server.stop()
+
+# Test 22: Pool dipakai ulang, koneksi putus diganti otomatis, jalur biner sama dengan query biasa
+# (Postgres sementara, lihat db_sekali_pakai)
+def test_pool_database_dan_ambil_biner(db_sekali_pakai):
+    pool = fuzzy_engine_db.PoolDatabase(minconn=1, maxconn=2, **db_sekali_pakai)
+    try:
+        biasa = fuzzy_engine_db.ambil_data_jalur(biner=False, pool=pool)
+        biner = fuzzy_engine_db.ambil_data_jalur(biner=True, pool=pool)
+        pd.testing.assert_frame_equal(biasa, biner)
+        with pool.koneksi() as conn:
+            assert 'fuzzy_ambil_jalur' in conn.disiapkan
+            conn.close()
+        ulang = fuzzy_engine_db.ambil_data_jalur(id_gunung=biasa['id_gunung'].iloc[:1].tolist(), pool=pool)
+        assert (ulang['id_gunung'] == biasa['id_gunung'].iloc[0]).all()
+    finally:
+        pool.tutup()
+
+# Test 23: Filter yang didorong ke SQL memakai ekspresi COALESCE dan selalu superset dari filter di memori
+def test_kondisi_sql_filter_preferensi():
+    from decimal import Decimal
+    tipe = {'kesulitan_skala': '>i8', 'estimasi_waktu_jam': '>f8'}
+    kondisi = [('kesulitan_skala', '<=', 4.5), ('kesulitan_skala', '>=', 2.2), ('estimasi_waktu_jam', '<=', 7.1),
+               ('kesulitan_skala', '<=', '5'), ('kesulitan_skala', '<=', True), ('estimasi_waktu_jam', '<=', float('nan'))]
+    sql, parameter = fuzzy_engine_db.kompilasi_kondisi_sql(kondisi, tipe)
+    assert sql.count('AND') == 3
+    assert 'COALESCE(j.kesulitan_skala, 5) <= $3::int8' in sql and 'COALESCE(j.estimasi_waktu_jam, 24) <= $5::numeric' in sql
+    assert parameter[:2] == [4, 3]
+    assert Decimal(7.1) < parameter[2] < Decimal('7.1000001')
+
+# Test 24: Data ringkas (tanpa kolom media) + hidrasi per id menghasilkan respons yang sama persis
+def test_hidrasi_media_dua_tahap(buat_katalog):
+    df = buat_katalog()
+    df['deskripsi_jalur'] = [f'jalur {i}' for i in df['id_jalur']]
+    df['url_thumbnail'] = [f'/g{i}.jpg' for i in df['id_gunung']]
+    media = fuzzy_engine.KOLOM_MEDIA_JALUR + fuzzy_engine.KOLOM_MEDIA_GUNUNG
+    diminta = []
+
+    def sumber_media(id_jalur, id_gunung):
+        diminta.append((list(id_jalur), list(id_gunung)))
+        return (df.set_index('id_jalur')[fuzzy_engine.KOLOM_MEDIA_JALUR].loc[id_jalur],
+                df.drop_duplicates('id_gunung').set_index('id_gunung')[fuzzy_engine.KOLOM_MEDIA_GUNUNG].loc[id_gunung])
+
+    for prefs in ({'top_k': 2}, {'max_kesulitan_skala': 6}):
+        penuh = fuzzy_engine.bangun_hasil_akhir(*proses_rekomendasi(df.copy(), prefs), prefs)
+        ringkas = proses_rekomendasi(df.drop(columns=media), prefs, sumber_media=sumber_media)
+        assert fuzzy_engine.dumps_ringkas(fuzzy_engine.bangun_hasil_akhir(*ringkas, prefs)) == fuzzy_engine.dumps_ringkas(penuh)
+    # Dengan top_k hanya jalur yang dikirim yang dihidrasi
+    assert len(diminta[0][0]) == 2
+
+# Test 25: Snapshot kolumnar katalog dibuka ulang dengan nilai/dtype sama dan ditolak bila sidik berubah
+def test_snapshot_katalog_kolumnar(tmp_path, buat_katalog):
+    df = buat_katalog().drop(columns=fuzzy_engine.KOLOM_MEDIA_JALUR + fuzzy_engine.KOLOM_MEDIA_GUNUNG)
+    df.loc[0, 'status_jalur'] = None
+    df.loc[1, 'nama_jalur'] = 'Jalur Ciremai – Linggarjati'
+    snapshot = fuzzy_engine_db.SnapshotKatalog(str(tmp_path))
+    snapshot.simpan(df, 'sidik-1')
+    dibuka = snapshot.muat('sidik-1')
+    pd.testing.assert_frame_equal(dibuka, df, check_dtype=False)
+    kolom_skala = [kolom for kolom in df.columns if kolom.endswith('_skala')]
+    assert (dibuka.dtypes[kolom_skala] == df.dtypes[kolom_skala]).all()
+    # Kolom angka tidak disalin dari mmap (read-only); kondisi memilih baris sebelum materialisasi
+    assert not dibuka['kesulitan_skala'].to_numpy().flags.writeable
+    kondisi = [('kesulitan_skala', '<=', 6), ('estimasi_waktu_jam', '>=', 8), ('keamanan_skala', '>=', 'x')]
+    terfilter = snapshot.muat('sidik-1', kondisi)
+    harapan = df[(df['kesulitan_skala'] <= 6) & (df['estimasi_waktu_jam'] >= 8)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(terfilter, harapan, check_dtype=False)
+    assert snapshot.muat('sidik-2') is None
+    # Versi baru menggantikan yang lama; hanya satu direktori versi tersisa
+    snapshot.simpan(df.iloc[:5], 'sidik-2')
+    assert len(snapshot.muat('sidik-2')) == 5
+    assert len([p for p in tmp_path.iterdir() if p.is_dir()]) == 1
+
+# Test 26: TokoJalur kompak lebih hemat memori, kembali ke DataFrame yang sama, dan hasil rekomendasinya identik
+def test_toko_jalur_kompak(buat_katalog):
+    df = buat_katalog()
+    df.loc[0, 'status_jalur'] = None
+    toko = fuzzy_engine.TokoJalur(df)
+    assert toko['kesulitan_skala'].dtype == df['kesulitan_skala'].dtype
+    assert toko._kolom['kesulitan_skala'].dtype == np.uint8
+    assert toko.nbytes < df.memory_usage(deep=True).sum()
+    pd.testing.assert_frame_equal(toko.ke_dataframe(), df)
+    pd.testing.assert_frame_equal(toko.ke_dataframe(np.arange(len(df)) % 2 == 0),
+                                  df.iloc[::2].reset_index(drop=True))
+    for prefs in ({}, {'max_kesulitan_skala': 6, 'top_k': 3}):
+        dari_df = fuzzy_engine.bangun_hasil_akhir(*proses_rekomendasi(df.copy(), prefs), prefs)
+        dari_toko = fuzzy_engine.bangun_hasil_akhir(*proses_rekomendasi(toko, prefs), prefs)
+        assert fuzzy_engine.dumps_ringkas(dari_toko) == fuzzy_engine.dumps_ringkas(dari_df)
+
+# Test 27: Penilaian paralel per chunk menghasilkan skor dan urutan yang sama dengan serial
+def test_pool_skor_paralel_identik(buat_katalog):
+    df = buat_katalog()
+    serial = fuzzy_engine.hitung_skor_jalur(df)
+    with fuzzy_engine.PoolSkor(pekerja=2, ukuran_chunk=3, minimum=4) as paralel:
+        assert not paralel.layak(3)
+        np.testing.assert_array_equal(fuzzy_engine.hitung_skor_jalur(df, paralel=paralel), serial)
+        hasil = proses_rekomendasi(df.copy(), {'top_k': 4}, paralel=paralel)
+    acuan = proses_rekomendasi(df.copy(), {'top_k': 4})
+    for a, b in zip(hasil, acuan):
+        pd.testing.assert_frame_equal(a, b)
+
+# Test 28: Dataset bersama diterbitkan sekali, dibuka lewat mmap oleh proses lain, dan diganti atomik per sidik
+def test_dataset_bersama_mmap(tmp_path, buat_katalog):
+    df = buat_katalog()
+    df['id_jalur'] = np.arange(len(df))[::-1] + 1
+    engine = fuzzy_engine.dapatkan_engine()
+    dibangun = []
+
+    def bangun():
+        dibangun.append(1)
+        fuzzy = fuzzy_engine.hitung_skor_fuzzy(df, engine)
+        skor = fuzzy_engine.gabung_skor(fuzzy, df)
+        return df, fuzzy, skor, fuzzy_engine.kategorikan_vektor(skor), None
+
+    penerbit = fuzzy_engine_bersama.DatasetBersama(str(tmp_path), engine)
+    manifest, _, _, _ = penerbit.siapkan('sidik-1', bangun)
+    _, toko, skor, agregat = fuzzy_engine_bersama.DatasetBersama(str(tmp_path), engine).siapkan('sidik-1', bangun)
+    assert len(dibangun) == 1 and agregat is None
+    assert isinstance(toko._kolom['kesulitan_skala'], np.memmap)
+    pd.testing.assert_frame_equal(toko.ke_dataframe(), df.reset_index(drop=True))
+    prefs = {'max_kesulitan_skala': 6}
+    dari_terbit = proses_rekomendasi(toko, prefs, engine, skor_jalur=skor)
+    for a, b in zip(dari_terbit, proses_rekomendasi(df.copy(), prefs, engine)):
+        assert fuzzy_engine.tabel_json(a) == fuzzy_engine.tabel_json(b)
+    # Sidik baru -> versi baru aktif, versi lama dipertahankan satu generasi
+    penerbit.siapkan('sidik-2', bangun)
+    penerbit.siapkan('sidik-3', bangun)
+    assert penerbit.manifest()['versi'] != manifest['versi']
+    assert len([p for p in tmp_path.iterdir() if p.is_dir()]) == 2
+
+# Test 29: Agregasi per gunung tervektorisasi (reduceat) mengikuti semantik groupby: jalur pertama
+# yang mencapai skor tertinggi, nilai non-kosong pertama, urutan kunci, dan batas kategori
+def test_agregasi_gunung_tervektorisasi():
+    df = pd.DataFrame({
+        'id_jalur': [1, 2, 3, 4, 5], 'id_gunung': [20, 10, 20, 10, 20],
+        'nama_gunung': ['Sindoro', 'Merapi', 'Sindoro', 'Merapi', 'Sindoro'],
+        'nama_jalur': ['A', 'B', 'C', 'D', 'E'],
+        'kesulitan_skala': [3, 7, 5, 2, 9], 'keamanan_skala': [6, 8, 7, 5, 4],
+        'ketinggian_puncak_mdpl': [3153, 2930, 3153, 2930, 3153],
+        'skor_rekomendasi': [64.999, 80.0, 70.5, 35.0, 70.5],
+        'url_thumbnail': [None, '/b.jpg', '/c.jpg', None, '/e.jpg'],
+    })
+    df_gunung = fuzzy_engine.agregasi_gunung(df)
+    assert df_gunung['id_gunung'].tolist() == [10, 20]
+    assert df_gunung['jalur_terbaik'].tolist() == ['B', 'C']
+    assert df_gunung['jumlah_jalur'].tolist() == [2, 3]
+    assert df_gunung['kesulitan_terendah'].tolist() == [2, 3] and df_gunung['kesulitan_tertinggi'].tolist() == [7, 9]
+    assert df_gunung['url_thumbnail'].tolist() == ['/b.jpg', '/c.jpg']
+    assert df_gunung['skor_rata_rata'].tolist() == df.groupby('id_gunung')['skor_rekomendasi'].mean().tolist()
+    assert df_gunung['kategori_rekomendasi'].tolist() == ['Sangat Direkomendasikan', 'Direkomendasikan']
+    skor = np.array([np.nan, -1, 0, 34.99, 35, 49.99, 50, 64.99, 65, 79.99, 80, 100])
+    assert fuzzy_engine.kategorikan_vektor(skor).tolist() == [fuzzy_engine.kategorikan_rekomendasi(v) for v in skor]
+    assert fuzzy_engine.kategorikan_rekomendasi(np.nan) == 'Tidak Direkomendasikan'
+
+# Test 30: Bobot kriteria dan rasio fuzzy per permintaan memakai skor fuzzy tersimpan (tanpa inferensi ulang)
+def test_bobot_per_permintaan(monkeypatch, tmp_path, buat_katalog):
+    df = buat_katalog(n=40)
+    skor_jalur = fuzzy_engine.SkorJalur(direktori_cache=str(tmp_path))
+    bawaan = proses_rekomendasi(df.copy(), {}, skor_jalur=skor_jalur)[1]
+    fuzzy = fuzzy_engine.hitung_skor_fuzzy(df)
+
+    dipanggil = []
+    monkeypatch.setattr(fuzzy_engine, 'hitung_skor_fuzzy', lambda *a, **k: dipanggil.append(1))
+    prefs = {'bobot_kriteria': {'keamanan_skala': 1, 'kesulitan_skala': 0}, 'rasio_fuzzy': 0.5}
+    gunung, jalur = proses_rekomendasi(df.copy(), prefs, skor_jalur=skor_jalur)
+    assert dipanggil == []
+    vektor = np.array([fuzzy_engine.BOBOT_KRITERIA[k] for k in fuzzy_engine.KRITERIA])
+    vektor[fuzzy_engine.KRITERIA.index('keamanan_skala')] = 1
+    vektor[fuzzy_engine.KRITERIA.index('kesulitan_skala')] = 0
+    X = fuzzy_engine.normalisasi_kriteria(df[fuzzy_engine.KRITERIA].to_numpy(dtype=float))
+    harapan = pd.Series(0.5 * fuzzy + 0.5 * (X @ (vektor / vektor.sum())), index=df['id_jalur'])
+    np.testing.assert_allclose(jalur.set_index('id_jalur')['skor_rekomendasi'], harapan.loc[jalur['id_jalur']])
+    assert not np.allclose(jalur.set_index('id_jalur')['skor_rekomendasi'],
+                           bawaan.set_index('id_jalur').loc[jalur['id_jalur'], 'skor_rekomendasi'])
+    metadata = fuzzy_engine.bangun_metadata(gunung, jalur, prefs)
+    assert metadata['bobot']['rasio_fuzzy'] == 0.5 and metadata['bobot']['bobot_kriteria']['kesulitan_skala'] == 0
+    # Rasio 1 berarti skor akhir = skor fuzzy; kunci bobot tidak dianggap filter
+    _, jalur = proses_rekomendasi(df.copy(), {'rasio_fuzzy': 1}, skor_jalur=skor_jalur)
+    np.testing.assert_array_equal(jalur.set_index('id_jalur')['skor_rekomendasi'],
+                                  pd.Series(fuzzy, index=df['id_jalur']).loc[jalur['id_jalur']])
+    assert fuzzy_engine.kompilasi_filter(prefs) == []
+
+
+# Test 31: Batch banyak profil menilai katalog sekali dan hasil setiap profil sama dengan permintaan tunggal
+def test_batch_sama_dengan_permintaan_tunggal(monkeypatch, buat_katalog):
+    df = buat_katalog(n=60)
+    daftar = [
+        {'max_kesulitan_skala': 6, 'min_keindahan_pemandangan': 3},
+        {'max_kesulitan_skala': 6, 'top_k': 2},
+        {'bobot_kriteria': {'keamanan_skala': 2}, 'rasio_fuzzy': 0.4},
+        {'max_kesulitan_skala': -1},
+        None,
+    ]
+    tunggal = [proses_rekomendasi(df.copy(), p) for p in daftar]
+
+    hitung_asli = fuzzy_engine.hitung_skor_fuzzy
+    dipanggil = []
+    def hitung_skor_fuzzy(*args, **kwargs):
+        dipanggil.append(1)
+        return hitung_asli(*args, **kwargs)
+    monkeypatch.setattr(fuzzy_engine, 'hitung_skor_fuzzy', hitung_skor_fuzzy)
+    batch = fuzzy_engine.proses_rekomendasi_batch(df.copy(), daftar)
+    assert len(dipanggil) == 1 and len(batch) == len(daftar)
+    for (g1, j1), (g2, j2) in zip(tunggal, batch):
+        pd.testing.assert_frame_equal(g1, g2)
+        pd.testing.assert_frame_equal(j1, j2)
+        assert g1.attrs == g2.attrs
+    assert batch[3][0].empty and batch[3][1].empty
+
+
+# Test 32: Cache hasil memakai preferensi kanonik (alias, tipe angka, kunci asing), LRU + TTL,
+# dikosongkan saat katalog berubah, dan melaporkan hit/miss di metadata
+def test_cache_hasil_preferensi_kanonik(monkeypatch, buat_katalog, katalog_sintetis):
+    kunci = fuzzy_engine_cache.kunci_preferensi
+    assert kunci({'min_keindahan_pemandangan': 7, 'max_kesulitan_skala': 4}) == \
+        kunci({'max_kesulitan_skala': 4.0, 'min_keindahan_pemandangan_skala': np.int64(7), 'kunci_asing': 1})
+    assert kunci({'min_keindahan_pemandangan_skala': 7, 'min_keindahan_pemandangan': 2}) == \
+        kunci({'min_keindahan_pemandangan_skala': 7})
+    assert kunci(None) == kunci({}) != kunci({'top_k': 5}) != kunci({'max_kesulitan_skala': 5})
+
+    cache = fuzzy_engine_cache.CacheHasil(maks=2, ttl=0)
+    for k in 'abc':
+        cache.simpan(k, k)
+    assert cache.ambil('a') is None and cache.ambil('c') == 'c' and len(cache) == 2
+    cache = fuzzy_engine_cache.CacheHasil(maks=2, ttl=10)
+    cache.simpan('a', 1)
+    waktu = time.monotonic()
+    monkeypatch.setattr(fuzzy_engine_cache.time, 'monotonic', lambda: waktu + 11)
+    assert cache.ambil('a') is None and len(cache) == 0
+    monkeypatch.undo()
+
+    df = buat_katalog(n=40)
+    katalog_sintetis(df, ambil=lambda id_jalur=None, **_: df[df['id_jalur'].isin(id_jalur)] if id_jalur else df)
+    worker = fuzzy_engine_worker.WorkerFuzzy(ttl_data=0)
+    worker.cache = fuzzy_engine_cache.CacheHasil(maks=8, ttl=0)
+    worker.muat_data()
+    dihitung = []
+    rekomendasi_asli = worker.rekomendasi
+    monkeypatch.setattr(worker, 'rekomendasi', lambda p: dihitung.append(p) or rekomendasi_asli(p))
+    pertama = worker.tangani({'preferensi': {'max_kesulitan_skala': 6}})
+    kedua = worker.tangani({'preferensi': {'max_kesulitan_skala': 6.0, 'kunci_asing': 'x'}})
+    assert len(dihitung) == 1
+    assert pertama['metadata'].pop('cache') == {'status': 'miss', 'hit': 0, 'miss': 1, 'ukuran': 1}
+    assert kedua['metadata'].pop('cache') == {'status': 'hit', 'hit': 1, 'miss': 1, 'ukuran': 1}
+    assert kedua['rekomendasi_jalur'] == pertama['rekomendasi_jalur']
+    assert kedua['metadata']['preferensi_detail'] == {'max_kesulitan_skala': 6.0, 'kunci_asing': 'x'}
+
+    # Perubahan katalog menaikkan versi data sehingga hasil lama tidak dipakai lagi
+    worker.segarkan([int(df['id_jalur'].iloc[0])])
+    assert len(worker.cache) == 0
+    ketiga = worker.tangani({'preferensi': {'max_kesulitan_skala': 6}})
+    assert ketiga['metadata']['cache']['status'] == 'miss' and len(dihitung) == 2
+
+
+# Test 33: Cache dihangatkan dari kelompok filter search_history terbanyak (setelah disamakan),
+# dihitung dalam satu batch, dengan laporan cakupan; diulang setelah katalog berubah
+def test_hangatkan_cache_dari_riwayat(monkeypatch, buat_katalog, katalog_sintetis):
+    df = buat_katalog(n=40)
+    katalog_sintetis(df, ambil=lambda id_jalur=None, **_: df[df['id_jalur'].isin(id_jalur)] if id_jalur else df)
+    riwayat = [({'max_kesulitan_skala': 4, 'min_keamanan_skala': 6}, 30),
+               ({'max_kesulitan_skala': 7}, 25),
+               ({'min_keamanan_skala': 6.0, 'max_kesulitan_skala': 4.0}, 20),
+               ({'min_keindahan_pemandangan': 8}, 5)]
+    monkeypatch.setattr(fuzzy_engine_worker, 'ambil_filter_populer', lambda hari: (riwayat, 100))
+    worker = fuzzy_engine_worker.WorkerFuzzy(ttl_data=0)
+    worker.cache = fuzzy_engine_cache.CacheHasil(maks=8, ttl=0)
+    worker.hangat_top_n = 2
+    worker.muat_data()
+    assert worker.perlu_hangat
+    batch = []
+    rekomendasi_batch_asli = worker.rekomendasi_batch
+    monkeypatch.setattr(worker, 'rekomendasi_batch', lambda d: batch.append(len(d)) or rekomendasi_batch_asli(d))
+    laporan = worker.hangatkan()
+    assert batch == [2] and not worker.perlu_hangat
+    assert {k: laporan[k] for k in ('profil', 'pencarian_tercakup', 'total_pencarian', 'cakupan')} == \
+        {'profil': 2, 'pencarian_tercakup': 75, 'total_pencarian': 100, 'cakupan': 0.75}
+
+    hasil = worker.tangani({'preferensi': {'max_kesulitan_skala': 4, 'min_keamanan_skala': 6}})
+    assert hasil['metadata']['cache']['status'] == 'hit'
+    acuan = fuzzy_engine.bangun_hasil_akhir(*proses_rekomendasi(df.copy(), {'max_kesulitan_skala': 4, 'min_keamanan_skala': 6}),
+                                            {'max_kesulitan_skala': 4, 'min_keamanan_skala': 6}, worker.engine)
+    hasil['metadata'].pop('cache')
+    assert hasil == acuan
+
+    # Katalog berubah: cache kosong dan perlu dihangatkan lagi; kegagalan riwayat tidak fatal
+    worker.segarkan([int(df['id_jalur'].iloc[0])])
+    assert worker.perlu_hangat and len(worker.cache) == 0
+    monkeypatch.setattr(fuzzy_engine_worker, 'ambil_filter_populer', lambda hari: 1 / 0)
+    assert worker.hangatkan() is None and not worker.perlu_hangat
+
+
+# Test 34: Permintaan identik yang datang selagi komputasinya berjalan digabung (single-flight):
+# satu komputasi, setiap permintaan mendapat responsnya sendiri beserta waktu tunggu
+def test_penggabungan_permintaan_identik(monkeypatch, katalog_sintetis):
+    katalog_sintetis(n=40)
+    monkeypatch.setattr(fuzzy_engine_worker, 'ambil_filter_populer', lambda hari: ([], 0))
+    gerbang = threading.Event()
+    dihitung = []
+    rekomendasi_asli = fuzzy_engine_worker.WorkerFuzzy.rekomendasi
+    def rekomendasi_lambat(self, preferensi_pengguna):
+        dihitung.append(preferensi_pengguna)
+        gerbang.wait(5)
+        return rekomendasi_asli(self, preferensi_pengguna)
+    monkeypatch.setattr(fuzzy_engine_worker.WorkerFuzzy, 'rekomendasi', rekomendasi_lambat)
+
+    def masukan():
+        yield '{"id": 1, "preferensi": {"max_kesulitan_skala": 6}}\n'
+        yield '{"id": 2, "preferensi": {"max_kesulitan_skala": 6.0}}\n'
+        yield '{"id": 3, "stream": true, "preferensi": {"max_kesulitan_skala": 6, "kunci_asing": 1}}\n'
+        yield '{"id": 4, "preferensi": {"max_kesulitan_skala": 3}}\n'
+        gerbang.set()
+        yield '{"id": 5, "op": "statistik"}\n'
+    keluaran = io.StringIO()
+    fuzzy_engine_worker.jalankan_server(masukan(), keluaran)
+    respons = [json.loads(baris) for baris in keluaran.getvalue().splitlines()][1:]
+    assert len(dihitung) == 2
+    per_id = {}
+    for r in respons:
+        per_id.setdefault(r['id'], r)
+    gabung = {i: per_id[i]['metadata']['penggabungan'] for i in (1, 2, 4)}
+    assert [gabung[i]['digabung'] for i in (1, 2, 4)] == [False, True, False]
+    assert per_id[3]['jenis'] == 'header' and per_id[3]['metadata']['penggabungan']['digabung']
+    assert all(g['tunggu_ms'] >= 0 for g in gabung.values())
+    assert per_id[2]['rekomendasi_jalur'] == per_id[1]['rekomendasi_jalur']
+    assert per_id[2]['metadata']['preferensi_detail'] == {'max_kesulitan_skala': 6.0}
+    statistik = per_id[5]['penggabungan']
+    assert statistik['komputasi'] == 2 and statistik['permintaan_digabung'] == 2 and statistik['berjalan'] == 0
+
+
+# Test 35: Rekomendasi bertenggat: skor tersimpan dulu, sisanya dinilai menurut batas atas skor
+# sampai top_k terbukti final; tenggat habis menghasilkan upaya terbaik dari skor yang ada
+def test_rekomendasi_bertenggat(tmp_path, buat_katalog, katalog_sintetis):
+    df = buat_katalog(n=200, n_gunung=20)
+    prefs = {'top_k': 3, 'rasio_fuzzy': 0}
+    acuan_gunung, acuan_jalur = proses_rekomendasi(df.copy(), prefs)
+    skor_jalur = fuzzy_engine.SkorJalur(direktori_cache=str(tmp_path / 'sebagian'))
+    skor_jalur.perbarui(df.iloc[::4])
+    gunung, jalur, info = fuzzy_engine.proses_rekomendasi_tenggat(
+        df, prefs, time.monotonic() + 60, skor_jalur=skor_jalur, ukuran_chunk=8)
+    assert info['status'] == 'teratas_pasti' and 0 < info['jalur_dinilai_sekarang'] < 150
+    assert list(jalur['id_jalur']) == list(acuan_jalur['id_jalur'])
+    np.testing.assert_array_equal(jalur['skor_rekomendasi'], acuan_jalur['skor_rekomendasi'])
+    assert list(gunung['id_gunung']) == list(acuan_gunung['id_gunung'])
+    np.testing.assert_array_equal(gunung['skor_tertinggi'], acuan_gunung['skor_tertinggi'])
+    # Skor yang sempat dihitung ikut disimpan
+    assert len(skor_jalur.id_jalur) == 50 + info['jalur_dinilai_sekarang']
+
+    # Tenggat sudah habis: hanya jalur dengan skor tersimpan yang dipakai
+    skor_lama = fuzzy_engine.SkorJalur(direktori_cache=str(tmp_path / 'lama'))
+    skor_lama.perbarui(df.iloc[:60])
+    _, jalur, info = fuzzy_engine.proses_rekomendasi_tenggat(
+        df, {'max_kesulitan_skala': 8}, time.monotonic() - 1, skor_jalur=skor_lama)
+    assert info['status'] == 'upaya_terbaik' and info['jalur_dinilai_sekarang'] == 0
+    assert set(jalur['id_jalur']) <= set(df['id_jalur'].iloc[:60])
+
+    # Semua skor tersimpan: lengkap dan sama persis dengan proses_rekomendasi
+    skor_penuh = fuzzy_engine.SkorJalur(direktori_cache=str(tmp_path / 'penuh'))
+    skor_penuh.perbarui(df)
+    gunung, jalur, info = fuzzy_engine.proses_rekomendasi_tenggat(
+        df, {'max_kesulitan_skala': 8}, time.monotonic() + 60, skor_jalur=skor_penuh)
+    acuan_gunung, acuan_jalur = proses_rekomendasi(df.copy(), {'max_kesulitan_skala': 8})
+    assert info['status'] == 'lengkap' and info['sumber'] == 'skor_tersimpan'
+    pd.testing.assert_frame_equal(gunung, acuan_gunung)
+    pd.testing.assert_frame_equal(jalur, acuan_jalur)
+
+    # Lewat worker: metadata "tenggat", permintaan berikutnya dijawab dari cache
+    katalog_sintetis(df)
+    worker = fuzzy_engine_worker.WorkerFuzzy(ttl_data=0)
+    worker.muat_data()
+    permintaan = {'preferensi': {'max_kesulitan_skala': 6, 'top_k': 3}, 'batas_waktu_ms': 2000}
+    pertama, kedua = worker.tangani(permintaan), worker.tangani(permintaan)
+    assert pertama['metadata']['tenggat']['status'] == 'lengkap'
+    assert pertama['metadata']['tenggat']['sumber'] == 'skor_tersimpan'
+    assert kedua['metadata']['tenggat']['sumber'] == 'cache'
+    assert pertama['rekomendasi_gunung'] == worker.tangani({'preferensi': permintaan['preferensi']})['rekomendasi_gunung']
+
+
+# Test 36: Sesi penyempitan: filter yang hanya diperketat dijawab dari kandidat sesi tanpa
+# menilai ulang (hasil sama dengan query penuh); filter yang dilonggarkan menjalankan query penuh
+def test_sesi_penyempitan_kandidat(monkeypatch, tmp_path, buat_katalog, katalog_sintetis):
+    df = buat_katalog(n=300, n_gunung=25)
+    toko = fuzzy_engine.TokoJalur(df)
+    skor_jalur = fuzzy_engine.SkorJalur(direktori_cache=str(tmp_path))
+    skor_jalur.perbarui(df)
+    longgar = {'max_estimasi_waktu_jam': 36, 'top_k': 5}
+    ketat = {'max_estimasi_waktu_jam': 18, 'min_keamanan_skala': 4, 'top_k': 5, 'offset': 2}
+
+    gunung, jalur, kandidat = fuzzy_engine.proses_rekomendasi_kandidat(toko, longgar, skor_jalur=skor_jalur)
+    acuan_gunung, acuan_jalur = proses_rekomendasi(toko, longgar, skor_jalur=skor_jalur)
+    pd.testing.assert_frame_equal(gunung, acuan_gunung)
+    pd.testing.assert_frame_equal(jalur, acuan_jalur)
+    assert len(kandidat[0]) == int((df['estimasi_waktu_jam'] <= 36).sum())
+
+    # Penyempitan tidak memanggil kernel skor sama sekali
+    def tanpa_penilaian(*_, **__):
+        raise AssertionError("kandidat sesi tidak boleh dinilai ulang")
+    with monkeypatch.context() as m:
+        m.setattr(fuzzy_engine, 'hitung_skor_fuzzy', tanpa_penilaian)
+        gunung, jalur, _ = fuzzy_engine.proses_rekomendasi_kandidat(toko, ketat, kandidat, skor_jalur=skor_jalur)
+    acuan_gunung, acuan_jalur = proses_rekomendasi(toko, ketat, skor_jalur=skor_jalur)
+    pd.testing.assert_frame_equal(gunung, acuan_gunung)
+    pd.testing.assert_frame_equal(jalur, acuan_jalur)
+
+    lama = fuzzy_engine.filter_kanonik(longgar)
+    assert fuzzy_engine.lebih_ketat(fuzzy_engine.filter_kanonik(ketat), lama)
+    assert not fuzzy_engine.lebih_ketat({'max_estimasi_waktu_jam': 60}, lama)
+    assert not fuzzy_engine.lebih_ketat({'min_keamanan_skala': 4}, lama)
+    assert not fuzzy_engine.lebih_ketat({'max_estimasi_waktu_jam': '18'}, lama)
+
+    # Lewat worker: token dipakai ulang selama sesi berlaku
+    katalog_sintetis(df)
+    worker = fuzzy_engine_worker.WorkerFuzzy(ttl_data=0)
+    worker.muat_data()
+    pertama = worker.tangani({'preferensi': longgar, 'sesi': True})['metadata']['sesi']
+    token = pertama['token']
+    assert pertama['status'] == 'baru' and pertama['kandidat'] == len(kandidat[0])
+    respons = worker.tangani({'preferensi': ketat, 'sesi': token})
+    assert respons['metadata']['sesi']['status'] == 'dipersempit' and respons['metadata']['sesi']['token'] == token
+    assert respons['rekomendasi_jalur'] == worker.tangani({'preferensi': ketat})['rekomendasi_jalur']
+    dilonggarkan = worker.tangani({'preferensi': {'max_estimasi_waktu_jam': 60}, 'sesi': token})['metadata']['sesi']
+    assert dilonggarkan['status'] == 'penuh' and dilonggarkan['token'] == token
+    bobot_lain = {'max_estimasi_waktu_jam': 18, 'rasio_fuzzy': 0}
+    assert worker.tangani({'preferensi': bobot_lain, 'sesi': token})['metadata']['sesi']['status'] == 'penuh'
+    asing = worker.tangani({'preferensi': ketat, 'sesi': 'tidak-ada'})['metadata']['sesi']
+    assert asing['status'] == 'baru' and asing['token'] not in (None, 'tidak-ada')
+    # Katalog berubah: posisi kandidat tidak berlaku lagi
+    worker.muat_data()
+    assert worker.tangani({'preferensi': ketat, 'sesi': token})['metadata']['sesi']['status'] == 'baru'
+
+    # Batas memori: sesi yang paling lama tidak dipakai dibuang, kandidat raksasa tidak disimpan
+    posisi, skor = np.arange(10, dtype=np.int32), np.zeros(10)
+    sesi = fuzzy_engine_cache.SesiPreferensi(maks=10, maks_byte=250, ttl=0)
+    a = sesi.simpan(None, {}, '{}', posisi, skor)
+    b = sesi.simpan(None, {}, '{}', posisi, skor)
+    sesi.ambil(a)
+    c = sesi.simpan(None, {}, '{}', posisi, skor)
+    assert sesi.ambil(b) is None and sesi.ambil(a) is not None and sesi.ambil(c) is not None
+    assert sesi.statistik() == {'sesi': 2, 'byte': 240, 'dibuang': 1}
+    assert sesi.simpan(None, {}, '{}', np.arange(100, dtype=np.int32), np.zeros(100)) is None
+    sesi = fuzzy_engine_cache.SesiPreferensi(ttl=0.01)
+    token = sesi.simpan(None, {}, '{}', posisi, skor)
+    time.sleep(0.02)
+    assert sesi.ambil(token) is None and len(sesi) == 0
+
+
+# Test 37: Baris hasil WHERE yang didorong ke SQL sama dengan filter di memori atas katalog penuh,
+# termasuk baris NULL yang jatuh tepat di nilai default COALESCE (Postgres sementara)
+def test_kondisi_sql_sama_dengan_filter_memori(db_sekali_pakai):
+    pool = fuzzy_engine_db.PoolDatabase(minconn=1, maxconn=1, **db_sekali_pakai)
+    try:
+        katalog = fuzzy_engine_db.ambil_data_jalur(media=False, pool=pool)
+        daftar_preferensi = [
+            {'max_kesulitan_skala': 5, 'min_keamanan_skala': 5},          # default skala 5 ikut lolos
+            {'max_estimasi_waktu_jam': 24, 'max_ketinggian_mdpl': 2000},  # default jam 24 / 2000 mdpl
+            {'min_ketersediaan_air': 4.5, 'max_estimasi_waktu_jam': 12.3},
+            {'min_variasi_jalur_skala': 5, 'min_keindahan_pemandangan': 7, 'max_kesulitan_skala': '6'},
+        ]
+        for prefs in daftar_preferensi:
+            filter_aktif = fuzzy_engine.kompilasi_filter(prefs)
+            kondisi = [(kolom, op, nilai) for _, kolom, op, nilai, _ in filter_aktif]
+            harapan = katalog['id_jalur'][fuzzy_engine.mask_filter(katalog, filter_aktif)[0]].tolist()
+            assert harapan and len(harapan) < len(katalog)
+            for biner in (True, False):
+                didorong = fuzzy_engine_db.ambil_data_jalur(kondisi=kondisi, biner=biner, media=False, pool=pool)
+                # Kondisi integer dan pecahan 1 desimal setara persis, jadi filter di memori tidak membuang apa pun
+                assert didorong['id_jalur'].tolist() == harapan
+                assert fuzzy_engine.mask_filter(didorong, filter_aktif)[0].all()
+    finally:
+        pool.tutup()
+
+
+# Test 38: proses_rekomendasi(None, preferensi) hanya mengambil baris kandidat: WHERE didorong ke SQL
+# tanpa snapshot (mati atau basi), dan snapshot segar difilter sebelum dimaterialisasi (Postgres sementara)
+def test_preferensi_sampai_ke_pengambilan_terfilter(db_sekali_pakai, monkeypatch, tmp_path):
+    pool = fuzzy_engine_db.PoolDatabase(minconn=1, maxconn=1, **db_sekali_pakai)
+    monkeypatch.setattr(fuzzy_engine_db, '_POOL', pool)
+    monkeypatch.setattr(fuzzy_engine, 'DIREKTORI_CACHE', str(tmp_path))
+    prefs = {'max_estimasi_waktu_jam': 20, 'min_keamanan_skala': 4, 'top_k': 5}
+    fuzzy_engine_db.buat_indeks(fuzzy_engine_db.PERINTAH_VERSI_KATALOG, db_sekali_pakai)
+    try:
+        katalog = fuzzy_engine_db.ambil_data_jalur(pool=pool)
+        acuan_gunung, acuan_jalur = proses_rekomendasi(katalog.copy(), prefs)
+        kandidat = int(fuzzy_engine.mask_filter(katalog, fuzzy_engine.kompilasi_filter(prefs))[0].sum())
+
+        diambil = []
+        ambil_asli = fuzzy_engine_db._ambil_data_jalur
+        def ambil_tercatat(conn, *args, **kwargs):
+            df = ambil_asli(conn, *args, **kwargs)
+            diambil.append(len(df))
+            return df
+        monkeypatch.setattr(fuzzy_engine_db, '_ambil_data_jalur', ambil_tercatat)
+        dibuka = []
+        muat_asli = fuzzy_engine_db.SnapshotKatalog.muat
+        def muat_tercatat(self, *args, **kwargs):
+            df = muat_asli(self, *args, **kwargs)
+            dibuka.append(None if df is None else len(df))
+            return df
+        monkeypatch.setattr(fuzzy_engine_db.SnapshotKatalog, 'muat', muat_tercatat)
+
+        def periksa():
+            gunung, jalur = proses_rekomendasi(None, prefs)
+            assert jalur['id_jalur'].tolist() == acuan_jalur['id_jalur'].tolist()
+            np.testing.assert_array_equal(gunung['skor_tertinggi'], acuan_gunung['skor_tertinggi'])
+
+        # Snapshot dimatikan: hanya kandidat yang dikirim database
+        monkeypatch.setenv('FUZZY_SNAPSHOT', '0')
+        periksa()
+        assert diambil == [kandidat] and kandidat < len(katalog)
+        # Snapshot belum ada/basi: tetap didorong ke WHERE, snapshot tidak ditulis dari hasil terfilter
+        monkeypatch.setenv('FUZZY_SNAPSHOT', '1')
+        diambil.clear()
+        periksa()
+        assert diambil == [kandidat] and dibuka == [None]
+        # Setelah pengambilan katalog penuh menulis snapshot, baris kandidat dibaca dari snapshot
+        assert len(get_data_jalur_from_database(media=False)) == len(katalog)
+        diambil.clear()
+        dibuka.clear()
+        periksa()
+        assert diambil == [] and dibuka == [kandidat]
+    finally:
+        pool.tutup()
+
+
+# Test 39: Sidik katalog membaca satu baris penghitung versi yang dinaikkan trigger setiap
+# perubahan jalur/gunung; tanpa penghitung sidik gagal dan snapshot tidak dipakai (Postgres sementara)
+def test_sidik_katalog_penghitung_versi(db_sekali_pakai, tmp_path):
+    pool = fuzzy_engine_db.PoolDatabase(minconn=1, maxconn=1, **db_sekali_pakai)
+    try:
+        conn = psycopg2.connect(**db_sekali_pakai)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS fuzzy_versi_katalog CASCADE")
+        with pytest.raises(fuzzy_engine_db.VersiKatalogBelumDipasang, match='--pasang-versi-katalog'):
+            pool.jalankan(fuzzy_engine_db.sidik_katalog)
+        katalog = fuzzy_engine_db.ambil_katalog_ringkas(str(tmp_path), pool=pool)
+        assert len(katalog) == 150 and not list(tmp_path.iterdir())
+
+        fuzzy_engine_db.buat_indeks(fuzzy_engine_db.PERINTAH_VERSI_KATALOG, db_sekali_pakai)
+        fuzzy_engine_db.buat_indeks(fuzzy_engine_db.PERINTAH_VERSI_KATALOG, db_sekali_pakai)  # idempoten
+        awal = pool.jalankan(fuzzy_engine_db.sidik_katalog)
+        assert awal == 'versi-0' and pool.jalankan(fuzzy_engine_db.sidik_katalog) == awal
+        with conn.cursor() as cur:
+            cur.execute("UPDATE gunung SET nama_gunung = nama_gunung WHERE id_gunung = 1")
+        setelah_gunung = pool.jalankan(fuzzy_engine_db.sidik_katalog)
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM jalur_pendakian WHERE id_jalur = -1")
+        assert len({awal, setelah_gunung, pool.jalankan(fuzzy_engine_db.sidik_katalog)}) == 3
+        conn.close()
+    finally:
+        pool.tutup()
+
+# Test 40: proses_rekomendasi (langsung, via SkorJalur, dan versi tenggat) tidak menulis kolom
+# skor ke DataFrame pemanggil, baik tanpa preferensi maupun saat semua jalur lolos filter
+def test_proses_rekomendasi_tidak_mengubah_input(buat_katalog):
+    df = buat_katalog(n=60)
+    asli = df.copy()
+    engine = fuzzy_engine.dapatkan_engine()
+    skor_jalur = fuzzy_engine.SkorJalur(engine)
+    for prefs in (None, {}, {'max_kesulitan': 10, 'top_k': 5}):
+        proses_rekomendasi(df, prefs, engine=engine)
+        proses_rekomendasi(df, prefs, engine=engine, skor_jalur=skor_jalur)
+        fuzzy_engine.proses_rekomendasi_tenggat(df, prefs, time.monotonic() + 60, engine=engine)
+        assert list(df.columns) == list(asli.columns)
+        pd.testing.assert_frame_equal(df, asli)
+
+# Test 41: SystemExit dari handler SIGTERM di tengah loop baca tetap menutup eksekutor dan
+# pool proses; permintaan yang sudah diterima dijawab lebih dulu
+def test_server_sigterm_tetap_membersihkan(monkeypatch, katalog_sintetis):
+    katalog_sintetis()
+    monkeypatch.setenv('FUZZY_PARALEL_PEKERJA', '2')
+    ditutup = []
+    monkeypatch.setattr(fuzzy_engine.PoolSkor, 'tutup', lambda self: ditutup.append(self))
+
+    def masukan():
+        yield '{"id": 1, "preferensi": {"max_kesulitan_skala": 5}}\n'
+        raise SystemExit(0)
+    keluaran = io.StringIO()
+    with pytest.raises(SystemExit):
+        fuzzy_engine_worker.jalankan_server(masukan(), keluaran)
+    respons = [json.loads(baris) for baris in keluaran.getvalue().splitlines()]
+    assert [r.get('id') for r in respons] == [None, 1]
+    assert len(ditutup) == 1
+
+# Test 42: Permintaan yang tiba setelah perubahan katalog dicatat tidak menumpang komputasi atas
+# katalog lama; callback untuk future yang sudah selesai tetap dijalankan di thread eksekutor
+def test_penggabungan_mengikuti_versi_katalog(monkeypatch, katalog_sintetis):
+    katalog_sintetis(n=40)
+    monkeypatch.setattr(fuzzy_engine_worker, 'ambil_filter_populer', lambda hari: ([], 0))
+    gerbang = threading.Event()
+    berjalan = []
+    rekomendasi_asli = fuzzy_engine_worker.WorkerFuzzy.rekomendasi
+    def rekomendasi_lambat(self, preferensi_pengguna):
+        berjalan.append(self)
+        gerbang.wait(5)
+        return rekomendasi_asli(self, preferensi_pengguna)
+    monkeypatch.setattr(fuzzy_engine_worker.WorkerFuzzy, 'rekomendasi', rekomendasi_lambat)
+    thread_respons = []
+    respons_asli = fuzzy_engine_worker.WorkerFuzzy.respons_rekomendasi
+    def respons_dicatat(self, *args, **kwargs):
+        thread_respons.append(threading.current_thread().name)
+        return respons_asli(self, *args, **kwargs)
+    monkeypatch.setattr(fuzzy_engine_worker.WorkerFuzzy, 'respons_rekomendasi', respons_dicatat)
+
+    def masukan():
+        yield '{"id": 1, "preferensi": {"max_kesulitan_skala": 6}}\n'
+        while not berjalan:
+            time.sleep(0.01)
+        berjalan[0].catat_perubahan([1], [])
+        yield '{"id": 2, "preferensi": {"max_kesulitan_skala": 6}}\n'
+        gerbang.set()
+        yield '{"id": 3, "op": "ping"}\n'
+        # Future untuk permintaan ini sudah selesai sebelum callback-nya didaftarkan
+        gabungkan_asli = berjalan[0].gabungkan
+        def gabungkan_selesai(*args):
+            future, digabung = gabungkan_asli(*args)
+            future.result()
+            return future, digabung
+        berjalan[0].gabungkan = gabungkan_selesai
+        yield '{"id": 4, "preferensi": {"max_kesulitan_skala": 4}}\n'
+    keluaran = io.StringIO()
+    fuzzy_engine_worker.jalankan_server(masukan(), keluaran)
+    per_id = {r['id']: r for r in map(json.loads, keluaran.getvalue().splitlines()[1:])}
+    assert len(berjalan) == 3
+    assert [per_id[i]['metadata']['penggabungan']['digabung'] for i in (1, 2, 4)] == [False, False, False]
+    assert per_id[2]['metadata']['cache']['status'] == 'miss'
+    assert thread_respons and all(nama.startswith('fuzzy-worker') for nama in thread_respons)
+
+# Test 43: Baris gunung hasil "teratas_pasti" (jumlah jalur, rata-rata, jalur terbaik) sama dengan
+# hasil lengkap; pada "upaya_terbaik" agregat gunung yang jalurnya belum semua dinilai dikosongkan
+def test_tenggat_agregat_gunung_tampil(tmp_path, buat_katalog):
+    df = buat_katalog(n=200, n_gunung=20)
+    prefs = {'top_k': 3, 'rasio_fuzzy': 0}
+    acuan_gunung, _ = proses_rekomendasi(df, prefs)
+    skor_jalur = fuzzy_engine.SkorJalur(direktori_cache=str(tmp_path / 'sebagian'))
+    skor_jalur.perbarui(df.iloc[::4])
+    gunung, _, info = fuzzy_engine.proses_rekomendasi_tenggat(
+        df, prefs, time.monotonic() + 60, skor_jalur=skor_jalur, ukuran_chunk=8)
+    assert info['status'] == 'teratas_pasti' and info['jalur_belum_dinilai'] > 0
+    assert info['agregat_gunung_lengkap'] and info['gunung_agregat_sebagian'] == []
+    pd.testing.assert_frame_equal(gunung.reset_index(drop=True), acuan_gunung.reset_index(drop=True))
+
+    skor_lama = fuzzy_engine.SkorJalur(direktori_cache=str(tmp_path / 'lama'))
+    skor_lama.perbarui(df.iloc[:60])
+    gunung, _, info = fuzzy_engine.proses_rekomendasi_tenggat(df, {}, time.monotonic() - 1, skor_jalur=skor_lama)
+    dinilai_semua = df['id_jalur'].isin(df['id_jalur'].iloc[:60]).groupby(df['id_gunung']).all()
+    sebagian = ~gunung['id_gunung'].map(dinilai_semua)
+    assert info['status'] == 'upaya_terbaik' and not info['agregat_gunung_lengkap']
+    assert sebagian.any() and info['gunung_agregat_sebagian'] == list(gunung.loc[sebagian, 'id_gunung'])
+    for kolom in fuzzy_engine.KOLOM_AGREGAT_SEMUA_JALUR:
+        assert gunung.loc[sebagian, kolom].isna().all()
+    assert gunung['skor_tertinggi'].notna().all()
+    json.loads(fuzzy_engine.dumps_ringkas(fuzzy_engine.tabel_json(gunung)))
+
+# Test 44: baca_copy_biner mengurai buffer PGCOPY buatan tangan (tanpa server) dan menolak
+# signature salah serta field NULL
+def test_baca_copy_biner_buffer_buatan():
+    import struct
+    kolom = [('id_jalur', '>i8'), ('estimasi_waktu_jam', '>f8')]
+    baris = [(1, 4.5), (-7, float('inf')), (2**40, -0.25)]
+    def buffer(isi_baris):
+        data = fuzzy_engine_db.SIGNATURE_COPY + struct.pack('>ii', 0, 0)
+        for isi in isi_baris:
+            data += struct.pack('>h', len(isi)) + b''.join(isi)
+        return data + struct.pack('>h', -1)
+    data = buffer([[struct.pack('>iq', 8, i), struct.pack('>id', 8, x)] for i, x in baris])
+    hasil = fuzzy_engine_db.baca_copy_biner(data, kolom)
+    np.testing.assert_array_equal(hasil['id_jalur'], [i for i, _ in baris])
+    np.testing.assert_array_equal(hasil['estimasi_waktu_jam'], [x for _, x in baris])
+    assert hasil['id_jalur'].dtype == np.int64 and hasil['id_jalur'].dtype.isnative
+    assert fuzzy_engine_db.baca_copy_biner(buffer([]), kolom)['id_jalur'].size == 0
+    with pytest.raises(ValueError):
+        fuzzy_engine_db.baca_copy_biner(b'BUKAN' + data[5:], kolom)
+    with pytest.raises(ValueError):  # field NULL (panjang -1) membuat tuple tidak lebar tetap
+        fuzzy_engine_db.baca_copy_biner(buffer([[struct.pack('>iq', 8, 1), struct.pack('>i', -1)]]), kolom)
+
+# Test 45: kompilasi_kondisi_sql tanpa server: batas floor/ceil untuk kolom integer, satu ULP
+# ke luar untuk kolom pecahan, nilai yang tidak bisa didorong dilewati, placeholder mulai $3
+def test_kompilasi_kondisi_sql_parameter():
+    from decimal import Decimal
+    import psycopg2.extensions
+    tipe = {'kesulitan_skala': '>i8', 'estimasi_waktu_jam': '>f8'}
+    kondisi = [('kesulitan_skala', '<=', 5.5), ('kesulitan_skala', '>=', 2.2), ('estimasi_waktu_jam', '<=', 12),
+               ('estimasi_waktu_jam', '>=', 4.0), ('kesulitan_skala', '>=', -1e30), ('kesulitan_skala', '==', 3),
+               ('keamanan_skala', '>=', float('nan')), ('keamanan_skala', '>=', 'tinggi'), ('kolom_asing', '<=', 1)]
+    sql, parameter = fuzzy_engine_db.kompilasi_kondisi_sql(kondisi, tipe)
+    kesulitan, waktu = (fuzzy_engine_db.EKSPRESI_KOLOM[k] for k in ('kesulitan_skala', 'estimasi_waktu_jam'))
+    assert sql.split('\n              AND ')[1:] == [
+        f'{kesulitan} <= $3::int8', f'{kesulitan} >= $4::int8',
+        f'{waktu} <= $5::numeric', f'{waktu} >= $6::numeric', f'{kesulitan} >= $7::int8']
+    assert parameter[:2] == [5, 3] and parameter[4] == -2**63
+    assert parameter[2] == Decimal(float(np.nextafter(12.0, np.inf))) > 12
+    assert parameter[3] == Decimal(float(np.nextafter(4.0, -np.inf))) < 4
+
+    class CursorPalsu:
+        def mogrify(self, _, argumen):
+            return psycopg2.extensions.adapt(argumen[0]).getquoted()
+    query = fuzzy_engine_db._query_jalur(fuzzy_engine_db._kolom(numerik=True), sql)
+    terisi = fuzzy_engine_db._isi_parameter(CursorPalsu(), query, [[1, 2], None] + parameter)
+    assert '$' not in terisi and 'ARRAY[1,2]::int[]' in terisi and 'NULL::int[] IS NULL' in terisi
+    # psycopg2 memberi spasi sebelum angka negatif agar tidak terbaca sebagai komentar '--'
+    assert f'{kesulitan} <= 5::int8' in terisi and f'{kesulitan} >=  -9223372036854775808::int8' in terisi
+
+# Test 46: versi_data hanya naik bila katalog benar-benar berubah (muat ulang dataset bersama tanpa
+# versi baru mempertahankan cache, segarkan naik sekali); baca kunci + bergabung atomik terhadap NOTIFY
+def test_versi_data_hanya_naik_saat_berubah(monkeypatch, tmp_path, katalog_sintetis):
+    katalog_sintetis(n=60)
+    monkeypatch.setattr(fuzzy_engine, 'DIREKTORI_CACHE', str(tmp_path / 'cache'))
+
+    class PoolPalsu:
+        def jalankan(self, fungsi):
+            return 'sidik-1'
+    monkeypatch.setattr(fuzzy_engine_worker, 'dapatkan_pool', PoolPalsu)
+    monkeypatch.setenv('FUZZY_DATASET_BERSAMA', str(tmp_path / 'bersama'))
+    worker = fuzzy_engine_worker.WorkerFuzzy(ttl_data=0)
+    worker.muat_data()
+    versi = worker.versi_data
+    assert worker.ambil_rekomendasi({'max_kesulitan_skala': 6})[2]['status'] == 'miss'
+    worker.muat_data()
+    assert worker.versi_data == versi
+    assert worker.ambil_rekomendasi({'max_kesulitan_skala': 6})[2]['status'] == 'hit'
+
+    monkeypatch.delenv('FUZZY_DATASET_BERSAMA')
+    worker = fuzzy_engine_worker.WorkerFuzzy(ttl_data=0)
+    worker.muat_data()
+    versi = worker.versi_data
+    worker.segarkan([1], [])
+    assert worker.versi_data == versi + 1
+
+    # NOTIFY yang dicatat saat permintaan sedang bergabung menunggu sampai penggabungan selesai
+    pencatat = threading.Thread(target=worker.catat_perubahan, args=([1], []))
+    jalankan_asli = worker.gabung.jalankan
+    def jalankan_sambil_notify(kunci, *args):
+        pencatat.start()
+        pencatat.join(0.2)
+        assert pencatat.is_alive() and kunci[1] == worker.versi_data
+        return jalankan_asli(kunci, *args)
+    worker.gabung.jalankan = jalankan_sambil_notify
+    with fuzzy_engine_worker.ThreadPoolExecutor(max_workers=1) as eksekutor:
+        future, _ = worker.gabungkan({}, eksekutor, lambda: None)
+        future.result()
+    pencatat.join(5)
+    assert worker.versi_data == versi + 2
@@ -8,6 +8,7 @@ const { authenticateToken, authorizeAdmin } = require("../middleware/auth");
 const pool = require("../config/database");
 const logger = require("../logger");
 const { uploadThumbnail } = require("../config/multer");
+const recommendationService = require("../services/recommendationService");
 
 // ===================================
 // ADMIN ROUTES - MOUNTAIN MANAGEMENT
@@ -180,6 +181,8 @@ router.put(
         return res
           .status(404)
           .json({ message: "Data gunung tidak ditemukan." });
+      // Ketinggian/variasi jalur ikut menentukan skor semua jalur gunung ini
+      recommendationService.refreshCatalog({ gunungIds: [id_gunung] });
       res.json({
         message: "Data gunung berhasil diperbarui!",
         gunung: result.rows[0],
@@ -214,6 +217,7 @@ router.delete(
         const filePath = path.join(__dirname, "public", url_thumbnail);
         if (fs.existsSync(filePath)) fs.unlinkSync(filePath);
       }
+      recommendationService.refreshCatalog({ gunungIds: [id_gunung] });
       res.json({
         message: `'${result.rows[0].nama_gunung}' berhasil dihapus.`,
       });
@@ -259,6 +263,7 @@ router.post(
         }
       }
       await client.query("COMMIT");
+      recommendationService.refreshCatalog({ gunungIds: ids });
       res.json({
         message: `${deleteResult.rowCount} data gunung berhasil dihapus.`,
       });
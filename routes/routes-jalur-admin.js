@@ -5,6 +5,7 @@ const router = express.Router();
 const { authenticateToken, authorizeAdmin } = require("../middleware/auth");
 const pool = require("../config/database");
 const logger = require("../logger");
+const recommendationService = require("../services/recommendationService");
 
 // Konstanta enum untuk validasi
 const ALLOWED_STATUS_JALUR = [
@@ -62,6 +63,9 @@ router.post("/jalur", authenticateToken, authorizeAdmin, async (req, res) => {
         status_jalur,
       ]
     );
+    recommendationService.refreshCatalog({
+      jalurIds: [result.rows[0].id_jalur],
+    });
     res.status(201).json({
       message: "Jalur pendakian berhasil ditambahkan",
       jalur: result.rows[0],
@@ -192,6 +196,7 @@ router.put(
           .status(404)
           .json({ message: "Data jalur tidak ditemukan untuk diperbarui." });
       }
+      recommendationService.refreshCatalog({ jalurIds: [id_jalur] });
       res.json({
         message: "Data jalur berhasil diperbarui!",
         jalur: result.rows[0],
@@ -224,6 +229,7 @@ router.delete(
       if (result.rowCount === 0) {
         return res.status(404).json({ message: "Data jalur tidak ditemukan." });
       }
+      recommendationService.refreshCatalog({ jalurIds: [id_jalur] });
       res.json({
         message: `Jalur '${result.rows[0].nama_jalur}' berhasil dihapus.`,
       });
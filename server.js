@@ -56,6 +56,7 @@ async function startServer() {
     // Graceful shutdown handler
     const gracefulShutdown = (signal) => {
       logger.info(`Received ${signal}. Starting graceful shutdown...`);
+      require("./services/recommendationService").shutdown();
       server.close((err) => {
         if (err) {
           logger.error("Error during server shutdown:", err);
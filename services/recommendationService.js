@@ -1,7 +1,25 @@
 const { spawn } = require("child_process");
+const readline = require("readline");
 const path = require("path");
 const fs = require("fs");
 const logger = require("../logger");
+const pool = require("../config/database");
+
+// Kanal LISTEN/NOTIFY perubahan katalog (harus sama dengan FUZZY_NOTIFY_KANAL di worker)
+const CATALOG_NOTIFY_CHANNEL = process.env.FUZZY_NOTIFY_KANAL ?? "fuzzy_katalog";
+
+// Batas waktu satu permintaan ke worker Python (ms)
+const ENGINE_TIMEOUT_MS = parseInt(
+  process.env.FUZZY_ENGINE_TIMEOUT_MS || "60000",
+  10
+);
+
+// Cadangan waktu (ms) antara tenggat yang dikirim ke worker dan tenggat pemanggil,
+// untuk serialisasi hasil dan perjalanan pesan kembali ke Node
+const DEADLINE_MARGIN_MS = parseInt(
+  process.env.FUZZY_TENGGAT_MARGIN_MS || "300",
+  10
+);
 
 class RecommendationService {
   constructor() {
@@ -11,73 +29,154 @@ class RecommendationService {
       "../rekomendasi_api",
       "fuzzy_engine.py"
     );
+    // Worker Python jangka panjang (fuzzy_engine.py --serve) dan permintaan yang sedang menunggu
+    this.worker = null;
+    this.pending = new Map();
+    this.nextRequestId = 1;
+    // true bila worker sendiri mendengarkan NOTIFY perubahan katalog
+    this.workerListens = false;
+  }
+
+  _ensureWorker() {
+    if (this.worker) {
+      return this.worker;
+    }
+
+    const worker = spawn("python", [this.pythonScriptPath, "--serve"]);
+    this.worker = worker;
+
+    const lines = readline.createInterface({ input: worker.stdout });
+    lines.on("line", (line) => this._handleWorkerLine(line));
+
+    worker.stderr.on("data", (data) => {
+      logger.debug(`[PYTHON STDERR] ${data.toString()}`);
+    });
+
+    worker.on("error", (err) => {
+      logger.error("Gagal menjalankan worker Python:", err);
+    });
+
+    worker.on("close", (code) => {
+      if (this.worker === worker) {
+        this.worker = null;
+        this.workerListens = false;
+      }
+      if (code !== 0) {
+        logger.error(`Worker Python berhenti dengan kode: ${code}`);
+      }
+      // Semua permintaan yang masih menunggu tidak akan pernah dijawab
+      for (const [id, entry] of this.pending) {
+        clearTimeout(entry.timer);
+        entry.reject(
+          new Error("Terjadi kesalahan saat menjalankan sistem rekomendasi.")
+        );
+        this.pending.delete(id);
+      }
+    });
+
+    return worker;
   }
 
-  async getRecommendations(preferences) {
+  _handleWorkerLine(line) {
+    let message;
     try {
-      return await new Promise((resolve, reject) => {
-        if (!fs.existsSync(this.pythonScriptPath)) {
-          logger.error(
-            "Error: Script Python tidak ditemukan di",
-            this.pythonScriptPath
-          );
-          return reject(
-            new Error("Konfigurasi server rekomendasi belum lengkap.")
-          );
-        }
-
-        const preferencesJson = JSON.stringify(preferences);
-        const pythonProcess = spawn("python", [
-          this.pythonScriptPath,
-          preferencesJson,
-        ]);
-
-        let resultData = "";
-        let errorData = "";
-
-        pythonProcess.stdout.on("data", (data) => {
-          resultData += data.toString();
-          console.log("[PYTHON STDOUT]", data.toString()); // DEBUG: tampilkan output Python stdout
-        });
-
-        pythonProcess.stderr.on("data", (data) => {
-          errorData += data.toString();
-          console.error("[PYTHON STDERR]", data.toString()); // DEBUG: tampilkan output Python stderr
-        });
-
-        pythonProcess.on("close", (code) => {
-          if (code !== 0) {
-            logger.error(`Proses Python error dengan kode: ${code}`);
-            logger.error("Pesan error dari Python:", errorData);
-            return reject(
-              new Error(
-                "Terjadi kesalahan saat menjalankan sistem rekomendasi."
-              )
-            );
-          }
-
-          try {
-            const finalResult = JSON.parse(resultData);
-
-            // Log untuk debugging
-            logger.info("✅ Python engine response received successfully");
-            logger.debug("Response metadata:", finalResult.metadata);
-
-            resolve(finalResult);
-          } catch (parseError) {
-            logger.error(
-              "Gagal mem-parsing JSON dari skrip Python:",
-              parseError
-            );
-            logger.error("Data mentah yang diterima:", resultData);
-            reject(
-              new Error(
-                "Terjadi kesalahan format data dari sistem rekomendasi."
-              )
-            );
-          }
-        });
-      });
+      message = JSON.parse(line);
+    } catch (parseError) {
+      logger.error("Gagal mem-parsing JSON dari worker Python:", parseError);
+      logger.error("Data mentah yang diterima:", line);
+      return;
+    }
+
+    if (message.status === "siap") {
+      this.workerListens = Boolean(message.dengar_notify);
+      logger.info(`✅ Worker fuzzy engine siap (pid ${message.pid})`);
+      if (message.hangat) {
+        const { profil, pencarian_tercakup, total_pencarian, cakupan } = message.hangat;
+        logger.info(
+          `🔥 Cache rekomendasi dihangatkan: ${profil} profil, ${pencarian_tercakup}/${total_pencarian} pencarian (${(cakupan * 100).toFixed(1)}%)`
+        );
+      }
+      return;
+    }
+
+    const entry = this.pending.get(message.id);
+    if (!entry) {
+      if (message.error) {
+        logger.error("Error dari worker Python:", message.message);
+      }
+      return;
+    }
+
+    // Permintaan stream: header dan baris hasil diteruskan satu per satu,
+    // permintaan baru selesai saat pesan "selesai" (atau error) diterima
+    if (entry.onMessage && !message.error && message.jenis !== "selesai") {
+      delete message.id;
+      entry.onMessage(message);
+      return;
+    }
+    this.pending.delete(message.id);
+    clearTimeout(entry.timer);
+
+    delete message.id;
+    if (message.error) {
+      logger.error("Pesan error dari Python:", message.message);
+      return entry.reject(
+        new Error("Terjadi kesalahan saat menjalankan sistem rekomendasi.")
+      );
+    }
+    entry.resolve(message);
+  }
+
+  _request(payload, onMessage = null) {
+    return new Promise((resolve, reject) => {
+      if (!fs.existsSync(this.pythonScriptPath)) {
+        logger.error(
+          "Error: Script Python tidak ditemukan di",
+          this.pythonScriptPath
+        );
+        return reject(
+          new Error("Konfigurasi server rekomendasi belum lengkap.")
+        );
+      }
+
+      const worker = this._ensureWorker();
+      const id = this.nextRequestId++;
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error("Sistem rekomendasi tidak merespons tepat waktu."));
+      }, ENGINE_TIMEOUT_MS);
+
+      this.pending.set(id, { resolve, reject, timer, onMessage });
+      worker.stdin.write(JSON.stringify({ id, ...payload }) + "\n");
+    });
+  }
+
+  // options.layout = "kolom" meminta tabel sebagai satu array per field (lebih ringkas)
+  // options.deadlineMs = tenggat total (ms): worker menjawab sebelum tenggat dengan skor
+  // yang sudah tersimpan bila perlu; metadata.tenggat.lengkap = false menandai upaya terbaik.
+  // Tenggat hanya ditegakkan worker (batas_waktu_ms); batas keras tetap ENGINE_TIMEOUT_MS agar
+  // worker yang baru start atau sedang memuat katalog tetap sempat mengirim hasil upaya terbaik
+  // options.session = true (sesi baru) atau token dari metadata.sesi.token respons sebelumnya:
+  // filter yang hanya diperketat dijawab dari kandidat sesi tanpa menilai ulang katalog
+  async getRecommendations(preferences, options = {}) {
+    try {
+      const payload = { preferensi: preferences };
+      if (options.layout) {
+        payload.tata_letak = options.layout;
+      }
+      if (options.session) {
+        payload.sesi = options.session;
+      }
+      if (options.deadlineMs) {
+        payload.batas_waktu_ms = Math.max(0, options.deadlineMs - DEADLINE_MARGIN_MS);
+      }
+      const finalResult = await this._request(payload);
+
+      // Log untuk debugging
+      logger.info("✅ Python engine response received successfully");
+      logger.debug("Response metadata:", finalResult.metadata);
+
+      return finalResult;
     } catch (err) {
       logger.error(
         "Promise error di getRecommendations:",
@@ -87,6 +186,99 @@ class RecommendationService {
     }
   }
 
+  // Banyak profil preferensi sekaligus: worker menilai katalog sekali lalu hanya
+  // memfilter/mengurutkan per profil. Hasil berupa array respons sesuai urutan profil.
+  async getRecommendationsBatch(preferencesList, options = {}) {
+    try {
+      const payload = { op: "rekomendasi_batch", daftar_preferensi: preferencesList };
+      if (options.layout) {
+        payload.tata_letak = options.layout;
+      }
+      const { hasil } = await this._request(payload);
+      logger.info(`✅ Python engine batch response received (${hasil.length} profil)`);
+      return hasil;
+    } catch (err) {
+      logger.error(
+        "Promise error di getRecommendationsBatch:",
+        err && err.stack ? err.stack : err
+      );
+      throw err;
+    }
+  }
+
+  // Versi stream: onMessage dipanggil untuk header ({ jenis: "header", metadata })
+  // lalu untuk setiap baris ({ jenis: "gunung" | "jalur", peringkat, data }) sesuai
+  // urutan peringkat. Promise selesai dengan pesan penutup ({ jenis: "selesai" }).
+  async streamRecommendations(preferences, onMessage, options = {}) {
+    const payload = { preferensi: preferences, stream: true };
+    if (options.tables) {
+      payload.tabel = options.tables;
+    }
+    if (options.session) {
+      payload.sesi = options.session;
+    }
+    try {
+      const summary = await this._request(payload, onMessage);
+      logger.info("✅ Python engine stream completed successfully");
+      return summary;
+    } catch (err) {
+      logger.error(
+        "Promise error di streamRecommendations:",
+        err && err.stack ? err.stack : err
+      );
+      throw err;
+    }
+  }
+
+  // Statistik worker: cache hasil, penggabungan permintaan identik (komputasi,
+  // permintaan_digabung, hemat_ms, total_tunggu_ms) dan laporan penghangatan cache
+  getEngineStats() {
+    return this._request({ op: "statistik" });
+  }
+
+  // Memberi tahu worker bahwa jalur/gunung tertentu diubah admin agar hanya skor
+  // jalur tersebut dan agregat gunungnya yang dihitung ulang. Perubahan disiarkan
+  // lewat NOTIFY sehingga worker di instance lain ikut segar; proses yang baru start
+  // mendeteksi perubahan dari sidik katalog sehingga snapshot lamanya tidak dipakai.
+  refreshCatalog({ jalurIds = [], gunungIds = [] } = {}) {
+    const changes = {
+      id_jalur: jalurIds.map(Number),
+      id_gunung: gunungIds.map(Number),
+    };
+    if (CATALOG_NOTIFY_CHANNEL) {
+      pool
+        .query("SELECT pg_notify($1, $2)", [
+          CATALOG_NOTIFY_CHANNEL,
+          JSON.stringify(changes),
+        ])
+        .catch((err) =>
+          logger.error("Gagal mengirim NOTIFY perubahan katalog:", err)
+        );
+    }
+    // Worker lokal yang sudah mendengarkan NOTIFY tidak perlu diminta dua kali
+    if (!this.worker || this.workerListens) {
+      return Promise.resolve();
+    }
+    return this._request({ op: "segarkan", ...changes })
+      .then((result) =>
+        logger.info(
+          `🔄 Katalog rekomendasi disegarkan (${result.total_jalur} jalur)`
+        )
+      )
+      .catch((err) =>
+        logger.error("Gagal menyegarkan katalog rekomendasi:", err)
+      );
+  }
+
+  // Menghentikan worker dengan bersih (dipanggil saat server shutdown)
+  shutdown() {
+    if (!this.worker) {
+      return;
+    }
+    this.worker.stdin.end(JSON.stringify({ op: "berhenti" }) + "\n");
+    this.worker = null;
+  }
+
   translateDialogflowParams(params) {
     const filtersForPython = {};
 
@@ -106,7 +298,8 @@ class RecommendationService {
     return filtersForPython;
   }
 
-  formatDialogflowResponse(recommendations) {
+  // options.partial = true menambahkan catatan bahwa hasil masih sementara (tenggat habis)
+  formatDialogflowResponse(recommendations, options = {}) {
     if (recommendations.length === 0) {
       return {
         fulfillmentText:
@@ -135,6 +328,17 @@ class RecommendationService {
           },
         },
         ...cardMessages,
+        ...(options.partial
+          ? [
+              {
+                text: {
+                  text: [
+                    "Catatan: ini hasil sementara karena waktu perhitungan terbatas. Coba tanyakan lagi sebentar lagi untuk hasil lengkap.",
+                  ],
+                },
+              },
+            ]
+          : []),
       ],
     };
   }